@@ -0,0 +1,510 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import rackio
+from rackmodel import DEFAULT_COMPONENT_CATEGORIES, PLACEMENT_STRATEGIES, CatalogSearch, NoSpaceError, RackModel, Workspace, pack_inventory
+
+DEVICE_SIZES = (1, 1, 1, 2, 2, 4)
+RACK_HEIGHTS = (4, 12, 42, 58)
+CATALOG_SIZES = (30, 1000, 10000)
+SUITES = ('strategies', 'model', 'gui', 'startup')
+PROJECT_RACKS = 100
+MEASURE_U = 240
+SEARCH_QUERIES = ('s', 'se', 'ser', 'server', 'server 2u', 'bench 01', 'zzz')
+TIMING_FIELDS = ('us_per_call', 'us_per_placement', 'us_per_compaction', 'seconds')
+KEY_FIELDS = ('benchmark', 'strategy', 'case', 'rack_height', 'catalog', 'devices', 'operations')
+
+
+def _fragmentation(model):
+    if not model.free_u:
+        return 0.0
+    largest = max(end - start + 1 for start, end in model.occupancy.free_runs())
+    return 1 - largest / model.free_u
+
+
+def _churn(model, rng, operations, sizes):
+    stats = {'placed': 0, 'rejected': 0, 'fragmented_rejects': 0, 'place_seconds': 0.0, 'fragmentation': 0.0}
+    samples = 0
+    for _ in range(operations):
+        if model.components and rng.random() < 0.4:
+            model.delete(model.components[rng.randrange(len(model.components))])
+            continue
+        size_u = rng.choice(sizes)
+        started = time.perf_counter()
+        try:
+            model.place("Device", size_u)
+            stats['placed'] += 1
+        except NoSpaceError:
+            stats['rejected'] += 1
+            if model.free_u >= size_u:
+                stats['fragmented_rejects'] += 1
+        stats['place_seconds'] += time.perf_counter() - started
+        stats['fragmentation'] += _fragmentation(model)
+        samples += 1
+    stats['fragmentation'] /= max(samples, 1)
+    return stats
+
+
+def bench_strategies(rack_heights=(42, 58), operations=5000, seed=0, sizes=DEVICE_SIZES):
+    results = []
+    for rack_height in rack_heights:
+        for strategy in PLACEMENT_STRATEGIES:
+            model = RackModel(rack_height, track_history=False, placement_strategy=strategy)
+            stats = _churn(model, random.Random(seed), operations, sizes)
+            attempts = stats['placed'] + stats['rejected']
+            results.append({
+                'benchmark': 'churn',
+                'strategy': strategy,
+                'rack_height': rack_height,
+                'operations': operations,
+                'placed': stats['placed'],
+                'rejected': stats['rejected'],
+                'fragmented_rejects': stats['fragmented_rejects'],
+                'mean_fragmentation': round(stats['fragmentation'], 4),
+                'us_per_placement': round(stats['place_seconds'] / max(attempts, 1) * 1e6, 2),
+            })
+
+        rng = random.Random(seed)
+        model = RackModel(rack_height, track_history=False)
+        moves = compactions = 0
+        elapsed = 0.0
+        for _ in range(max(operations // 50, 1)):
+            _churn(model, rng, 50, sizes)
+            started = time.perf_counter()
+            moves += len(model.compact())
+            elapsed += time.perf_counter() - started
+            compactions += 1
+        results.append({
+            'benchmark': 'compact',
+            'strategy': 'branch-and-bound',
+            'rack_height': rack_height,
+            'compactions': compactions,
+            'mean_moves': round(moves / compactions, 2),
+            'us_per_compaction': round(elapsed / compactions * 1e6, 2),
+        })
+    return results
+
+
+def bench_pack(devices=10000, rack_height=42, seed=0, sizes=DEVICE_SIZES):
+    rng = random.Random(seed)
+    inventory = [("Device", rng.choice(sizes), None) for _ in range(devices)]
+    rack_count = sum(size for _, size, _ in inventory) // rack_height + 1
+    results = []
+    for strategy in PLACEMENT_STRATEGIES:
+        started = time.perf_counter()
+        racks, unplaced = pack_inventory(inventory, rack_count, rack_height, strategy=strategy)
+        elapsed = time.perf_counter() - started
+        used_racks = sum(1 for rack in racks if rack.components)
+        results.append({
+            'benchmark': 'pack',
+            'strategy': strategy,
+            'rack_height': rack_height,
+            'devices': devices,
+            'racks_used': used_racks,
+            'unplaced': len(unplaced),
+            'efficiency': round(sum(rack.used_u for rack in racks) / (max(used_racks, 1) * rack_height), 4),
+            'seconds': round(elapsed, 4),
+        })
+    return results
+
+
+# The built-in catalog padded with generated custom components to `entries` in total.
+def synthetic_catalog(entries, seed=0):
+    rng = random.Random(seed)
+    categories = {category: dict(items) for category, items in DEFAULT_COMPONENT_CATEGORIES.items()}
+    built_in = sum(len(items) for items in categories.values())
+    categories["Custom"] = {f"Bench Device {i:05d}": {"size": rng.choice(DEVICE_SIZES), "color": f"#{rng.randrange(1 << 24):06x}"}
+                            for i in range(max(entries - built_in, 0))}
+    return categories
+
+
+def _catalog_entries(categories, rack_height):
+    return [(name, info['size'], info['color']) for items in categories.values() for name, info in items.items() if info['size'] <= rack_height]
+
+
+# Runs `run` `repeat` times on fresh state and keeps the fastest. run() returns
+# (seconds, calls) for the part that was timed; small racks run it several times
+# per measurement so every case makes a few hundred calls.
+def _measure(benchmark, case, rack_height, catalog, run, repeat, rounds=None):
+    if rounds is None:
+        rounds = max(1, MEASURE_U // rack_height) if rack_height else 1
+    best = None
+    for _ in range(repeat):
+        seconds = calls = 0
+        for _ in range(rounds):
+            elapsed, count = run()
+            seconds += elapsed
+            calls += count
+        if calls and (best is None or seconds / calls < best[0] / best[1]):
+            best = (seconds, calls)
+    seconds, calls = best or (0.0, 0)
+    return {
+        'benchmark': benchmark,
+        'case': case,
+        'rack_height': rack_height,
+        'catalog': catalog,
+        'calls': calls,
+        'us_per_call': round(seconds / max(calls, 1) * 1e6, 2),
+    }
+
+
+# Places random catalog entries that fit until the rack is full. Racks are filled
+# from empty, so an entry fits whenever there is enough free U.
+def _fill(place, free_u, entries, rng):
+    smallest = min(entry[1] for entry in entries)
+    calls = 0
+    elapsed = 0.0
+    while free_u() >= smallest:
+        entry = rng.choice(entries)
+        if entry[1] > free_u():
+            continue
+        started = time.perf_counter()
+        place(entry)
+        elapsed += time.perf_counter() - started
+        calls += 1
+    return elapsed, calls
+
+
+def _filled_model(rack_height, categories, seed, track_history=True):
+    model = RackModel(rack_height, component_categories=categories, track_history=track_history)
+    _fill(lambda entry: model.place_catalog(entry[0]), lambda: model.free_u, _catalog_entries(categories, rack_height), random.Random(seed))
+    return model
+
+
+def _timed(fn, calls):
+    started = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return time.perf_counter() - started, calls
+
+
+# Model-only paths the GUI sits on: placement with catalog lookups, slot checks,
+# a drag sweep, undo/redo, palette search and project save/load in each format.
+def bench_model(rack_heights=RACK_HEIGHTS, catalog_sizes=CATALOG_SIZES, repeat=3, seed=0):
+    results = []
+    with tempfile.TemporaryDirectory() as folder:
+        for catalog_size in catalog_sizes:
+            categories = synthetic_catalog(catalog_size, seed)
+            catalog = sum(len(items) for items in categories.values())
+            search = CatalogSearch(categories)
+
+            def search_queries():
+                started = time.perf_counter()
+                for query in SEARCH_QUERIES:
+                    search.search(query)
+                return time.perf_counter() - started, len(SEARCH_QUERIES)
+
+            results.append(_measure('model', 'search', None, catalog, search_queries, repeat))
+            for rack_height in rack_heights:
+                entries = _catalog_entries(categories, rack_height)
+
+                def place():
+                    model = RackModel(rack_height, component_categories=categories)
+                    return _fill(lambda entry: model.place_catalog(entry[0]), lambda: model.free_u, entries, random.Random(seed))
+
+                def slots():
+                    model = _filled_model(rack_height, categories, seed)
+                    checks = [(start, size) for start in range(1, rack_height + 1) for size in (1, 2, 4)]
+                    started = time.perf_counter()
+                    for start, size in checks:
+                        model.is_slot_available(start, size)
+                    return time.perf_counter() - started, len(checks)
+
+                def drag():
+                    model = _filled_model(rack_height, categories, seed)
+                    comp = model.components[len(model.components) // 2]
+                    started = time.perf_counter()
+                    model.lift(comp)
+                    for start in range(1, rack_height + 1):
+                        model.is_slot_available(model.clamp_start_u_slot(start, comp.size_u), comp.size_u)
+                    model.settle(comp)
+                    return time.perf_counter() - started, rack_height
+
+                def undo_redo():
+                    model = _filled_model(rack_height, categories, seed)
+                    started = time.perf_counter()
+                    calls = 0
+                    while model.undo():
+                        calls += 1
+                    while model.redo():
+                        calls += 1
+                    return time.perf_counter() - started, calls
+
+                for case, run in (('place', place), ('is_slot_available', slots), ('drag', drag), ('undo_redo', undo_redo)):
+                    results.append(_measure('model', case, rack_height, catalog, run, repeat))
+
+                workspace = Workspace(PROJECT_RACKS, rack_height, component_categories=categories)
+                for n, rack in enumerate(workspace.racks):
+                    _fill(lambda entry: rack.place_catalog(entry[0]), lambda: rack.free_u, entries, random.Random(seed + n))
+                for extension in ('.json', '.jsonl', '.rackbin'):
+                    path = os.path.join(folder, "project" + extension)
+                    results.append(_measure('model', 'save' + extension, rack_height, catalog,
+                                            lambda: _timed(lambda: rackio.save_project(path, workspace), 1), repeat, rounds=1))
+                    results.append(_measure('model', 'load' + extension, rack_height, catalog,
+                                            lambda: _timed(lambda: rackio.load_project(path), 1), repeat, rounds=1))
+    return results
+
+
+# The same paths through RackPlannerApp on a real (withdrawn) Tk window, so it needs
+# a display; run under xvfb-run on a headless machine. Dialogs are never opened:
+# placements only use components that fit and drags end where they started.
+def bench_gui(rack_heights=RACK_HEIGHTS, catalog_sizes=CATALOG_SIZES, repeat=3, seed=0):
+    import tkinter as tk
+    import rackplanner
+    from rackrender import U_HEIGHT
+
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        print(f"Skipping the gui suite: {e}", file=sys.stderr)
+        return []
+    root.withdraw()
+    results = []
+    try:
+        with tempfile.TemporaryDirectory() as folder:
+            for catalog_size in catalog_sizes:
+                categories = synthetic_catalog(catalog_size, seed)
+                catalog = sum(len(items) for items in categories.values())
+                app = rackplanner.RackPlannerApp(root, autosave=False)
+                app.model.merge_custom_components(categories["Custom"])
+                app.update_palette()
+                for rack_height in rack_heights:
+                    entries = _catalog_entries(categories, rack_height)
+
+                    def reset():
+                        app.model.clear()
+                        app.model.resize(rack_height)
+                        app.model.clear_history()
+                        app._after_model_change()
+                        root.update()
+
+                    def filled():
+                        reset()
+                        _fill(lambda entry: app.model.place_catalog(entry[0]), lambda: app.model.free_u, entries, random.Random(seed))
+                        app._draw_rack_and_components()
+                        root.update()
+
+                    def place():
+                        reset()
+                        return _fill(lambda entry: app._place_component_from_palette(*entry), lambda: app.model.free_u, entries, random.Random(seed))
+
+                    def slots():
+                        filled()
+                        checks = [(start, size) for start in range(1, rack_height + 1) for size in (1, 2, 4)]
+                        started = time.perf_counter()
+                        for start, size in checks:
+                            app.is_slot_available(start, size)
+                        return time.perf_counter() - started, len(checks)
+
+                    def sync_frame():
+                        reset()
+                        elapsed = 0.0
+                        for height in (rack_height + 4, rack_height):
+                            app.model.resize(height)
+                            started = time.perf_counter()
+                            app._sync_rack_frame()
+                            elapsed += time.perf_counter() - started
+                        return elapsed, 2
+
+                    def redraw():
+                        filled()
+                        return _timed(app._draw_rack_and_components, 20)
+
+                    def drag():
+                        filled()
+                        comp = app.model.components[len(app.model.components) // 2]
+                        x1, y1, x2, y2 = app.canvas.coords(app._component_items[id(comp)][0])
+                        event = tk.Event()
+                        event.widget, event.x, event.y = app.canvas, int((x1 + x2) / 2), int(y1) + 1
+                        started = time.perf_counter()
+                        app._start_drag(event)
+                        for y in list(range(0, rack_height * U_HEIGHT, U_HEIGHT // 2)) + [event.y]:
+                            app._pending_drag_y = y
+                            app._flush_drag_motion()
+                        app._drop(event)
+                        return time.perf_counter() - started, rack_height * 2 + 1
+
+                    def undo_redo():
+                        filled()
+                        app.model.clear_history()
+                        for comp in list(app.model.components):
+                            app._delete_component_logic(comp)
+                        started = time.perf_counter()
+                        calls = 0
+                        while app.model.can_undo:
+                            app.undo()
+                            calls += 1
+                        while app.model.can_redo:
+                            app.redo()
+                            calls += 1
+                        return time.perf_counter() - started, calls
+
+                    path = os.path.join(folder, "rack.json")
+
+                    def save():
+                        filled()
+                        started = time.perf_counter()
+                        with open(path, 'w') as f:
+                            json.dump(app.model.to_dict(), f, indent=4)
+                        return time.perf_counter() - started, 1
+
+                    def load():
+                        save()
+                        reset()
+                        started = time.perf_counter()
+                        with open(path) as f:
+                            app.model.load_dict(json.load(f))
+                        app.update_palette()
+                        app._after_model_change()
+                        root.update()
+                        return time.perf_counter() - started, 1
+
+                    for case, run in (('place_from_palette', place), ('is_slot_available', slots), ('sync_rack_frame', sync_frame),
+                                      ('draw_rack_and_components', redraw), ('drag_motion', drag), ('undo_redo', undo_redo),
+                                      ('save', save), ('load', load)):
+                        results.append(_measure('gui', case, rack_height, catalog, run, repeat))
+                for child in root.winfo_children():
+                    child.destroy()
+    finally:
+        root.destroy()
+    return results
+
+
+def _probe_startup(env):
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rackplanner.py')],
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, env=env)
+    times = {}
+    for line in process.stdout:
+        times[line.strip()] = time.perf_counter() - started
+    error = process.stderr.read()
+    process.wait()
+    if 'first-frame' not in times:
+        raise RuntimeError(error.strip().splitlines()[-1] if error.strip() else f"exit status {process.returncode}")
+    return times
+
+
+# Launches the app in a fresh interpreter and times, from the launch, the first
+# frame and the palette being ready, against rackplanner.FIRST_FRAME_TARGET_MS. The
+# app reopens a last session of PROJECT_RACKS racks using a catalog of each size,
+# from a temporary autosave folder. Module import time is measured headless; the
+# rest needs a display, as for the gui suite.
+def bench_startup(catalog_sizes=CATALOG_SIZES, repeat=3, seed=0):
+    from rackjournal import AUTOSAVE_DIR_ENV, Journal
+    from rackplanner import FIRST_FRAME_TARGET_MS, STARTUP_PROBE_ENV
+
+    folder = os.path.dirname(os.path.abspath(__file__))
+    code = "import time; started = time.perf_counter(); import rackplanner; print(time.perf_counter() - started)"
+    imports = min(float(subprocess.run([sys.executable, '-c', code], cwd=folder, capture_output=True, text=True, check=True).stdout)
+                  for _ in range(repeat))
+    results = [{'benchmark': 'startup', 'case': 'import', 'seconds': round(imports, 4)}]
+
+    for catalog_size in catalog_sizes:
+        categories = synthetic_catalog(catalog_size, seed)
+        workspace = Workspace(PROJECT_RACKS, 42, categories)
+        for rack in workspace.racks:
+            _fill(lambda entry: rack.place_catalog(entry[0]), lambda: rack.free_u, _catalog_entries(categories, 42), random.Random(seed))
+        best = {}
+        with tempfile.TemporaryDirectory() as autosave:
+            env = dict(os.environ, **{STARTUP_PROBE_ENV: '1', AUTOSAVE_DIR_ENV: autosave})
+            for _ in range(repeat):
+                Journal(autosave).save_session(workspace)
+                try:
+                    times = _probe_startup(env)
+                except RuntimeError as e:
+                    print(f"Skipping the startup frame timings: {e}", file=sys.stderr)
+                    return results
+                for case, seconds in times.items():
+                    best[case] = min(best.get(case, seconds), seconds)
+        catalog = sum(len(items) for items in categories.values())
+        for case in ('first-frame', 'ready'):
+            if case in best:
+                result = {'benchmark': 'startup', 'case': case.replace('-', '_'), 'catalog': catalog, 'seconds': round(best[case], 4)}
+                if case == 'first-frame':
+                    result['target_ms'] = FIRST_FRAME_TARGET_MS
+                results.append(result)
+    return results
+
+
+def _result_key(result):
+    return tuple(result.get(field) for field in KEY_FIELDS)
+
+
+# Compares timings against a previous --json run and returns the results that got
+# slower than `tolerance` times the baseline.
+def find_regressions(results, baseline, tolerance):
+    previous = {_result_key(result): result for result in baseline}
+    regressions = []
+    for result in results:
+        old = previous.get(_result_key(result))
+        if old is None:
+            continue
+        for field in TIMING_FIELDS:
+            if field in result and old.get(field) and result[field] > old[field] * tolerance:
+                regressions.append((result, field, old[field]))
+    return regressions
+
+
+def print_table(results):
+    for result in results:
+        fields = ", ".join(f"{key}={value}" for key, value in result.items() if key not in ('benchmark', 'strategy', 'case'))
+        print(f"{result['benchmark']:<8} {result.get('strategy') or result.get('case'):<24} {fields}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark RackPlanner placement strategies, model operations and GUI paths on synthetic racks.")
+    parser.add_argument("--suite", action="append", choices=SUITES,
+                        help="Suite to run; repeat for several (default: strategies and model; gui and startup need a display, e.g. xvfb-run).")
+    parser.add_argument("--heights", type=int, nargs="+", default=list(RACK_HEIGHTS), help="Rack heights for the model and gui suites (default 4 12 42 58).")
+    parser.add_argument("--catalogs", type=int, nargs="+", default=list(CATALOG_SIZES), help="Catalog sizes for the model, gui and startup suites (default 30 1000 10000).")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement; the fastest is reported (default 3).")
+    parser.add_argument("--operations", type=int, default=5000, help="Add/delete operations per churn run (default 5000).")
+    parser.add_argument("--devices", type=int, default=10000, help="Devices in the multi-rack packing run (default 10000).")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON.")
+    parser.add_argument("--compare", help="Results of an earlier --json run; exit with status 1 if any timing got slower than --tolerance allows.")
+    parser.add_argument("--tolerance", type=float, default=1.5, help="Allowed slowdown against --compare (default 1.5x).")
+    args = parser.parse_args(argv)
+
+    suites = args.suite or ['strategies', 'model']
+    results = []
+    if 'strategies' in suites:
+        results += bench_strategies(operations=args.operations, seed=args.seed) + bench_pack(args.devices, seed=args.seed)
+    if 'model' in suites:
+        results += bench_model(args.heights, args.catalogs, args.repeat, args.seed)
+    if 'gui' in suites:
+        results += bench_gui(args.heights, args.catalogs, args.repeat, args.seed)
+    if 'startup' in suites:
+        results += bench_startup(args.catalogs, args.repeat, args.seed)
+    if args.json:
+        json.dump(results, sys.stdout, indent=4)
+        print()
+    else:
+        print_table(results)
+
+    status = 0
+    for result in results:
+        if 'target_ms' in result and result['seconds'] * 1000 > result['target_ms']:
+            label = " ".join(str(value) for value in _result_key(result) if value is not None)
+            print(f"Over target: {label}: {result['seconds'] * 1000:.0f} ms (target {result['target_ms']} ms)", file=sys.stderr)
+            status = 1
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = find_regressions(results, json.load(f), args.tolerance)
+        for result, field, old in regressions:
+            label = " ".join(str(value) for value in _result_key(result) if value is not None)
+            print(f"Regression: {label}: {field} {old} -> {result[field]}", file=sys.stderr)
+        if regressions:
+            status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+import re
+
+import rackio
+from rackmodel import BUDGET_ATTRIBUTES, RackError, budget_load, catalog_index
+
+PREFERENCES = ('tight', 'roomy')
+EXACT_SEARCH_NODES = 100000
+
+_RACK_DTYPE = [('name', '<u4'), ('rack_height', '<u4'), ('count', '<u4'), ('used_u', '<u4'), ('limits', '<u4'), ('offset', '<u8')]
+_PLACEMENT_DTYPE = [('name', '<u4'), ('color', '<u4'), ('start_u_slot', '<u4'), ('size_u', '<u4'), ('load', '<u4')]
+_DEVICE_SPEC = re.compile(r'^(?:(\d+)\s*[x*]\s*)?(.+?)$', re.IGNORECASE)
+_SIZE_SPEC = re.compile(r'^(\d+)\s*U?$', re.IGNORECASE)
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise RackError("Capacity queries need NumPy (pip install numpy).")
+    return numpy
+
+
+# Free space in many racks at once: a boolean bitmap with a row per rack and a column
+# per U (column 0 is 1U), where U above a rack's height count as taken. Budget
+# totals and limits sit alongside as (rack, attribute) arrays, with no limit as
+# infinity. Queries test every rack with whole-array operations.
+class CapacityIndex:
+    def __init__(self, rack_heights, rack_ids, starts, sizes, loads=None, limits=None, names=None, custom_components=None):
+        np = _numpy()
+        self.rack_heights = heights = np.asarray(rack_heights, dtype=np.int64)
+        rack_ids = np.asarray(rack_ids, dtype=np.int64)
+        starts = np.asarray(starts, dtype=np.int64)
+        sizes = np.asarray(sizes, dtype=np.int64)
+        count = len(heights)
+        width = int(heights.max()) if count else 0
+
+        # Occupied U come from a difference array: +1 where a component starts, -1
+        # just above it, summed up each row.
+        row = rack_ids * (width + 1)
+        cells = count * (width + 1)
+        steps = np.bincount(row + starts - 1, minlength=cells) - np.bincount(row + np.minimum(starts - 1 + sizes, width), minlength=cells)
+        self.free = (np.cumsum(steps.reshape(count, width + 1)[:, :width], axis=1) == 0) & (np.arange(width) < heights[:, None])
+
+        self.totals = np.zeros((count, len(BUDGET_ATTRIBUTES)))
+        if loads is not None and len(rack_ids):
+            loads = np.nan_to_num(np.asarray(loads, dtype=float).reshape(len(rack_ids), -1))
+            for attribute in range(len(BUDGET_ATTRIBUTES)):
+                self.totals[:, attribute] = np.bincount(rack_ids, weights=loads[:, attribute], minlength=count)
+        self.limits = np.full((count, len(BUDGET_ATTRIBUTES)), np.inf)
+        if limits is not None:
+            limits = np.asarray(limits, dtype=float).reshape(count, -1)
+            self.limits = np.where(np.isnan(limits), np.inf, limits)
+        self.names = names if names is not None else [None] * count
+        self.custom_components = custom_components or {}
+        self._runs = None
+
+    def __len__(self):
+        return len(self.rack_heights)
+
+    @classmethod
+    def from_workspace(cls, workspace):
+        rack_ids, starts, sizes, loads = [], [], [], []
+        limits = []
+        for index, rack in enumerate(workspace.racks):
+            for comp in rack.components:
+                rack_ids.append(index)
+                starts.append(comp.start_u_slot)
+                sizes.append(comp.size_u)
+                loads.append(comp.load or (0,) * len(BUDGET_ATTRIBUTES))
+            limits.append([rack.budget.limits.get(attribute, float('nan')) for attribute in BUDGET_ATTRIBUTES])
+        return cls([rack.rack_height for rack in workspace.racks], rack_ids, starts, sizes, loads, limits,
+                   [rack.name for rack in workspace.racks], dict(workspace.component_categories["Custom"]))
+
+    # Reads a .rackbin project's rack index, placement records and load table
+    # straight into arrays, without building a Component per placement.
+    @classmethod
+    def from_binary_project(cls, project):
+        np = _numpy()
+        if project.version != rackio.BINARY_VERSION:
+            return cls.from_workspace(project.load_workspace(track_history=False))
+        index, placements, load_table = project.sections()
+        racks = np.frombuffer(index, dtype=_RACK_DTYPE)
+        records = np.frombuffer(placements, dtype=_PLACEMENT_DTYPE)
+        if int(racks['count'].sum()) != len(records):
+            raise ValueError(f"{project.path}: the rack index and placement records do not match.")
+        loads = np.vstack([np.zeros((1, len(BUDGET_ATTRIBUTES))), np.frombuffer(load_table, dtype='<f8').reshape(-1, len(BUDGET_ATTRIBUTES))])
+        limits = loads[racks['limits'].astype(np.int64)]
+        limits[racks['limits'] == 0] = np.nan
+        strings = project.strings()
+        return cls(racks['rack_height'], np.repeat(np.arange(len(racks)), racks['count']), records['start_u_slot'], records['size_u'],
+                   loads[records['load'].astype(np.int64)], limits, [strings[name] or None for name in racks['name']],
+                   project.custom_components())
+
+    @classmethod
+    def from_file(cls, path):
+        if rackio.is_binary_project(path):
+            with rackio.BinaryProject(path) as project:
+                return cls.from_binary_project(project)
+        return cls.from_workspace(rackio.load_project(path, track_history=False))
+
+    # Every run of free U as parallel arrays: rack, first U (numbered from 1) and
+    # length, ordered by rack and then from the bottom up.
+    def free_runs(self):
+        np = _numpy()
+        edges = np.diff(np.pad(self.free, ((0, 0), (1, 1))).astype(np.int8), axis=1)
+        racks, starts = np.nonzero(edges == 1)
+        _, ends = np.nonzero(edges == -1)
+        return racks, starts + 1, ends - starts
+
+    # Free U per rack and every rack's free runs as (rack, run) matrices of first U
+    # and length, padded with empty runs. Built by the first query and kept.
+    def _run_table(self):
+        if self._runs is None:
+            np = _numpy()
+            racks, run_starts, run_lengths = self.free_runs()
+            per_rack = np.bincount(racks, minlength=len(self))
+            width = int(per_rack.max()) if len(racks) else 0
+            column = np.arange(len(racks)) - np.repeat(np.cumsum(per_rack) - per_rack, per_rack)
+            starts = np.zeros((len(self), width), dtype=np.int64)
+            lengths = np.zeros((len(self), width), dtype=np.int64)
+            starts[racks, column] = run_starts
+            lengths[racks, column] = run_lengths
+            self._runs = (self.free.sum(axis=1), starts, lengths)
+        return self._runs
+
+    # Finds the racks that can take all the devices at once, as (name, size_u, load)
+    # tuples with load as from rackmodel.budget_load (or None), without moving
+    # anything already placed and within every budget limit. Devices are packed
+    # largest first into the smallest free run that holds them, for all racks at once;
+    # the few racks where that fails but which have enough free U in a long enough
+    # run are settled by an exact search. Returns up to `limit` matches, best first
+    # (as dicts with the rack index and name, free U and a start U per device):
+    # with 'tight' the racks left with the least free U (keeping emptier racks for
+    # larger work), with 'roomy' the most.
+    def query(self, devices, limit=None, prefer='tight'):
+        np = _numpy()
+        if prefer not in PREFERENCES:
+            raise ValueError(f"Unknown preference '{prefer}'. Use one of: {', '.join(PREFERENCES)}.")
+        if not devices:
+            raise ValueError("Give at least one device to look for.")
+        order = sorted(range(len(devices)), key=lambda i: -devices[i][1])
+        sizes = [devices[i][1] for i in order]
+        need = np.zeros(len(BUDGET_ATTRIBUTES))
+        for _, _, load in devices:
+            if load is not None:
+                need += load
+        free_u, starts, lengths = self._run_table()
+        longest = lengths.max(axis=1) if lengths.shape[1] else np.zeros(len(self), dtype=np.int64)
+        candidates = np.nonzero((free_u >= sum(sizes)) & (longest >= sizes[0])
+                                & np.all(self.totals + need <= self.limits + 1e-9, axis=1))[0]
+        starts, lengths = starts[candidates], lengths[candidates]
+        remaining = lengths.copy()
+        rows = np.arange(len(candidates))
+        packed = np.ones(len(candidates), dtype=bool)
+        slots = np.zeros((len(candidates), len(sizes)), dtype=np.int64)
+        too_big = np.iinfo(np.int64).max
+        for item, size in enumerate(sizes if len(candidates) else ()):
+            room = np.where(remaining >= size, remaining, too_big)
+            run = room.argmin(axis=1)
+            fits = room[rows, run] < too_big
+            slots[:, item] = starts[rows, run] + lengths[rows, run] - remaining[rows, run]
+            remaining[rows[fits], run[fits]] -= size
+            packed &= fits
+
+        for row in np.nonzero(~packed)[0].tolist():
+            found = _pack_exact(starts[row].tolist(), lengths[row].tolist(), sizes)
+            if found is not None:
+                slots[row], remaining[row] = found
+                packed[row] = True
+        rows = rows[packed]
+        racks = candidates[packed]
+        free_after = free_u[racks] - sum(sizes)
+        longest_after = remaining[rows].max(axis=1) if len(rows) else free_after
+        primary = free_after if prefer == 'tight' else -free_after
+        ranked = np.lexsort((racks, -longest_after, primary))[:limit]
+
+        matches = []
+        for position in ranked.tolist():
+            row, rack = rows[position], int(racks[position])
+            placed = [None] * len(devices)
+            for item, slot in zip(order, slots[row].tolist()):
+                placed[item] = (devices[item][0], slot)
+            matches.append({
+                'rack': rack,
+                'name': self.names[rack],
+                'free_u': int(free_u[rack]),
+                'free_u_after': int(free_after[position]),
+                'longest_run_after': int(longest_after[position]),
+                'slots': placed,
+            })
+        return matches
+
+
+# Depth-first search for a way to put every size (largest first) into the runs,
+# trying each distinct remaining run length once per device. Returns (start U per
+# device, remaining run lengths), or None when there is none within
+# EXACT_SEARCH_NODES steps.
+def _pack_exact(run_starts, run_lengths, sizes):
+    remaining = list(run_lengths)
+    slots = []
+    budget = [EXACT_SEARCH_NODES]
+
+    def place(item):
+        if item == len(sizes):
+            return True
+        budget[0] -= 1
+        if budget[0] < 0:
+            return False
+        size = sizes[item]
+        tried = set()
+        for run, left in enumerate(remaining):
+            if left < size or left in tried:
+                continue
+            tried.add(left)
+            slots.append(run_starts[run] + run_lengths[run] - left)
+            remaining[run] -= size
+            if place(item + 1):
+                return True
+            remaining[run] += size
+            slots.pop()
+        return False
+
+    return (slots, remaining) if place(0) else None
+
+
+# Reads device specs such as "4U Server", "2x NAS Appliance" or "3U": an optional
+# count, then a catalog name or a bare size. Returns (name, size_u, load) tuples.
+def parse_devices(specs, component_categories):
+    index = catalog_index(component_categories)
+    lowered = {name.lower(): name for name in index}
+    devices = []
+    for spec in specs:
+        match = _DEVICE_SPEC.match(spec.strip())
+        count, name = int(match.group(1) or 1), match.group(2).strip()
+        if count < 1:
+            raise ValueError(f"'{spec}': the count must be at least 1.")
+        catalog_name = name if name in index else lowered.get(name.lower())
+        if catalog_name is not None:
+            info = index[catalog_name]
+            device = (catalog_name, info['size'], budget_load(info))
+        else:
+            size = _SIZE_SPEC.match(name)
+            if size is None or int(size.group(1)) < 1:
+                raise ValueError(f"Unknown component '{name}'. Use a catalog name or a size such as 2U.")
+            device = (f"{size.group(1)}U device", int(size.group(1)), None)
+        devices.extend([device] * count)
+    return devices
@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+import argparse
+import csv
+import glob
+import json
+import os
+import sys
+import time
+
+import rackio
+from rackcapacity import PREFERENCES, CapacityIndex, parse_devices
+from rackdiff import diff_lines, diff_workspaces, merge_workspaces
+from racklint import ERROR, WARNING, json_report, junit_report, text_report, validate_files
+from rackoptimize import OPTIMIZE_STEPS, OPTIMIZE_TIME_BUDGET, layout_cost, optimize_workspace
+from rackmodel import BUDGET_ATTRIBUTES, RackError, DEFAULT_U, DEFAULT_COMPONENT_CATEGORIES, DEFAULT_COLOR, DEFAULT_STRATEGY, PLACEMENT_STRATEGIES, catalog_index, format_amount, pack_inventory
+from rackrender import EXPORT_FORMATS, export_files
+
+
+def _inventory_rows(path):
+    if path.lower().endswith('.csv'):
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            yield from csv.DictReader(f)
+        return
+    data = rackio.load_json(path)
+    if isinstance(data, dict):
+        data = data.get("devices", data)
+    if isinstance(data, dict):
+        data = [{'name': name, 'count': count} for name, count in data.items()]
+    if not isinstance(data, list):
+        raise ValueError("Inventory must be a list of devices or a mapping of device name to count.")
+    for row in data:
+        yield {'name': row} if isinstance(row, str) else row
+
+
+def load_inventory(path, component_categories):
+    index = catalog_index(component_categories)
+    devices = []
+    for line_no, row in enumerate(_inventory_rows(path), 1):
+        if not isinstance(row, dict):
+            raise ValueError(f"Inventory entry {line_no} is not a device name or an object.")
+        name = row.get('name')
+        name = name.strip() if isinstance(name, str) else ''
+        if not name:
+            raise ValueError(f"Inventory entry {line_no} has no device name.")
+        info = index.get(name, {})
+        size_u = row.get('size') or row.get('size_u') or info.get('size')
+        if not size_u:
+            raise ValueError(f"Inventory entry {line_no}: unknown component '{name}' and no size given.")
+        size_u = _whole_number(size_u, line_no, 'size')
+        if size_u < 1:
+            raise ValueError(f"Inventory entry {line_no}: size must be at least 1U.")
+        color = row.get('color') or info.get('color', DEFAULT_COLOR)
+        count = _whole_number(row.get('count') or 1, line_no, 'count')
+        if count < 0:
+            raise ValueError(f"Inventory entry {line_no}: count must not be negative.")
+        devices.extend([(name, size_u, color)] * count)
+    return devices
+
+
+# CSV cells arrive as text and JSON values as numbers; both must be whole.
+def _whole_number(value, line_no, field):
+    if isinstance(value, bool) or isinstance(value, float) and not value.is_integer():
+        raise ValueError(f"Inventory entry {line_no}: {field} must be a whole number, not {value!r}.")
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Inventory entry {line_no}: {field} must be a whole number, not {value!r}.")
+
+
+def load_catalog(path):
+    component_categories = dict(DEFAULT_COMPONENT_CATEGORIES)
+    if path:
+        component_categories["Custom"] = rackio.load_catalog(path)
+    return component_categories
+
+
+def cmd_plan(args):
+    started = time.perf_counter()
+    component_categories = load_catalog(args.catalog)
+    devices = load_inventory(args.inventory, component_categories)
+    racks, unplaced = pack_inventory(devices, args.racks, args.height, component_categories, args.strategy)
+    packed = time.perf_counter()
+
+    os.makedirs(args.out, exist_ok=True)
+    used_racks = [rack for rack in racks if rack.components]
+    width = len(str(len(racks)))
+    for number, rack in enumerate(racks, 1):
+        if not rack.components and not args.write_empty:
+            continue
+        # Each file only carries the custom components placed in it, so a large
+        # catalog is not copied into every rack.
+        rack_data = rack.to_dict()
+        custom = rack_data["custom_components"]
+        rack_data["custom_components"] = {name: custom[name] for name in dict.fromkeys(comp.name for comp in rack.components) if name in custom}
+        rackio.save_json(os.path.join(args.out, f"{args.prefix}{number:0{width}d}.json"), rack_data)
+    finished = time.perf_counter()
+
+    used_u = sum(rack.used_u for rack in racks)
+    total_u = args.racks * args.height
+    print(f"Devices placed:   {len(devices) - len(unplaced)}/{len(devices)}")
+    print(f"Racks used:       {len(used_racks)}/{args.racks} ({args.height}U)")
+    print(f"Used U:           {used_u}/{total_u}")
+    if used_racks:
+        print(f"Packing efficiency (used racks): {used_u / (len(used_racks) * args.height):.1%}")
+    print(f"Packing efficiency (all racks):  {used_u / total_u:.1%}" if total_u else "Packing efficiency (all racks):  n/a")
+    print(f"Wall time:        {finished - started:.3f}s (packing {packed - started:.3f}s)")
+    if unplaced:
+        print(f"Unplaced devices: {len(unplaced)} ({sum(size for _, size, _ in unplaced)}U)", file=sys.stderr)
+        return 1
+    return 0
+
+
+def expand_sources(paths):
+    sources = []
+    for path in paths:
+        if os.path.isdir(path):
+            sources.extend(sorted(source for ext in rackio.PROJECT_EXTENSIONS for source in glob.glob(os.path.join(path, "*" + ext))))
+        else:
+            sources.append(path)
+    return sources
+
+
+def cmd_export(args):
+    started = time.perf_counter()
+    sources = expand_sources(args.sources)
+    results = export_files(sources, args.out, args.format, args.jobs)
+    failed = 0
+    images = 0
+    for source, written, error in results:
+        if error:
+            failed += 1
+            print(f"{source}: {error}", file=sys.stderr)
+        images += len(written)
+    print(f"Exported {images} image(s) from {len(sources) - failed}/{len(sources)} file(s) to {args.out} in {time.perf_counter() - started:.3f}s")
+    return 1 if failed else 0
+
+
+def cmd_optimize(args):
+    started = time.perf_counter()
+    workspace = rackio.load_project(args.source)
+    before = [layout_cost(rack.components, rack.rack_height) for rack in workspace]
+    moved = optimize_workspace(workspace, jobs=args.jobs, seed=args.seed, max_moves=args.max_moves,
+                               steps=args.steps, time_budget=args.time_budget or None)
+    for number, (rack, cost, comps) in enumerate(zip(workspace, before, moved), 1):
+        if comps:
+            print(f"Rack {number} ({rack.name or '-'}): moved {len(comps)} component(s), cost {cost:g} -> {layout_cost(rack.components, rack.rack_height):g}")
+    rackio.save_project(args.dest, workspace)
+    print(f"Optimized {len(workspace)} rack(s), moved {sum(map(len, moved))} component(s), wrote {args.dest} in {time.perf_counter() - started:.3f}s")
+    return 0
+
+
+def cmd_capacity(args):
+    started = time.perf_counter()
+    index = CapacityIndex.from_file(args.project)
+    loaded = time.perf_counter()
+    component_categories = load_catalog(args.catalog)
+    component_categories["Custom"] = dict(index.custom_components, **component_categories["Custom"])
+    devices = parse_devices(args.devices, component_categories)
+    matches = index.query(devices, args.top or None, args.prefer)
+    finished = time.perf_counter()
+
+    if args.json:
+        json.dump([dict(match, rack=match['rack'] + 1, slots=[{'name': name, 'start_u_slot': slot} for name, slot in match['slots']])
+                   for match in matches], sys.stdout, indent=4)
+        print()
+        return 0 if matches else 1
+    for match in matches:
+        slots = ", ".join(f"{name} at {slot}U" for name, slot in match['slots'])
+        print(f"{match['rack'] + 1:>5}  {match['name'] or '-':<24} {match['free_u']:>3}U free -> {match['free_u_after']:>3}U  {slots}")
+    wanted = sum(size for _, size, _ in devices)
+    print(f"{len(matches)}{'+' if args.top and len(matches) == args.top else ''} of {len(index)} rack(s) can take {len(devices)} device(s) ({wanted}U); "
+          f"load {loaded - started:.3f}s, query {(finished - loaded) * 1000:.1f} ms", file=sys.stderr)
+    return 0 if matches else 1
+
+
+def cmd_validate(args):
+    started = time.perf_counter()
+    sources = expand_sources(args.sources)
+    if not sources:
+        raise ValueError("No rack or project files to validate.")
+    custom = rackio.load_catalog(args.catalog) if args.catalog else None
+    results = validate_files(sources, custom, args.jobs)
+    elapsed = time.perf_counter() - started
+
+    issues = [issue for _, _, _, file_issues in results for issue in file_issues]
+    errors = sum(issue['severity'] == ERROR for issue in issues)
+    warnings = sum(issue['severity'] == WARNING for issue in issues)
+    if args.format == 'json':
+        print(json_report(results))
+    elif args.format == 'junit':
+        report = junit_report(results, args.strict, elapsed)
+        if args.out:
+            with open(args.out, 'w') as f:
+                f.write(report)
+        else:
+            sys.stdout.write(report)
+    else:
+        for line in text_report(results):
+            print(line)
+    print(f"Checked {len(sources)} file(s), {sum(result[1] for result in results)} rack(s), {sum(result[2] for result in results)} placement(s): "
+          f"{errors} error(s), {warnings} warning(s) in {elapsed:.3f}s", file=sys.stderr)
+    return 1 if errors or (args.strict and warnings) else 0
+
+
+def cmd_diff(args):
+    started = time.perf_counter()
+    old = rackio.load_project(args.old, track_history=False)
+    new = rackio.load_project(args.new, track_history=False)
+    loaded = time.perf_counter()
+    diff = diff_workspaces(old, new)
+    finished = time.perf_counter()
+    if args.json:
+        json.dump(diff, sys.stdout, indent=4)
+        print()
+    else:
+        for line in diff_lines(diff):
+            print(line)
+    changed = diff['racks'] or diff['custom_components']
+    print(f"{len(diff['racks'])} rack(s) differ; load {loaded - started:.3f}s, diff {(finished - loaded) * 1000:.1f} ms", file=sys.stderr)
+    return 1 if changed else 0
+
+
+def _is_rack_file(path):
+    if rackio.is_json_lines(path) or rackio.is_binary_project(path):
+        return False
+    data = rackio.load_json(path)
+    return rackio.as_project(data) is not data
+
+
+# Works as a git merge driver (merge %O %A %B): the result replaces ours unless
+# --out is given, keeping ours' layout as a single rack file or a project.
+def cmd_merge(args):
+    base, ours, theirs = (rackio.load_project(path, track_history=False) for path in (args.base, args.ours, args.theirs))
+    merged, conflicts = merge_workspaces(base, ours, theirs)
+    dest = args.out or args.ours
+    if len(merged) == 1 and _is_rack_file(args.ours):
+        rack_data = merged.racks[0].to_dict()
+        rack_data["custom_components"] = dict(rack_data["custom_components"])
+        rackio.save_json(dest, rack_data)
+    else:
+        rackio.save_project(dest, merged)
+    for conflict in conflicts:
+        print(f"conflict ({conflict['kind']}){' in rack ' + repr(conflict['rack']) if conflict['rack'] else ''}: {conflict['message']}", file=sys.stderr)
+    print(f"Merged {len(merged)} rack(s) into {dest} with {len(conflicts)} conflict(s)", file=sys.stderr)
+    return 1 if conflicts else 0
+
+
+def cmd_serve(args):
+    from rackserver import serve
+    return serve(args.project, args.host, args.port, args.flush_interval, args.save_to)
+
+
+def cmd_convert(args):
+    started = time.perf_counter()
+    workspace = rackio.load_project(args.source)
+    loaded = time.perf_counter()
+    rackio.save_project(args.dest, workspace)
+    finished = time.perf_counter()
+    placements = sum(len(rack.components) for rack in workspace)
+    print(f"Converted {len(workspace)} rack(s), {placements} placement(s): {args.source} ({os.path.getsize(args.source)} bytes) -> "
+          f"{args.dest} ({os.path.getsize(args.dest)} bytes)")
+    print(f"Wall time: {finished - started:.3f}s (load {loaded - started:.3f}s, save {finished - loaded:.3f}s)")
+    return 0
+
+
+def _print_rack_summary(number, summary):
+    print(f"{number:>5}  {summary['name'] or '-':<24} {summary['used_u']:>4}/{summary['rack_height']:<4}U  {summary['placements']} placement(s)")
+
+
+def _print_rack(rack, number):
+    print(f"Rack {number}: {rack.name or '-'} ({rack.used_u}/{rack.rack_height}U used)")
+    for attribute, total, limit in rack.budget.summary():
+        limit_text = f" of {format_amount(attribute, limit)}" if limit is not None else ""
+        over = "  OVER" if limit is not None and total > limit else ""
+        print(f"  {BUDGET_ATTRIBUTES[attribute][0]}: {format_amount(attribute, total)}{limit_text}{over}")
+    for comp in sorted(rack.components, key=lambda comp: -comp.start_u_slot):
+        print(f"  {comp.start_u_slot:>3}U  {comp.size_u}U  {comp.name}  {comp.color}")
+    return 0
+
+
+# Binary projects are summarized from their rack index, and --rack reads only that
+# rack's records; other formats are loaded in full.
+def cmd_info(args):
+    if rackio.is_binary_project(args.project):
+        with rackio.BinaryProject(args.project) as project:
+            if args.rack is not None:
+                return _print_rack(project.load_rack(args.rack - 1, track_history=False), args.rack)
+            for index in range(len(project)):
+                _print_rack_summary(index + 1, project.rack_summary(index))
+            print(f"{len(project)} rack(s)")
+        return 0
+
+    workspace = rackio.load_project(args.project, track_history=False)
+    if args.rack is not None:
+        if not 1 <= args.rack <= len(workspace):
+            raise ValueError(f"No rack at position {args.rack}.")
+        return _print_rack(workspace.racks[args.rack - 1], args.rack)
+    for number, rack in enumerate(workspace, 1):
+        _print_rack_summary(number, {"name": rack.name, "rack_height": rack.rack_height, "placements": len(rack.components), "used_u": rack.used_u})
+    print(f"{len(workspace)} rack(s)")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="rackplanner", description="RackPlanner command-line tools.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    plan = subparsers.add_parser("plan", help="Pack an inventory of devices across many racks.")
+    plan.add_argument("inventory", help="CSV or JSON inventory with name and optional size, count and color columns.")
+    plan.add_argument("--racks", type=int, required=True, help="Number of racks available.")
+    plan.add_argument("--height", type=int, default=DEFAULT_U, help=f"Rack height in U (default {DEFAULT_U}).")
+    plan.add_argument("--strategy", choices=list(PLACEMENT_STRATEGIES), default=DEFAULT_STRATEGY, help=f"Placement strategy within each rack (default {DEFAULT_STRATEGY}).")
+    plan.add_argument("--catalog", help="Custom components JSON or JSON Lines file, as written by 'Save Custom Components'.")
+    plan.add_argument("--out", default="racks", help="Output directory for rack JSON files (default: racks).")
+    plan.add_argument("--prefix", default="rack-", help="File name prefix for rack files (default: rack-).")
+    plan.add_argument("--write-empty", action="store_true", help="Also write racks that received no devices.")
+    plan.set_defaults(func=cmd_plan)
+
+    export = subparsers.add_parser("export", help="Render saved rack or project files to images without the GUI.")
+    export.add_argument("sources", nargs="+", help="Rack or project JSON / JSON Lines files, or directories containing them.")
+    export.add_argument("--out", default="images", help="Output directory (default: images).")
+    export.add_argument("--format", choices=EXPORT_FORMATS, default="png", help="Image format (default png; svg needs no Pillow).")
+    export.add_argument("--jobs", type=int, default=None, help="Worker processes (default: one per CPU).")
+    export.set_defaults(func=cmd_export)
+
+    optimize = subparsers.add_parser("optimize", help="Rearrange every rack in a project to follow the layout rules.")
+    optimize.add_argument("source", help="Rack or project file to read.")
+    optimize.add_argument("dest", help="Project file to write (.json, .jsonl or .rackbin).")
+    optimize.add_argument("--max-moves", type=int, default=None, help="Move at most this many components per rack.")
+    optimize.add_argument("--steps", type=int, default=OPTIMIZE_STEPS, help=f"Search steps per rack (default {OPTIMIZE_STEPS}).")
+    optimize.add_argument("--time-budget", type=float, default=OPTIMIZE_TIME_BUDGET, help=f"Maximum search time per rack in seconds (default {OPTIMIZE_TIME_BUDGET}; 0 for no limit).")
+    optimize.add_argument("--seed", type=int, default=None, help="Random seed; with --time-budget 0 the result is reproducible.")
+    optimize.add_argument("--jobs", type=int, default=None, help="Worker processes (default: one per CPU).")
+    optimize.set_defaults(func=cmd_optimize)
+
+    capacity = subparsers.add_parser("capacity", help="Find the racks in a project that can still take a set of devices.")
+    capacity.add_argument("project", help="Project file (.json, .jsonl or .rackbin).")
+    capacity.add_argument("devices", nargs="+", help="Devices that must all fit: catalog names or sizes, with an optional count, e.g. '4U Server' '2x NAS Appliance' 1U.")
+    capacity.add_argument("--catalog", help="Custom components file, in addition to the project's own.")
+    capacity.add_argument("--top", type=int, default=10, help="Show at most this many racks (default 10; 0 for all).")
+    capacity.add_argument("--prefer", choices=PREFERENCES, default=PREFERENCES[0],
+                          help="Rank the fullest racks that still fit first (tight, the default) or the emptiest (roomy).")
+    capacity.add_argument("--json", action="store_true", help="Print the matches as JSON.")
+    capacity.set_defaults(func=cmd_capacity)
+
+    validate = subparsers.add_parser("validate", help="Check rack and project files for overlaps, overflow and unknown components.")
+    validate.add_argument("sources", nargs="+", help="Rack or project files, or directories containing them.")
+    validate.add_argument("--catalog", help="Custom components file to accept as known, in addition to each file's own.")
+    validate.add_argument("--format", choices=("text", "json", "junit"), default="text", help="Report format (default text).")
+    validate.add_argument("--out", help="Write the JUnit report to this file instead of standard output.")
+    validate.add_argument("--strict", action="store_true", help="Also fail on warnings (unknown components, sizes that differ from the catalog).")
+    validate.add_argument("--jobs", type=int, default=None, help="Worker processes (default: one per CPU).")
+    validate.set_defaults(func=cmd_validate)
+
+    diff = subparsers.add_parser("diff", help="List the placements added, removed and moved between two versions of a rack or project.")
+    diff.add_argument("old", help="Rack or project file (.json, .jsonl or .rackbin).")
+    diff.add_argument("new", help="Rack or project file to compare it with.")
+    diff.add_argument("--json", action="store_true", help="Print the differences as JSON.")
+    diff.set_defaults(func=cmd_diff)
+
+    merge = subparsers.add_parser("merge", help="Three-way merge of rack or project files, e.g. as a git merge driver.")
+    merge.add_argument("base", help="The common ancestor of both versions.")
+    merge.add_argument("ours", help="Our version; replaced by the result unless --out is given.")
+    merge.add_argument("theirs", help="Their version.")
+    merge.add_argument("--out", help="Write the result here instead of over ours.")
+    merge.set_defaults(func=cmd_merge)
+
+    server = subparsers.add_parser("serve", help="Serve a project over a local HTTP/JSON API.")
+    server.add_argument("project", help="Project file to load and keep up to date (.json, .jsonl or .rackbin).")
+    server.add_argument("--host", default="127.0.0.1", help="Address to listen on (default 127.0.0.1, this machine only).")
+    server.add_argument("--port", type=int, default=8080, help="Port to listen on (default 8080; 0 picks a free one).")
+    server.add_argument("--flush-interval", type=float, default=1.0, help="Write changes to disk at most this often, in seconds (default 1).")
+    server.add_argument("--save-to", help="Write changes to this file instead of the project.")
+    server.set_defaults(func=cmd_serve)
+
+    convert = subparsers.add_parser("convert", help="Convert a rack or project between JSON, JSON Lines and binary (.rackbin).")
+    convert.add_argument("source", help="Rack or project file to read.")
+    convert.add_argument("dest", help="Project file to write; the format follows the extension (.json, .jsonl or .rackbin).")
+    convert.set_defaults(func=cmd_convert)
+
+    info = subparsers.add_parser("info", help="Summarize the racks in a project, or list one rack's components.")
+    info.add_argument("project", help="Project file (.json, .jsonl or .rackbin).")
+    info.add_argument("--rack", type=int, help="List the components of this rack (numbered from 1).")
+    info.set_defaults(func=cmd_info)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except (OSError, ValueError, IndexError, RackError) as e:
+        print(f"rackplanner: error: {e}", file=sys.stderr)
+        return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+from rackmodel import Component, RackModel, Workspace
+
+# Racks are matched by name (the nth rack of a name with the nth), placements by
+# name within a rack: a placement left at the same start U is the same device, and
+# the remaining placements of a name are paired in U order. Everything else about
+# a placement (start, size, color, budget load) is its state, so a device that was
+# moved or recolored is one change, not a removal and an addition. Matching uses
+# dicts throughout, so a diff is linear in the number of placements apart from
+# sorting the few leftover placements of each name.
+
+
+def _state(comp):
+    return (comp.start_u_slot, comp.size_u, comp.color, comp.load)
+
+
+def _u_range(start_u_slot, size_u):
+    return f"{start_u_slot}U" if size_u == 1 else f"{start_u_slot}U-{start_u_slot + size_u - 1}U"
+
+
+def _rack_keys(workspace):
+    seen = {}
+    keys = []
+    for rack in workspace.racks:
+        count = seen[rack.name] = seen.get(rack.name, 0) + 1
+        keys.append((rack.name, count))
+    return keys
+
+
+# Pairs the components of two versions of a rack. Returns (pairs of (old, new),
+# removed old components, added new components).
+def match_components(old, new):
+    old_by_name = {}
+    for comp in old:
+        old_by_name.setdefault(comp.name, {}).setdefault(comp.start_u_slot, []).append(comp)
+    pairs, added = [], []
+    leftover_new = {}
+    for comp in new:
+        at_start = old_by_name.get(comp.name, {}).get(comp.start_u_slot)
+        if at_start:
+            pairs.append((at_start.pop(), comp))
+        else:
+            leftover_new.setdefault(comp.name, []).append(comp)
+    removed = []
+    for name, by_start in old_by_name.items():
+        leftover_old = sorted((comp for comps in by_start.values() for comp in comps), key=lambda comp: comp.start_u_slot)
+        leftover = sorted(leftover_new.pop(name, []), key=lambda comp: comp.start_u_slot)
+        pairs.extend(zip(leftover_old, leftover))
+        removed.extend(leftover_old[len(leftover):])
+        added.extend(leftover[len(leftover_old):])
+    for comps in leftover_new.values():
+        added.extend(comps)
+    return pairs, removed, added
+
+
+def _placement_change(old, new):
+    fields = {}
+    if old.size_u != new.size_u:
+        fields['size_u'] = [old.size_u, new.size_u]
+    if old.color != new.color:
+        fields['color'] = [old.color, new.color]
+    if old.load != new.load:
+        fields['load'] = [list(old.load) if old.load else None, list(new.load) if new.load else None]
+    if not fields:
+        return {'op': 'move', 'name': new.name, 'from_u': old.start_u_slot, 'start_u_slot': new.start_u_slot, 'size_u': new.size_u}
+    return {'op': 'change', 'name': new.name, 'from_u': old.start_u_slot, 'start_u_slot': new.start_u_slot, 'size_u': new.size_u, 'fields': fields}
+
+
+# The changes that turn one version of a rack into another, as dicts with an 'op'
+# of rack_height, limits, add, remove, move (start U only) or change (anything
+# else, with the differing fields as [old, new]).
+def diff_rack(old, new):
+    changes = []
+    if old.rack_height != new.rack_height:
+        changes.append({'op': 'rack_height', 'from': old.rack_height, 'to': new.rack_height})
+    if old.budget.limits != new.budget.limits:
+        changes.append({'op': 'limits', 'from': dict(old.budget.limits), 'to': dict(new.budget.limits)})
+    pairs, removed, added = match_components(old.components, new.components)
+    for comp in removed:
+        changes.append({'op': 'remove', 'name': comp.name, 'start_u_slot': comp.start_u_slot, 'size_u': comp.size_u})
+    for old_comp, new_comp in pairs:
+        if _state(old_comp) != _state(new_comp):
+            changes.append(_placement_change(old_comp, new_comp))
+    for comp in added:
+        changes.append({'op': 'add', 'name': comp.name, 'start_u_slot': comp.start_u_slot, 'size_u': comp.size_u})
+    return changes
+
+
+# Differences between two workspaces: a dict per rack that was added, removed or
+# changed (with its changes), in the new workspace's order and then the removed
+# racks, followed by custom components that were added, removed or redefined.
+def diff_workspaces(old, new):
+    old_racks = dict(zip(_rack_keys(old), old.racks))
+    new_keys = _rack_keys(new)
+    racks = []
+    for key, rack in zip(new_keys, new.racks):
+        old_rack = old_racks.pop(key, None)
+        if old_rack is None:
+            racks.append({'rack': rack.name, 'status': 'added', 'placements': len(rack.components)})
+            continue
+        changes = diff_rack(old_rack, rack)
+        if changes:
+            racks.append({'rack': rack.name, 'status': 'changed', 'changes': changes})
+    for (name, _), rack in old_racks.items():
+        racks.append({'rack': name, 'status': 'removed', 'placements': len(rack.components)})
+
+    old_custom, new_custom = old.component_categories["Custom"], new.component_categories["Custom"]
+    custom = [{'component': name, 'status': 'added' if name not in old_custom else 'changed'}
+              for name, info in new_custom.items() if old_custom.get(name) != info]
+    custom.extend({'component': name, 'status': 'removed'} for name in old_custom if name not in new_custom)
+    return {'racks': racks, 'custom_components': custom}
+
+
+def diff_lines(diff):
+    lines = []
+    for rack in diff['racks']:
+        if rack['status'] != 'changed':
+            lines.append(f"{'+' if rack['status'] == 'added' else '-'} rack \"{rack['rack']}\" ({rack['placements']} placement(s))")
+            continue
+        lines.append(f"rack \"{rack['rack']}\":")
+        for change in rack['changes']:
+            op = change['op']
+            if op == 'rack_height':
+                lines.append(f"  ~ height {change['from']}U -> {change['to']}U")
+            elif op == 'limits':
+                lines.append(f"  ~ limits {change['from']} -> {change['to']}")
+            elif op in ('add', 'remove'):
+                lines.append(f"  {'+' if op == 'add' else '-'} {change['name']} at {_u_range(change['start_u_slot'], change['size_u'])}")
+            else:
+                moved = f"{change['from_u']}U -> " if change['from_u'] != change['start_u_slot'] else ""
+                details = "".join(f", {field} {old} -> {new}" for field, (old, new) in change.get('fields', {}).items())
+                lines.append(f"  {'>' if op == 'move' else '~'} {change['name']} {moved}{_u_range(change['start_u_slot'], change['size_u'])}{details}")
+    for comp in diff['custom_components']:
+        lines.append(f"{'+' if comp['status'] == 'added' else '-' if comp['status'] == 'removed' else '~'} custom component \"{comp['component']}\"")
+    return lines
+
+
+def _conflict(rack, kind, message):
+    return {'rack': rack, 'kind': kind, 'message': message}
+
+
+def _describe(name, state):
+    return f"removed {name}" if state is None else f"{name} at {_u_range(state[0], state[1])}"
+
+
+# Three-way merge of a value where None means absent: a side that left it as in
+# base takes the other side's version. Returns (value, conflicted); a conflict
+# keeps ours.
+def _merge_value(base, ours, theirs):
+    if ours == theirs or theirs == base:
+        return ours, False
+    if ours == base:
+        return theirs, False
+    return ours, True
+
+
+# Merges one rack. Each placement in base takes whichever side changed it (ours when
+# both changed it differently, which is a conflict), and placements added on either
+# side are kept, once if both added the same. Then collisions are resolved in one
+# pass: the placements in their ours state, which never overlap each other, are
+# marked in an owner-per-U table first, and those from theirs are added in U
+# order. One that collides, or no longer fits the merged height, goes back to its
+# state in ours, evicting (and so reverting in turn) any placement from theirs
+# already there. Each placement reverts at most once, so this is linear in the
+# placements and the rack's height. Returns (rack height, limits, components,
+# conflicts).
+def merge_rack(name, base, ours, theirs):
+    conflicts = []
+    rack_height, conflicted = _merge_value(base.rack_height, ours.rack_height, theirs.rack_height)
+    if conflicted:
+        conflicts.append(_conflict(name, 'rack_height', f"height changed to {ours.rack_height}U and {theirs.rack_height}U; kept {ours.rack_height}U"))
+    limits, conflicted = _merge_value(base.budget.limits, ours.budget.limits, theirs.budget.limits)
+    if conflicted:
+        conflicts.append(_conflict(name, 'limits', f"limits changed to {ours.budget.limits} and {theirs.budget.limits}; kept ours"))
+
+    ours_pairs, _, ours_added = match_components(base.components, ours.components)
+    theirs_pairs, _, theirs_added = match_components(base.components, theirs.components)
+    in_ours = {id(old): new for old, new in ours_pairs}
+    in_theirs = {id(old): new for old, new in theirs_pairs}
+
+    # Merged placements as [name, state, ours state, from theirs].
+    merged = []
+    for comp in base.components:
+        base_state = _state(comp)
+        ours_comp, theirs_comp = in_ours.get(id(comp)), in_theirs.get(id(comp))
+        ours_state = _state(ours_comp) if ours_comp is not None else None
+        theirs_state = _state(theirs_comp) if theirs_comp is not None else None
+        state, conflicted = _merge_value(base_state, ours_state, theirs_state)
+        if conflicted:
+            conflicts.append(_conflict(name, 'both-changed', f"{comp.name} at {_u_range(comp.start_u_slot, comp.size_u)}: "
+                                       f"ours {_describe(comp.name, ours_state)}, theirs {_describe(comp.name, theirs_state)}; kept ours"))
+        if state is not None:
+            merged.append([comp.name, state, ours_state, state != ours_state])
+    ours_new = {(comp.name, _state(comp)) for comp in ours_added}
+    merged.extend([comp.name, _state(comp), _state(comp), False] for comp in ours_added)
+    merged.extend([comp.name, _state(comp), None, True] for comp in theirs_added if (comp.name, _state(comp)) not in ours_new)
+
+    owner = [None] * (max(rack_height, ours.rack_height) + 1)
+    for entry in merged:
+        if entry[1] is not None and not entry[3]:
+            _occupy(owner, entry)
+    for entry in sorted((entry for entry in merged if entry[3]), key=lambda entry: entry[1][0]):
+        if not entry[3]:
+            continue
+        start_u_slot, size_u = entry[1][0], entry[1][1]
+        if start_u_slot + size_u - 1 > rack_height:
+            _revert(name, owner, entry, f"does not fit in the {rack_height}U rack", conflicts)
+            continue
+        other = next((owner[u] for u in range(start_u_slot, start_u_slot + size_u) if owner[u] is not None), None)
+        if other is not None:
+            _revert(name, owner, entry, f"collides with {other[0]} at {_u_range(other[1][0], other[1][1])}", conflicts)
+        else:
+            _occupy(owner, entry)
+
+    placed = [entry for entry in merged if entry[1] is not None]
+    highest = max((state[0] + state[1] - 1 for _, state, _, _ in placed), default=0)
+    if highest > rack_height:
+        conflicts.append(_conflict(name, 'rack_height', f"placements reach {highest}U, above the merged height of {rack_height}U; kept {ours.rack_height}U"))
+        rack_height = max(ours.rack_height, highest)
+    return rack_height, limits, [Component(entry[0], *entry[1]) for entry in placed], conflicts
+
+
+def _occupy(owner, entry):
+    start_u_slot, size_u = entry[1][0], entry[1][1]
+    for u in range(start_u_slot, min(start_u_slot + size_u, len(owner))):
+        owner[u] = entry
+
+
+def _release(owner, entry):
+    start_u_slot, size_u = entry[1][0], entry[1][1]
+    for u in range(start_u_slot, min(start_u_slot + size_u, len(owner))):
+        if owner[u] is entry:
+            owner[u] = None
+
+
+# Puts a placement from theirs back to its state in ours (or leaves it out if ours
+# does not have it). Placements from theirs found in that spot are reverted too.
+def _revert(name, owner, entry, reason, conflicts):
+    pending = [(entry, reason)]
+    while pending:
+        entry, reason = pending.pop()
+        if not entry[3]:
+            continue
+        _release(owner, entry)
+        kept = f"kept ours ({_describe(entry[0], entry[2])})" if entry[2] is not None else "left it out"
+        conflicts.append(_conflict(name, 'collision', f"theirs {_describe(entry[0], entry[1])} {reason}; {kept}"))
+        entry[1], entry[3] = entry[2], False
+        if entry[1] is None:
+            continue
+        start_u_slot, size_u = entry[1][0], entry[1][1]
+        for u in range(start_u_slot, start_u_slot + size_u):
+            other = owner[u]
+            if other is not None and other is not entry:
+                _release(owner, other)
+                pending.append((other, f"collides with {entry[0]} at {_u_range(start_u_slot, size_u)}"))
+            owner[u] = entry
+
+
+# Three-way merge of whole workspaces, as git does for text: base is the common
+# ancestor of ours and theirs. Racks match by name; a rack removed on one side and
+# changed on the other is kept, as a conflict. Racks added only by theirs go
+# after ours. Custom components merge per name. Returns (merged Workspace,
+# conflicts); conflicts keep ours and are listed as dicts with the rack, a kind
+# (rack_height, limits, both-changed, collision, removed-changed,
+# custom-component) and a message.
+def merge_workspaces(base, ours, theirs):
+    base_racks = dict(zip(_rack_keys(base), base.racks))
+    theirs_racks = dict(zip(_rack_keys(theirs), theirs.racks))
+    ours_keys = _rack_keys(ours)
+    conflicts = []
+    racks = []
+    for key, rack in zip(ours_keys, ours.racks):
+        base_rack, theirs_rack = base_racks.get(key), theirs_racks.pop(key, None)
+        if base_rack is None:
+            if theirs_rack is None:
+                racks.append(_unchanged(rack))
+                continue
+            base_rack = RackModel(rack.rack_height, {"Custom": {}}, track_history=False, name=rack.name, copy_categories=False)
+        elif theirs_rack is None:
+            if not diff_rack(base_rack, rack):
+                continue
+            conflicts.append(_conflict(rack.name, 'removed-changed', "removed by theirs but changed by ours; kept ours"))
+            racks.append(_unchanged(rack))
+            continue
+        rack_height, limits, components, rack_conflicts = merge_rack(rack.name, base_rack, rack, theirs_rack)
+        racks.append((rack.name, rack_height, limits, components))
+        conflicts.extend(rack_conflicts)
+    for key, rack in theirs_racks.items():
+        base_rack = base_racks.get(key)
+        if base_rack is None:
+            racks.append(_unchanged(rack))
+        elif diff_rack(base_rack, rack):
+            conflicts.append(_conflict(rack.name, 'removed-changed', "removed by ours but changed by theirs; left out"))
+
+    base_custom, ours_custom, theirs_custom = (workspace.component_categories["Custom"] for workspace in (base, ours, theirs))
+    custom = {}
+    for component in {**ours_custom, **theirs_custom, **base_custom}:
+        info, conflicted = _merge_value(base_custom.get(component), ours_custom.get(component), theirs_custom.get(component))
+        if conflicted:
+            conflicts.append(_conflict(None, 'custom-component', f"custom component '{component}' changed on both sides; kept ours"))
+        if info is not None:
+            custom[component] = info
+
+    merged = Workspace(rack_count=0, track_history=False)
+    merged.component_categories["Custom"] = custom
+    for name, rack_height, limits, components in racks:
+        rack = merged._new_rack(rack_height, name)
+        rack.budget.set_limits(limits)
+        rack._set_layout(rack_height, components)
+        merged.racks.append(rack)
+    return merged, conflicts
+
+
+def _unchanged(rack):
+    return rack.name, rack.rack_height, rack.budget.limits, [comp.copy() for comp in rack.components]
@@ -0,0 +1,461 @@
+#!/usr/bin/env python3
+import json
+import mmap
+import os
+import struct
+from contextlib import contextmanager
+
+from rackmodel import BUDGET_ATTRIBUTES, RackModel, Workspace, budget_load, rack_record, validate_catalog_entry, validate_custom_components
+
+JSON_LINES_EXTENSIONS = ('.jsonl', '.ndjson')
+BINARY_EXTENSIONS = ('.rackbin',)
+PROJECT_EXTENSIONS = ('.json',) + JSON_LINES_EXTENSIONS + BINARY_EXTENSIONS
+
+IO_CHUNK_BYTES = 1 << 20
+PROGRESS_EVERY = 1024
+
+_decoder = json.JSONDecoder()
+
+# The load and save functions take an optional progress(done, total) callback,
+# called every IO_CHUNK_BYTES bytes or PROGRESS_EVERY records. It may raise to
+# abort the operation; saves then leave any existing file untouched.
+
+
+# Text is always UTF-8, whatever the locale, so files move between systems.
+# Writes go to a temporary file next to path, which replaces path only once it is
+# complete, so a failed or cancelled save never leaves a half-written file.
+@contextmanager
+def _replacing(path, mode):
+    temp_path = path + '.tmp'
+    try:
+        with open(temp_path, mode, encoding=None if 'b' in mode else 'utf-8') as f:
+            yield f
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _read_text(path, progress):
+    if progress is None:
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read()
+    total = os.path.getsize(path)
+    chunks = []
+    done = 0
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(IO_CHUNK_BYTES)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            done += len(chunk)
+            progress(done, total)
+    return b"".join(chunks).decode('utf-8')
+
+
+def _write_text(f, text, progress):
+    if progress is None:
+        f.write(text)
+        return
+    total = len(text)
+    for start in range(0, total, IO_CHUNK_BYTES):
+        f.write(text[start:start + IO_CHUNK_BYTES])
+        progress(min(start + IO_CHUNK_BYTES, total), total)
+
+
+def load_json(path, progress=None):
+    return json.loads(_read_text(path, progress))
+
+
+def save_json(path, data, progress=None):
+    text = json.dumps(data, indent=4)
+    with _replacing(path, 'w') as f:
+        _write_text(f, text, progress)
+
+
+def is_json_lines(path):
+    return os.path.splitext(path)[1].lower() in JSON_LINES_EXTENSIONS
+
+
+# JSON Lines files hold one object per line and are parsed a line at a time, so
+# only the record being read is held as text. Records carry a "type":
+#   {"type": "component", "name": ..., "size": ..., "color": ...}
+#   {"type": "rack", "name": ..., "rack_height": ..., "placed_components": [...]}
+# Component records come first so racks can take colors from them.
+def iter_json_lines(path, progress=None):
+    decode = _decoder.raw_decode
+    total = os.path.getsize(path) if progress is not None else 0
+    done = 0
+    with open(path, 'rb') as f:
+        for line_no, line in enumerate(f, 1):
+            if progress is not None:
+                done += len(line)
+                if line_no % PROGRESS_EVERY == 0:
+                    progress(done, total)
+            line = line.decode('utf-8').strip()
+            if not line:
+                continue
+            try:
+                record, end = decode(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Line {line_no}: invalid JSON ({e.msg}).")
+            if end != len(line):
+                raise ValueError(f"Line {line_no}: invalid JSON (extra data after the object).")
+            if not isinstance(record, dict):
+                raise ValueError(f"Line {line_no}: expected a JSON object.")
+            yield line_no, record
+
+
+def component_entry(line_no, record):
+    name = record.get("name")
+    info = {"size": record.get("size"), "color": record.get("color")}
+    info.update((attribute, record[attribute]) for attribute in BUDGET_ATTRIBUTES if attribute in record)
+    try:
+        validate_catalog_entry(name, info)
+    except ValueError as e:
+        raise ValueError(f"Line {line_no}: {e}")
+    return name, info
+
+
+def _component_line(name, info):
+    return json.dumps({"type": "component", "name": name, **info}) + "\n"
+
+
+def load_catalog(path, progress=None):
+    if not is_json_lines(path):
+        return validate_custom_components(load_json(path, progress))
+    custom = {}
+    for line_no, record in iter_json_lines(path, progress):
+        if record.get("type", "component") != "component":
+            raise ValueError(f"Line {line_no}: expected a component record.")
+        name, info = component_entry(line_no, record)
+        custom[name] = info
+    return custom
+
+
+def save_catalog(path, custom, progress=None):
+    if not is_json_lines(path):
+        save_json(path, custom, progress)
+        return
+    with _replacing(path, 'w') as f:
+        for count, (name, info) in enumerate(custom.items(), 1):
+            f.write(_component_line(name, info))
+            if progress is not None and count % PROGRESS_EVERY == 0:
+                progress(count, len(custom))
+
+
+# A single saved rack, as written by "Save Rack", as a one-rack project dict;
+# anything else is returned as it is.
+def as_project(data):
+    if isinstance(data, dict) and "racks" not in data and "placed_components" in data:
+        return {"racks": [data], "custom_components": data.get("custom_components", {})}
+    return data
+
+
+# The records of a JSON Lines project in file order, as (line_no, "component",
+# (name, info)) and (line_no, "rack", rack dict). racklint reads projects through
+# this too, so validate accepts exactly what loads.
+def iter_project_lines(path, progress=None):
+    for line_no, record in iter_json_lines(path, progress):
+        kind = record.get("type")
+        if kind == "component":
+            yield line_no, kind, component_entry(line_no, record)
+        elif kind == "rack":
+            yield line_no, kind, record
+        else:
+            raise ValueError(f"Line {line_no}: unknown record type {kind!r}.")
+
+
+def load_project(path, progress=None, **kwargs):
+    if is_binary_project(path):
+        with BinaryProject(path) as project:
+            return project.load_workspace(progress=progress, **kwargs)
+    if not is_json_lines(path):
+        return Workspace.from_dict(as_project(load_json(path, progress)), **kwargs)
+
+    workspace = Workspace(rack_count=0, **kwargs)
+    custom = workspace.component_categories["Custom"]
+    for line_no, kind, value in iter_project_lines(path, progress):
+        if kind == "component":
+            name, info = value
+            custom[name] = info
+        else:
+            try:
+                workspace.load_rack(value)
+            except ValueError as e:
+                raise ValueError(f"Line {line_no}: {e}")
+    if not workspace.racks:
+        raise ValueError("Project file does not contain any racks.")
+    return workspace
+
+
+def save_project(path, workspace, progress=None):
+    if is_binary_project(path):
+        save_binary_project(path, workspace, progress)
+        return
+    if not is_json_lines(path):
+        save_json(path, workspace.to_dict(), progress)
+        return
+    with _replacing(path, 'w') as f:
+        for name, info in workspace.component_categories["Custom"].items():
+            f.write(_component_line(name, info))
+        for count, rack in enumerate(workspace.racks, 1):
+            f.write(json.dumps({"type": "rack", **rack_record(rack)}, separators=(',', ':')) + "\n")
+            if progress is not None and count % PROGRESS_EVERY == 0:
+                progress(count, len(workspace.racks))
+
+
+def is_binary_project(path):
+    return os.path.splitext(path)[1].lower() in BINARY_EXTENSIONS
+
+
+# Binary projects (.rackbin), all numbers little-endian:
+#   header        magic, version, rack count, string count, custom component
+#                 count, load count, and the offsets of the custom records,
+#                 string table and load table
+#   rack index    one fixed-size entry per rack: name, height, placement count,
+#                 used U, limits and the offset of its placement records
+#   placements    fixed-size records (name, color, start_u_slot, size_u, load)
+#   custom        fixed-size records (name, color, size, load)
+#   loads         watts, kg, btu and outlets as doubles, NaN where not given
+#   strings       (offset, length) per string, then the UTF-8 text
+# Names, colors and loads are stored once and referred to by number; load 0 means
+# none. The rack index sits at a fixed offset, so BinaryProject can summarize or
+# load one rack through mmap without reading the others. Version 1 files, written
+# before budgets existed, have no loads and are still read.
+BINARY_MAGIC = b'RKPB'
+BINARY_VERSION = 2
+_VERSION = struct.Struct('<4sH')
+_HEADER = struct.Struct('<4sHHIIIIQQQ')
+_RACK_ENTRY = struct.Struct('<IIIIIQ')
+_PLACEMENT = struct.Struct('<IIIII')
+_CUSTOM = struct.Struct('<IIII')
+_LOAD = struct.Struct('<dddd')
+_STRING = struct.Struct('<II')
+_V1_STRUCTS = (struct.Struct('<4sHHIIIQQ'), struct.Struct('<IIIIQ'), struct.Struct('<IIII'), struct.Struct('<III'))
+_MISSING = float('nan')
+
+
+def _load_values(values):
+    return tuple(_MISSING if value is None else float(value) for value in values)
+
+
+def save_binary_project(path, workspace, progress=None):
+    strings = {}
+    loads = {}
+
+    def string_id(text):
+        number = strings.get(text)
+        if number is None:
+            number = strings[text] = len(strings)
+        return number
+
+    def load_id(values):
+        if values is None:
+            return 0
+        number = loads.get(values)
+        if number is None:
+            number = loads[values] = len(loads) + 1
+        return number
+
+    records_offset = _HEADER.size + len(workspace.racks) * _RACK_ENTRY.size
+    index = bytearray()
+    records = bytearray()
+    for count, rack in enumerate(workspace.racks, 1):
+        if progress is not None and count % PROGRESS_EVERY == 0:
+            progress(count, len(workspace.racks))
+        limits = _load_values(rack.budget.limits.get(attribute) for attribute in BUDGET_ATTRIBUTES) if rack.budget.limits else None
+        index += _RACK_ENTRY.pack(string_id(rack.name or ""), rack.rack_height, len(rack.components), rack.used_u,
+                                  load_id(limits), records_offset + len(records))
+        for comp in rack.components:
+            records += _PLACEMENT.pack(string_id(comp.name), string_id(comp.color), comp.start_u_slot, comp.size_u,
+                                       load_id(_load_values(comp.load) if comp.load is not None else None))
+
+    custom = workspace.component_categories["Custom"]
+    custom_records = bytearray()
+    for name, info in custom.items():
+        attributes = _load_values(info.get(attribute) for attribute in BUDGET_ATTRIBUTES) if budget_load(info) is not None else None
+        custom_records += _CUSTOM.pack(string_id(name), string_id(info['color']), info['size'], load_id(attributes))
+
+    load_table = b"".join(_LOAD.pack(*values) for values in loads)
+    encoded = [text.encode('utf-8') for text in strings]
+    table = bytearray()
+    position = 0
+    for data in encoded:
+        table += _STRING.pack(position, len(data))
+        position += len(data)
+
+    custom_offset = records_offset + len(records)
+    loads_offset = custom_offset + len(custom_records)
+    strings_offset = loads_offset + len(load_table)
+    with _replacing(path, 'wb') as f:
+        f.write(_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, 0, len(workspace.racks), len(strings), len(custom), len(loads),
+                             custom_offset, strings_offset, loads_offset))
+        f.write(index)
+        f.write(records)
+        f.write(custom_records)
+        f.write(load_table)
+        f.write(table)
+        f.write(b"".join(encoded))
+
+
+class BinaryProject:
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"{path} is empty, not a binary project.")
+        try:
+            self._read_header()
+        except (ValueError, struct.error) as e:
+            self.close()
+            raise ValueError(f"{path} is not a valid binary project: {e}")
+        self._strings = {}
+        self._table = None
+        self._loads = {}
+
+    def _read_header(self):
+        if len(self._map) < _VERSION.size or self._map[:4] != BINARY_MAGIC:
+            raise ValueError("bad magic number")
+        self.version = _VERSION.unpack_from(self._map, 0)[1]
+        if self.version == BINARY_VERSION:
+            header, self._rack_struct, self._placement_struct, self._custom_struct = _HEADER, _RACK_ENTRY, _PLACEMENT, _CUSTOM
+            (_, _, _, self.rack_count, self._string_count, self._custom_count, self._load_count,
+             self._custom_offset, self._strings_offset, self._loads_offset) = header.unpack_from(self._map, 0)
+        elif self.version == 1:
+            header, self._rack_struct, self._placement_struct, self._custom_struct = _V1_STRUCTS
+            (_, _, _, self.rack_count, self._string_count, self._custom_count,
+             self._custom_offset, self._strings_offset) = header.unpack_from(self._map, 0)
+            self._load_count, self._loads_offset = 0, self._strings_offset
+        else:
+            raise ValueError(f"unsupported version {self.version}")
+        self._index_offset = header.size
+        self._text_offset = self._strings_offset + self._string_count * _STRING.size
+        if (self._index_offset + self.rack_count * self._rack_struct.size > len(self._map) or self._text_offset > len(self._map)
+                or self._custom_offset + self._custom_count * self._custom_struct.size > self._loads_offset
+                or self._loads_offset + self._load_count * _LOAD.size > self._strings_offset):
+            raise ValueError("file is truncated")
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.rack_count
+
+    def string(self, number):
+        text = self._strings.get(number)
+        if text is None:
+            if not 0 <= number < self._string_count:
+                raise ValueError(f"string {number} is out of range")
+            position, length = _STRING.unpack_from(self._map, self._strings_offset + number * _STRING.size)
+            start = self._text_offset + position
+            text = self._strings[number] = self._map[start:start + length].decode('utf-8')
+        return text
+
+    # Decodes every string at once, for loads that touch most of the file.
+    def _load_string_table(self):
+        if self._table is None:
+            entries = _STRING.iter_unpack(self._map[self._strings_offset:self._text_offset])
+            blob = self._map[self._text_offset:]
+            self._table = [blob[position:position + length].decode('utf-8') for position, length in entries]
+        return self._table
+
+    def strings(self):
+        return self._load_string_table()
+
+    # The rack index, placement records and load table as raw bytes, for readers
+    # that decode a whole project at once (see rackcapacity.py).
+    def sections(self):
+        records_offset = self._index_offset + self.rack_count * self._rack_struct.size
+        return (self._map[self._index_offset:records_offset], self._map[records_offset:self._custom_offset],
+                self._map[self._loads_offset:self._loads_offset + self._load_count * _LOAD.size])
+
+    # The budget attributes stored under a load number, as a dict without the
+    # missing ones ({} for load 0).
+    def attributes(self, number):
+        attributes = self._loads.get(number)
+        if attributes is None:
+            if not 0 <= number <= self._load_count:
+                raise ValueError(f"load {number} is out of range")
+            attributes = {}
+            if number:
+                values = _LOAD.unpack_from(self._map, self._loads_offset + (number - 1) * _LOAD.size)
+                for attribute, value in zip(BUDGET_ATTRIBUTES, values):
+                    if value == value:
+                        attributes[attribute] = int(value) if value.is_integer() else value
+            self._loads[number] = attributes
+        return attributes
+
+    def _rack_entry(self, index):
+        if not 0 <= index < self.rack_count:
+            raise IndexError(f"No rack at position {index + 1}.")
+        entry = self._rack_struct.unpack_from(self._map, self._index_offset + index * self._rack_struct.size)
+        return entry if self.version > 1 else entry[:4] + (0,) + entry[4:]
+
+    def rack_summary(self, index):
+        name, rack_height, count, used_u, limits, _ = self._rack_entry(index)
+        summary = {"name": self.string(name) or None, "rack_height": rack_height, "placements": count, "used_u": used_u}
+        if limits:
+            summary["limits"] = self.attributes(limits)
+        return summary
+
+    def rack_data(self, index):
+        name, rack_height, count, _, limits, offset = self._rack_entry(index)
+        end = offset + count * self._placement_struct.size
+        if end > self._custom_offset:
+            raise ValueError(f"Rack {index + 1}: placement records run past the end of the rack section.")
+        string = self._table.__getitem__ if self._table is not None else self.string
+        rows = self._placement_struct.iter_unpack(self._map[offset:end])
+        if self.version == 1:
+            rows = (row + (0,) for row in rows)
+        attributes = self.attributes
+        placed = [{'name': string(name_id), 'start_u_slot': start_u_slot, 'size_u': size_u, 'color': string(color_id), **attributes(load)}
+                  for name_id, color_id, start_u_slot, size_u, load in rows]
+        data = {"name": self.string(name) or None, "rack_height": rack_height, "placed_components": placed}
+        if limits:
+            data["limits"] = dict(self.attributes(limits))
+        return data
+
+    def custom_components(self):
+        end = self._custom_offset + self._custom_count * self._custom_struct.size
+        rows = self._custom_struct.iter_unpack(self._map[self._custom_offset:end])
+        if self.version == 1:
+            rows = (row + (0,) for row in rows)
+        custom = {}
+        for name_id, color_id, size, load in rows:
+            name = self.string(name_id)
+            custom[name] = validate_catalog_entry(name, {"size": size, "color": self.string(color_id), **self.attributes(load)})
+        return custom
+
+    def load_rack(self, index, **kwargs):
+        data = self.rack_data(index)
+        data["custom_components"] = self.custom_components()
+        model = RackModel.from_dict(data, name=data["name"], **kwargs)
+        model.clear_history()
+        return model
+
+    def load_workspace(self, progress=None, **kwargs):
+        workspace = Workspace(rack_count=0, **kwargs)
+        self._load_string_table()
+        workspace.component_categories["Custom"] = self.custom_components()
+        for index in range(self.rack_count):
+            if progress is not None and index % PROGRESS_EVERY == 0:
+                progress(index, self.rack_count)
+            workspace.load_rack(self.rack_data(index))
+        if not workspace.racks:
+            raise ValueError("Project file does not contain any racks.")
+        return workspace
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+import json
+import os
+import re
+
+import rackio
+from rackmodel import apply_change_record, change_record
+
+AUTOSAVE_DIR_ENV = 'RACKPLANNER_AUTOSAVE_DIR'
+COMPACT_AFTER = 500
+
+_SNAPSHOT = 'snapshot-{:06d}.jsonl'
+_JOURNAL = 'journal-{:06d}.jsonl'
+_GENERATION_FILE = re.compile(r'(snapshot|journal)-(\d+)\.jsonl$')
+_LOCK = 'lock'
+_SESSION = 'last-session.rackbin'
+
+
+def default_autosave_dir():
+    return os.environ.get(AUTOSAVE_DIR_ENV) or os.path.join(os.path.expanduser('~'), '.rackplanner', 'autosave')
+
+
+# Takes an exclusive lock on the open file without waiting, raising OSError if
+# another process holds it. The system drops the lock when the process exits,
+# however it exits, so a crash never leaves the folder claimed.
+def _lock_file(f):
+    if os.name == 'nt':
+        import msvcrt
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+    else:
+        import fcntl
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+
+# Crash recovery for the GUI. Every change a rack makes is appended to the journal
+# as one JSON line (see rackmodel.change_record), so autosaving an edit costs the
+# same however big the project is. Every COMPACT_AFTER records, and whenever the
+# workspace changes in a way the racks do not record (racks added or removed,
+# limits, custom components, a project loaded), checkpoint() starts a new
+# generation: later records go to a fresh journal while a snapshot of the
+# workspace is written on a background thread, and the previous generation's
+# files are deleted once that snapshot is complete. Recovery loads the newest
+# complete snapshot and replays its journal and any newer ones that continue it.
+# A crash loses at most the record being written, or, while the snapshot after a
+# change the journal does not record is still being written, the edits since.
+class Journal:
+    def __init__(self, folder=None):
+        self.folder = folder or default_autosave_dir()
+        self.generation = None
+        self.records = 0
+        self.workspace = None
+        self.error = None
+        self._rack_index = {}
+        self._file = None
+        self._writer = None
+        self._lock = None
+
+    def _path(self, pattern, generation):
+        return os.path.join(self.folder, pattern.format(generation))
+
+    def _generations(self):
+        snapshots, journals = set(), set()
+        try:
+            names = os.listdir(self.folder)
+        except FileNotFoundError:
+            return snapshots, journals
+        for name in names:
+            match = _GENERATION_FILE.match(name)
+            if match:
+                (snapshots if match.group(1) == 'snapshot' else journals).add(int(match.group(2)))
+        return snapshots, journals
+
+    # Claims the folder for this process by locking the lock file, which stays
+    # open (and locked) until close(). False means another running instance
+    # autosaves there. The file holds the owner's pid for people, not for the check.
+    def acquire(self):
+        os.makedirs(self.folder, exist_ok=True)
+        f = open(os.path.join(self.folder, _LOCK), 'a+')
+        try:
+            _lock_file(f)
+        except OSError:
+            f.close()
+            return False
+        f.seek(0)
+        f.truncate()
+        f.write(str(os.getpid()))
+        f.flush()
+        self._lock = f
+        return True
+
+    def recoverable(self):
+        return bool(self._generations()[0])
+
+    # Rebuilds the autosaved workspace: the newest snapshot, its journal and the
+    # newer journals that continue it. A torn last line (the crash hit mid-write)
+    # is ignored.
+    def recover(self, progress=None, **kwargs):
+        snapshots, journals = self._generations()
+        if not snapshots:
+            raise FileNotFoundError("No autosave to recover.")
+        generation = max(snapshots)
+        workspace = rackio.load_project(self._path(_SNAPSHOT, generation), progress=progress, **kwargs)
+        while generation in journals:
+            records = self._read_journal(generation)
+            header = next(records, None)
+            if header is None or (generation > max(snapshots) and not header.get('continues')):
+                break
+            for record in records:
+                apply_change_record(workspace.racks[record['rack']], record)
+            generation += 1
+        return workspace
+
+    def _read_journal(self, generation):
+        with open(self._path(_JOURNAL, generation), 'rb') as f:
+            lines = f.read().decode('utf-8').split('\n')
+        for line_no, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                if line_no == len(lines):
+                    return
+                raise ValueError(f"Autosave journal {generation}, line {line_no}: not valid JSON.")
+
+    # Starts journaling workspace, writing a first snapshot of it. Older autosave
+    # files stay until that snapshot is complete.
+    def start(self, workspace):
+        snapshots, journals = self._generations()
+        self.generation = max(snapshots | journals, default=0)
+        self.checkpoint(workspace)
+
+    # continues says the workspace only changed through journaled records since the
+    # last checkpoint, so the new journal can also be replayed after the previous
+    # one should this snapshot never be completed.
+    def checkpoint(self, workspace, continues=False):
+        self._close_file()
+        self.generation += 1
+        self.records = 0
+        self.workspace = workspace
+        self._rack_index = {id(rack): i for i, rack in enumerate(workspace.racks)}
+        for rack in workspace.racks:
+            rack.listener = self._on_change
+        generation = self.generation
+        self._file = open(self._path(_JOURNAL, generation), 'a', encoding='utf-8')
+        self._file.write(json.dumps({'continues': continues}) + '\n')
+        self._file.flush()
+        if self._writer is None:
+            from concurrent.futures import ThreadPoolExecutor
+            self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='rackplanner-autosave')
+        self._writer.submit(self._write_snapshot, workspace.copy(), generation)
+
+    # A failed snapshot keeps the older files, so recovery still works from them.
+    # Any error is kept in error (None again after the next good snapshot), as
+    # nothing waits on this thread; the GUI polls it and reports it.
+    def _write_snapshot(self, snapshot, generation):
+        try:
+            rackio.save_project(self._path(_SNAPSHOT, generation), snapshot)
+        except Exception as e:
+            self.error = e
+            return
+        self.error = None
+        snapshots, journals = self._generations()
+        for old in snapshots:
+            if old < generation:
+                os.remove(self._path(_SNAPSHOT, old))
+        for old in journals:
+            if old < generation:
+                os.remove(self._path(_JOURNAL, old))
+
+    # Racks are only added, removed or reordered between checkpoints, so the index
+    # taken at the last one still holds; racks no longer in the workspace are skipped.
+    def _on_change(self, model, change, undo):
+        index = self._rack_index.get(id(model))
+        if index is None or self.workspace.racks[index] is not model:
+            return
+        record = change_record(model, change, undo)
+        record['rack'] = index
+        self._file.write(json.dumps(record, separators=(',', ':')) + '\n')
+        self._file.flush()
+        self.records += 1
+        if self.records >= COMPACT_AFTER:
+            self.checkpoint(self.workspace, continues=True)
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    # Stops journaling and releases the folder. With discard the autosave is
+    # deleted, as after a clean exit; otherwise the next start can recover it.
+    def close(self, discard=True):
+        self._close_file()
+        if self.workspace is not None:
+            for rack in self.workspace.racks:
+                if rack.listener == self._on_change:
+                    rack.listener = None
+            self.workspace = None
+        if self._writer is not None:
+            self._writer.shutdown(wait=True)
+            self._writer = None
+        if discard:
+            self.discard()
+        # The lock file itself stays: removing it could let a process that opened it
+        # just before lock a file no one else can see any more.
+        if self._lock is not None:
+            self._lock.close()
+            self._lock = None
+
+    # The workspace at a clean exit, in the binary project format so the next start
+    # can reopen it quickly. Unlike the journal it survives close().
+    def save_session(self, workspace):
+        os.makedirs(self.folder, exist_ok=True)
+        rackio.save_binary_project(os.path.join(self.folder, _SESSION), workspace)
+
+    def has_session(self):
+        return os.path.exists(os.path.join(self.folder, _SESSION))
+
+    def load_session(self, progress=None, **kwargs):
+        return rackio.load_project(os.path.join(self.folder, _SESSION), progress=progress, **kwargs)
+
+    def discard(self):
+        snapshots, journals = self._generations()
+        for generation in snapshots:
+            os.remove(self._path(_SNAPSHOT, generation))
+        for generation in journals:
+            os.remove(self._path(_JOURNAL, generation))
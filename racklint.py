@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+import json
+import os
+
+import rackio
+from rackmodel import DEFAULT_COMPONENT_CATEGORIES, DEFAULT_U, catalog_index, is_count, validate_custom_components
+
+ERROR = 'error'
+WARNING = 'warning'
+
+# Catalog entries the workers check names against, set once per worker process
+# (see validate_files) rather than sent along with every file.
+_catalog = {}
+
+
+def _set_catalog(custom):
+    global _catalog
+    _catalog = catalog_index({**DEFAULT_COMPONENT_CATEGORIES, "Custom": custom or {}})
+
+
+def _issue(severity, code, message, rack=None, name=None, component=None, start_u=None, end_u=None):
+    return {'severity': severity, 'code': code, 'rack': rack, 'rack_name': name, 'component': component,
+            'start_u': start_u, 'end_u': end_u, 'message': message}
+
+
+def _u_range(first, last):
+    return f"{first}U" if first == last else f"{first}U-{last}U"
+
+
+# Checks one saved rack (as written by save_rack_config or inside a project) and
+# returns every problem in it, rather than stopping at the first as
+# rackmodel.parse_rack_dict does. Placements are sorted by start U and swept
+# once, keeping the placements still open at each start, so every overlapping
+# pair is reported with the U they share. custom is the file's own custom
+# components, looked up before the catalog.
+def check_rack(data, rack=1, custom=None):
+    if not isinstance(data, dict):
+        return [_issue(ERROR, 'invalid', "Rack data is not an object.", rack)]
+    name = data.get('name')
+    rack_height = data.get('rack_height', DEFAULT_U)
+    if not is_count(rack_height):
+        return [_issue(ERROR, 'invalid', f"Invalid rack height {rack_height!r}.", rack, name)]
+    records = data.get('placed_components', [])
+    if not isinstance(records, list):
+        return [_issue(ERROR, 'invalid', "placed_components must be a list.", rack, name)]
+
+    custom = custom or {}
+    issues = []
+    placements = []
+    for number, record in enumerate(records, 1):
+        if not isinstance(record, dict):
+            issues.append(_issue(ERROR, 'invalid', f"Component {number} is not an object.", rack, name, number))
+            continue
+        comp_name = record.get('name')
+        if not isinstance(comp_name, str) or not comp_name:
+            issues.append(_issue(ERROR, 'invalid', f"Component {number} has no name.", rack, name, number))
+            continue
+        start_u_slot, size_u = record.get('start_u_slot'), record.get('size_u')
+        if not is_count(start_u_slot) or not is_count(size_u):
+            issues.append(_issue(ERROR, 'invalid', f"Component {number} ('{comp_name}') has an invalid start_u_slot or size_u.", rack, name, number))
+            continue
+        end_u = start_u_slot + size_u - 1
+        if end_u > rack_height:
+            first = max(start_u_slot, rack_height + 1)
+            issues.append(_issue(ERROR, 'out-of-bounds', f"Component {number} ('{comp_name}') at {_u_range(start_u_slot, end_u)} "
+                                 f"runs past the top of the {rack_height}U rack ({_u_range(first, end_u)}).", rack, name, number, first, end_u))
+        info = custom.get(comp_name) or _catalog.get(comp_name)
+        if info is None:
+            issues.append(_issue(WARNING, 'unknown-component', f"Component {number} ('{comp_name}') at {_u_range(start_u_slot, end_u)} "
+                                 f"is not in the catalog.", rack, name, number, start_u_slot, end_u))
+        elif info.get('size') != size_u:
+            issues.append(_issue(WARNING, 'size-mismatch', f"Component {number} ('{comp_name}') at {_u_range(start_u_slot, end_u)} "
+                                 f"is {size_u}U but {info.get('size')}U in the catalog.", rack, name, number, start_u_slot, end_u))
+        placements.append((start_u_slot, end_u, number, comp_name))
+
+    placements.sort()
+    open_placements = []
+    for start_u_slot, end_u, number, comp_name in placements:
+        open_placements = [other for other in open_placements if other[1] >= start_u_slot]
+        for _, other_end, other_number, other_name in open_placements:
+            last = min(end_u, other_end)
+            issues.append(_issue(ERROR, 'overlap', f"Component {number} ('{comp_name}') overlaps component {other_number} "
+                                 f"('{other_name}') at {_u_range(start_u_slot, last)}.", rack, name, number, start_u_slot, last))
+        open_placements.append((start_u_slot, end_u, number, comp_name))
+    issues.sort(key=lambda issue: issue['component'] or 0)
+    return issues
+
+
+# The racks in a rack, project, JSON Lines or binary file, as (custom components,
+# iterable of rack dicts), read with the same rackio helpers load_project uses.
+# Single rack files count as a one-rack project.
+def _file_racks(path):
+    if rackio.is_binary_project(path):
+        project = rackio.BinaryProject(path)
+        try:
+            custom = project.custom_components()
+            return custom, [project.rack_data(index) for index in range(len(project))]
+        finally:
+            project.close()
+    if rackio.is_json_lines(path):
+        custom, racks = {}, []
+        for _, kind, value in rackio.iter_project_lines(path):
+            if kind == "component":
+                name, info = value
+                custom[name] = info
+            else:
+                racks.append(value)
+        return custom, racks
+    data = rackio.as_project(rackio.load_json(path))
+    if not isinstance(data, dict) or "racks" not in data:
+        raise ValueError("not a rack or project file")
+    custom = validate_custom_components(data.get("custom_components", {}))
+    racks = data["racks"]
+    if not isinstance(racks, list):
+        raise ValueError("racks must be a list.")
+    return custom, racks
+
+
+# Checks one file, returning (path, racks, placements, issues). A file that cannot
+# be read at all gives a single 'invalid' issue, so one bad file never stops a run.
+def validate_file(path):
+    try:
+        custom, racks = _file_racks(path)
+    except Exception as e:
+        return path, 0, 0, [_issue(ERROR, 'invalid', str(e))]
+    issues = []
+    placements = 0
+    for number, data in enumerate(racks, 1):
+        issues.extend(check_rack(data, number, custom))
+        if isinstance(data, dict) and isinstance(data.get('placed_components'), list):
+            placements += len(data['placed_components'])
+    return path, len(racks), placements, issues
+
+
+# Checks many files with one worker process per CPU (or jobs), in the order given.
+# custom adds components to the built-in catalog, as --catalog does.
+def validate_files(sources, custom=None, jobs=None):
+    if jobs == 1 or len(sources) < 2:
+        _set_catalog(custom)
+        return [validate_file(source) for source in sources]
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_set_catalog, initargs=(custom,)) as pool:
+        return list(pool.map(validate_file, sources, chunksize=max(len(sources) // (4 * (jobs or os.cpu_count() or 1)), 1)))
+
+
+def _location(issue):
+    if issue['rack'] is None:
+        return ""
+    return f"rack {issue['rack']}" + (f" ({issue['rack_name']})" if issue['rack_name'] else "")
+
+
+def text_report(results):
+    lines = []
+    for path, _, _, issues in results:
+        for issue in issues:
+            location = _location(issue)
+            lines.append(f"{path}: {location + ': ' if location else ''}{issue['severity']}: {issue['message']} [{issue['code']}]")
+    return lines
+
+
+def json_report(results):
+    return json.dumps([{'file': path, 'racks': racks, 'placements': placements, 'issues': issues}
+                       for path, racks, placements, issues in results], indent=4)
+
+
+# JUnit XML with a test suite per file and a test case per rack, so CI systems list
+# each failing rack. Errors are failures; warnings go to the case's system-out,
+# or fail it too with strict. A file that cannot be read is a single errored case.
+def junit_report(results, strict=False, elapsed=0.0):
+    from xml.sax.saxutils import escape, quoteattr
+    suites = []
+    total_tests = total_failures = total_errors = 0
+    for path, racks, _, issues in results:
+        by_rack = {}
+        for issue in issues:
+            by_rack.setdefault(issue['rack'], []).append(issue)
+        cases = []
+        failures = errors = 0
+        if None in by_rack:
+            errors += 1
+            message = "; ".join(issue['message'] for issue in by_rack[None])
+            cases.append(f'    <testcase classname={quoteattr(path)} name="file"><error message={quoteattr(message)}/></testcase>')
+        for number in range(1, racks + 1):
+            rack_issues = by_rack.get(number, [])
+            failing = [issue for issue in rack_issues if issue['severity'] == ERROR or strict]
+            passing = [issue for issue in rack_issues if issue not in failing]
+            name = f"rack {number}" + (f" ({rack_issues[0]['rack_name']})" if rack_issues and rack_issues[0]['rack_name'] else "")
+            body = ""
+            if failing:
+                failures += 1
+                details = "\n".join(f"{issue['severity']}: {issue['message']} [{issue['code']}]" for issue in failing)
+                body += f'<failure message={quoteattr(failing[0]["message"])} type={quoteattr(failing[0]["code"])}>{escape(details)}</failure>'
+            if passing:
+                body += f"<system-out>{escape(chr(10).join(issue['message'] for issue in passing))}</system-out>"
+            cases.append(f'    <testcase classname={quoteattr(path)} name={quoteattr(name)}>{body}</testcase>')
+        tests = len(cases)
+        total_tests, total_failures, total_errors = total_tests + tests, total_failures + failures, total_errors + errors
+        suites.append(f'  <testsuite name={quoteattr(path)} tests="{tests}" failures="{failures}" errors="{errors}">\n' + "\n".join(cases) + "\n  </testsuite>")
+    return ('<?xml version="1.0" encoding="UTF-8"?>\n'
+            f'<testsuites name="rackplanner validate" tests="{total_tests}" failures="{total_failures}" errors="{total_errors}" time="{elapsed:.3f}">\n'
+            + "\n".join(suites) + "\n</testsuites>\n")
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlsplit
+
+import rackio
+from rackmodel import Workspace
+from rackprofile import LatencyHistogram
+
+OPERATIONS = ('get', 'place', 'move', 'delete', 'capacity', 'export')
+DEFAULT_MIX = 'get=50,place=20,move=15,delete=15'
+DEVICES = (('1U Server', 1), ('2U Server', 2), ('Managed Switch', 1), ('Patch Panel', 1))
+
+
+# A project of racks filled to about half their height, so places, moves and
+# deletes all have room to succeed.
+def synthetic_project(racks, rack_height=42, seed=0):
+    rng = random.Random(seed)
+    workspace = Workspace(racks, rack_height)
+    for rack in workspace.racks:
+        while rack.used_u < rack_height // 2:
+            name, size_u = rng.choice(DEVICES)
+            rack.place(name, size_u)
+    return workspace
+
+
+def parse_mix(text):
+    mix = {}
+    for item in text.split(','):
+        name, _, weight = item.partition('=')
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f"Unknown operation '{name}'. Use some of: {', '.join(OPERATIONS)}.")
+        try:
+            mix[name] = float(weight) if weight else 1.0
+        except ValueError:
+            raise ValueError(f"Bad weight for '{name}': {weight!r}.")
+    if not any(weight > 0 for weight in mix.values()):
+        raise ValueError("Give at least one operation a weight above 0.")
+    return mix
+
+
+def _request(rng, operation, racks, rack_height):
+    rack = rng.randint(1, racks)
+    if operation == 'get':
+        return 'GET', f'/racks/{rack}', None
+    if operation == 'place':
+        name, size_u = rng.choice(DEVICES)
+        return 'POST', f'/racks/{rack}/components', {'name': name, 'size_u': size_u}
+    if operation == 'move':
+        return 'PATCH', f'/racks/{rack}/components/{rng.randint(1, 8)}', {'start_u_slot': rng.randint(1, rack_height)}
+    if operation == 'delete':
+        return 'DELETE', f'/racks/{rack}/components/{rng.randint(1, 8)}', None
+    if operation == 'capacity':
+        return 'POST', '/capacity', {'devices': [f"{rng.randint(1, 4)}U"], 'top': 5}
+    return 'GET', f'/racks/{rack}/export?format=svg', None
+
+
+# One keep-alive connection sending requests back to back until the deadline.
+# Latencies go to a histogram per operation; statuses are counted as they come.
+async def _client(host, port, rng, mix, racks, rack_height, deadline, histograms, statuses):
+    reader, writer = await asyncio.open_connection(host, port)
+    operations, weights = list(mix), list(mix.values())
+    try:
+        while time.perf_counter() < deadline:
+            operation = rng.choices(operations, weights)[0]
+            method, target, payload = _request(rng, operation, racks, rack_height)
+            body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+            started = time.perf_counter()
+            writer.write(f"{method} {target} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                         f"Content-Length: {len(body)}\r\n\r\n".encode('latin-1') + body)
+            status_line = await reader.readline()
+            if not status_line:
+                raise ConnectionError("The server closed the connection.")
+            status = int(status_line.split()[1])
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                if name.strip().lower() == 'content-length':
+                    length = int(value)
+            await reader.readexactly(length)
+            histograms[operation].add((time.perf_counter() - started) * 1000)
+            statuses[status] = statuses.get(status, 0) + 1
+    finally:
+        writer.close()
+
+
+async def run_load(host, port, clients, duration, mix, racks, rack_height, seed=0):
+    histograms = {operation: LatencyHistogram() for operation in mix}
+    statuses = {}
+    started = time.perf_counter()
+    deadline = started + duration
+    await asyncio.gather(*(_client(host, port, random.Random(seed + number), mix, racks, rack_height, deadline, histograms, statuses)
+                           for number in range(clients)))
+    elapsed = time.perf_counter() - started
+    overall = LatencyHistogram()
+    for histogram in histograms.values():
+        overall.counts = [a + b for a, b in zip(overall.counts, histogram.counts)]
+        overall.count += histogram.count
+        overall.total += histogram.total
+        overall.max = max(overall.max, histogram.max)
+    return {
+        'clients': clients,
+        'seconds': round(elapsed, 3),
+        'requests': overall.count,
+        'requests_per_second': round(overall.count / elapsed, 1) if elapsed else 0.0,
+        'statuses': {str(status): count for status, count in sorted(statuses.items())},
+        'latency': overall.to_dict(),
+        'operations': {operation: histogram.to_dict() for operation, histogram in histograms.items()},
+    }
+
+
+def _free_port(host):
+    with socket.socket() as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+# Starts `rackcli.py serve` on a synthetic project in a separate process, so the
+# server has a core of its own, and waits until it accepts connections.
+def start_server(racks, rack_height, seed, directory, flush_interval):
+    path = os.path.join(directory, 'loadtest.json')
+    rackio.save_project(path, synthetic_project(racks, rack_height, seed))
+    host, port = '127.0.0.1', _free_port('127.0.0.1')
+    process = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rackcli.py'), 'serve', path,
+                                '--host', host, '--port', str(port), '--flush-interval', str(flush_interval)],
+                               stderr=subprocess.DEVNULL)
+    for _ in range(200):
+        try:
+            socket.create_connection((host, port), timeout=0.1).close()
+            return process, host, port
+        except OSError:
+            if process.poll() is not None:
+                break
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError("The server did not start.")
+
+
+def print_report(result):
+    print(f"{result['requests']} requests from {result['clients']} clients in {result['seconds']} s: "
+          f"{result['requests_per_second']} requests/s")
+    print("statuses: " + ", ".join(f"{status}={count}" for status, count in result['statuses'].items()))
+    for operation, latency in [('all', result['latency'])] + list(result['operations'].items()):
+        print(f"{operation:<9} count={latency['count']} mean={latency['mean_ms']} ms p50<={round(latency['p50_ms'], 3)} ms "
+              f"p95<={round(latency['p95_ms'], 3)} ms p99<={round(latency['p99_ms'], 3)} ms max={latency['max_ms']} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the rackplanner HTTP/JSON API with many concurrent keep-alive clients.")
+    parser.add_argument("--url", help="Server to test, e.g. http://127.0.0.1:8080 (default: start one on a synthetic project). "
+                                      "Its project changes, so point it at a copy.")
+    parser.add_argument("--clients", type=int, default=50, help="Concurrent connections (default 50).")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds to run (default 10).")
+    parser.add_argument("--mix", default=DEFAULT_MIX,
+                        help=f"Operation weights as name=weight, from {', '.join(OPERATIONS)} (default {DEFAULT_MIX}).")
+    parser.add_argument("--racks", type=int, default=100, help="Racks in the synthetic project, or in the project at --url (default 100).")
+    parser.add_argument("--rack-height", type=int, default=42, help="Rack height in the synthetic project (default 42).")
+    parser.add_argument("--flush-interval", type=float, default=1.0, help="The started server's --flush-interval (default 1).")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--min-rps", type=float, help="Exit with status 1 below this many requests per second.")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON.")
+    args = parser.parse_args(argv)
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+
+    with tempfile.TemporaryDirectory() as directory:
+        process = None
+        if args.url:
+            url = urlsplit(args.url)
+            host, port = url.hostname or '127.0.0.1', url.port or 80
+        else:
+            process, host, port = start_server(args.racks, args.rack_height, args.seed, directory, args.flush_interval)
+        try:
+            result = asyncio.run(run_load(host, port, args.clients, args.duration, mix, args.racks, args.rack_height, args.seed))
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
+
+    if args.json:
+        json.dump(result, sys.stdout, indent=4)
+        print()
+    else:
+        print_report(result)
+
+    status = 0
+    errors = sum(count for code, count in result['statuses'].items() if int(code) >= 500)
+    if errors:
+        print(f"{errors} request(s) failed with a server error.", file=sys.stderr)
+        status = 1
+    if args.min_rps is not None and result['requests_per_second'] < args.min_rps:
+        print(f"Below target: {result['requests_per_second']} requests/s (target {args.min_rps})", file=sys.stderr)
+        status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
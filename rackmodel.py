@@ -0,0 +1,1316 @@
+import copy
+import sys
+from bisect import bisect_left, bisect_right
+from collections import deque
+
+DEFAULT_U = 12
+DEFAULT_COLOR = 'skyblue'
+DEFAULT_STRATEGY = 'first-fit'
+COMPACTION_NODE_LIMIT = 200000
+DEFAULT_HISTORY_LIMIT = 1000
+
+# Optional per-component budget attributes, as (label, unit). Catalog entries and
+# saved components may carry any of them; a rack can set a limit on each.
+BUDGET_ATTRIBUTES = {
+    'watts': ('Power', 'W'),
+    'kg': ('Weight', 'kg'),
+    'btu': ('Heat', 'BTU/h'),
+    'outlets': ('Outlets', 'outlets'),
+}
+BTU_PER_WATT = 3.412
+
+DEFAULT_COMPONENT_CATEGORIES = {
+    "Networking": {
+        "UDM Pro": {"size": 1, "color": "#FFC107"},
+        "Router": {"size": 1, "color": "#FFC107"},
+        "Firewall": {"size": 1, "color": "#FFC107"},
+        "Managed Switch": {"size": 1, "color": "#FFC107"},
+        "PoE Switch": {"size": 1, "color": "#FFC107"},
+        "Media Converter": {"size": 1, "color": "#FFC107"},
+        "Modem/ONT": {"size": 1, "color": "#FFC107"}
+    },
+    "Servers": {
+        "1U Server": {"size": 1, "color": "#4CAF50"},
+        "2U Server": {"size": 2, "color": "#4CAF50"},
+        "3U Server": {"size": 3, "color": "#4CAF50"},
+        "4U Server": {"size": 4, "color": "#4CAF50"},
+        "Rackmount Workstation": {"size": 4, "color": "#4CAF50"},
+        "Mini PC/NUC": {"size": 1, "color": "#4CAF50"}
+    },
+    "Storage": {
+        "Disk Shelf": {"size": 3, "color": "#9E9E9E"},
+        "NAS Appliance": {"size": 2, "color": "#9E9E9E"},
+        "Tape Drive": {"size": 1, "color": "#9E9E9E"},
+        "HDD Enclosure": {"size": 2, "color": "#9E9E9E"}
+    },
+    "Power": {
+        "Power Strip": {"size": 1, "color": "#F44336"},
+        "UPS": {"size": 2, "color": "#F44336"},
+        "PDU": {"size": 1, "color": "#F44336"},
+        "ATS": {"size": 1, "color": "#F44336"}
+    },
+    "Management & Accessories": {
+        "Patch Panel": {"size": 1, "color": "#8BC34A"},
+        "KVM Switch": {"size": 1, "color": "#8BC34A"},
+        "Cable Management": {"size": 1, "color": "#8BC34A"},
+        "2U Shelf": {"size": 2, "color": "#8BC34A"},
+        "Rackmount Monitor/KVM Drawer": {"size": 1, "color": "#8BC34A"}
+    },
+    "Cooling": {
+        "Rackmount Fan Unit": {"size": 1, "color": "#00BCD4"}
+    },
+    "Filler": {
+        "Brush Panel": {"size": 1, "color": "#2196F3"},
+        "Blanking Panel": {"size": 1, "color": "#2196F3"},
+        "Ventilated Panel": {"size": 1, "color": "#2196F3"}
+    },
+    "Custom": {}
+}
+
+
+class RackError(Exception):
+    pass
+
+
+class NoSpaceError(RackError):
+    pass
+
+
+class InvalidPlacementError(RackError):
+    pass
+
+
+class BudgetExceededError(RackError):
+    pass
+
+
+# Free U runs kept as two parallel sorted lists, numbered bottom-up from 1 like start_u_slot.
+# Range checks bisect the lists. For first and last fit a max tree over the U
+# (each leaf holding the length of the free run starting there, 0 elsewhere) is
+# walked from the root, so both are O(log height) however fragmented the rack;
+# it is built by the first such query and then kept up to date by occupy and
+# release, so racks that are only loaded never pay for it. best_fit still scans
+# the runs, O(runs), after the tree rules out racks with no run long enough.
+class OccupancyIndex:
+    def __init__(self, height, ranges=()):
+        self.rebuild(height, ranges)
+
+    def rebuild(self, height, ranges=()):
+        self.height = height
+        self._starts = []
+        self._ends = []
+        cursor = 1
+        for start, end in sorted((s, s + n - 1) for s, n in ranges):
+            start, end = max(start, 1), min(end, height)
+            if start > end:
+                continue
+            if start > cursor:
+                self._starts.append(cursor)
+                self._ends.append(start - 1)
+            cursor = max(cursor, end + 1)
+        if cursor <= height:
+            self._starts.append(cursor)
+            self._ends.append(height)
+        self.free_u = sum(e - s + 1 for s, e in zip(self._starts, self._ends))
+        self._tree = None
+
+    def copy(self):
+        other = OccupancyIndex.__new__(OccupancyIndex)
+        other.height, other._starts, other._ends, other.free_u = self.height, list(self._starts), list(self._ends), self.free_u
+        other._tree = list(self._tree) if self._tree is not None else None
+        return other
+
+    def _run_tree(self):
+        if self._tree is None:
+            leaves = 1
+            while leaves < self.height:
+                leaves *= 2
+            tree = [0] * (2 * leaves)
+            for start, end in zip(self._starts, self._ends):
+                tree[leaves + start - 1] = end - start + 1
+            for i in range(leaves - 1, 0, -1):
+                tree[i] = max(tree[2 * i], tree[2 * i + 1])
+            self._tree = tree
+        return self._tree
+
+    def _set_run(self, start, length):
+        tree = self._tree
+        if tree is None:
+            return
+        i = len(tree) // 2 + start - 1
+        tree[i] = length
+        i //= 2
+        while i:
+            longest = max(tree[2 * i], tree[2 * i + 1])
+            if tree[i] == longest:
+                break
+            tree[i] = longest
+            i //= 2
+
+    @property
+    def used_u(self):
+        return self.height - self.free_u
+
+    @property
+    def highest_used_u(self):
+        if self._ends and self._ends[-1] == self.height:
+            return self._starts[-1] - 1
+        return self.height
+
+    def free_runs(self):
+        return list(zip(self._starts, self._ends))
+
+    def is_free(self, start_u_slot, size_u):
+        end = start_u_slot + size_u - 1
+        if start_u_slot < 1 or end > self.height:
+            return False
+        i = bisect_right(self._starts, start_u_slot) - 1
+        return i >= 0 and self._ends[i] >= end
+
+    # Leaf (numbered from 1) of the lowest or, with highest, the topmost run at
+    # least size_u long, or None.
+    def _find_run(self, size_u, highest=False):
+        tree = self._run_tree()
+        if tree[1] < size_u:
+            return None
+        leaves = len(tree) // 2
+        i = 1
+        while i < leaves:
+            i *= 2
+            if highest:
+                if tree[i + 1] >= size_u:
+                    i += 1
+            elif tree[i] < size_u:
+                i += 1
+        return i - leaves + 1
+
+    def first_fit(self, size_u):
+        return self._find_run(size_u)
+
+    def best_fit(self, size_u):
+        if self._run_tree()[1] < size_u:
+            return None
+        best, best_length = None, None
+        for start, end in zip(self._starts, self._ends):
+            length = end - start + 1
+            if length >= size_u and (best is None or length < best_length):
+                best, best_length = start, length
+                if length == size_u:
+                    break
+        return best
+
+    def last_fit(self, size_u):
+        start = self._find_run(size_u, highest=True)
+        if start is None:
+            return None
+        return start + self._tree[len(self._tree) // 2 + start - 1] - size_u
+
+    def occupy(self, start_u_slot, size_u):
+        end = start_u_slot + size_u - 1
+        i = bisect_right(self._starts, start_u_slot) - 1
+        if start_u_slot < 1 or i < 0 or self._ends[i] < end:
+            raise ValueError(f"U{start_u_slot}-U{end} is not free")
+        run_start, run_end = self._starts[i], self._ends[i]
+        starts, ends = [], []
+        self._set_run(run_start, 0)
+        if run_start < start_u_slot:
+            starts.append(run_start)
+            ends.append(start_u_slot - 1)
+            self._set_run(run_start, start_u_slot - run_start)
+        if end < run_end:
+            starts.append(end + 1)
+            ends.append(run_end)
+            self._set_run(end + 1, run_end - end)
+        self._starts[i:i + 1] = starts
+        self._ends[i:i + 1] = ends
+        self.free_u -= size_u
+
+    def release(self, start_u_slot, size_u):
+        end = min(start_u_slot + size_u - 1, self.height)
+        if start_u_slot < 1 or start_u_slot > end:
+            return
+        i = bisect_left(self._starts, start_u_slot)
+        if (i < len(self._starts) and self._starts[i] <= end) or (i > 0 and self._ends[i - 1] >= start_u_slot):
+            raise ValueError(f"U{start_u_slot}-U{end} is not occupied")
+        self._insert_free(i, start_u_slot, end)
+
+    def resize(self, height):
+        if height > self.height:
+            old_height = self.height
+            self.height = height
+            self._tree = None
+            self._insert_free(len(self._starts), old_height + 1, height)
+            return
+        i = bisect_right(self._starts, height)
+        del self._starts[i:]
+        del self._ends[i:]
+        if self._ends and self._ends[-1] > height:
+            self._ends[-1] = height
+        self.height = height
+        self.free_u = sum(e - s + 1 for s, e in zip(self._starts, self._ends))
+        self._tree = None
+
+    def _insert_free(self, i, start, end):
+        lo, hi = i, i
+        new_start, new_end = start, end
+        if i > 0 and self._ends[i - 1] == start - 1:
+            lo = i - 1
+            new_start = self._starts[lo]
+        if i < len(self._starts) and self._starts[i] == end + 1:
+            hi = i + 1
+            new_end = self._ends[i]
+            self._set_run(end + 1, 0)
+        self._set_run(new_start, new_end - new_start + 1)
+        self._starts[lo:hi] = [new_start]
+        self._ends[lo:hi] = [new_end]
+        self.free_u += end - start + 1
+
+
+# A placed component. Names and colors are interned, so racks full of the same
+# parts share one string per distinct value, and __slots__ keeps each placement
+# to a fixed handful of pointers instead of a dict. Saved files still use the
+# plain dict written by component_record.
+class Component:
+    __slots__ = ('name', 'start_u_slot', 'size_u', 'color', 'load')
+
+    def __init__(self, name, start_u_slot, size_u, color=DEFAULT_COLOR, load=None):
+        self.name = sys.intern(name)
+        self.start_u_slot = start_u_slot
+        self.size_u = size_u
+        self.color = sys.intern(color or DEFAULT_COLOR)
+        self.load = load
+
+    @classmethod
+    def from_record(cls, record):
+        return cls(record['name'], record['start_u_slot'], record['size_u'], record.get('color', DEFAULT_COLOR), budget_load(record))
+
+    def copy(self):
+        return Component(self.name, self.start_u_slot, self.size_u, self.color, self.load)
+
+    def __repr__(self):
+        return f"Component({self.name!r}, {self.start_u_slot}, {self.size_u}, {self.color!r})"
+
+
+def component_record(comp):
+    record = {'name': comp.name, 'start_u_slot': comp.start_u_slot, 'size_u': comp.size_u, 'color': comp.color}
+    if comp.load is not None:
+        record.update(zip(BUDGET_ATTRIBUTES, comp.load))
+    return record
+
+
+def _is_amount(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and value >= 0
+
+
+# The (watts, kg, btu, outlets) a catalog entry or saved component adds to a rack,
+# or None when it has none of the budget attributes. Heat defaults to what its
+# power draw gives off.
+def budget_load(info):
+    if not any(attribute in info for attribute in BUDGET_ATTRIBUTES):
+        return None
+    load = []
+    for attribute in BUDGET_ATTRIBUTES:
+        value = info.get(attribute, 0)
+        if not _is_amount(value):
+            raise ValueError(f"Invalid {attribute} value {value!r}.")
+        load.append(value)
+    if 'btu' not in info:
+        load[2] = round(load[0] * BTU_PER_WATT, 1)
+    return tuple(load)
+
+
+# Checks a saved limits mapping and returns it without unset attributes.
+def validate_limits(limits):
+    if limits is None:
+        return {}
+    if not isinstance(limits, dict):
+        raise ValueError("limits must be a mapping of attribute to value.")
+    for attribute, value in limits.items():
+        if attribute not in BUDGET_ATTRIBUTES:
+            raise ValueError(f"Unknown budget attribute '{attribute}'.")
+        if value is not None and not _is_amount(value):
+            raise ValueError(f"Invalid {attribute} limit {value!r}.")
+    return {attribute: limits[attribute] for attribute in BUDGET_ATTRIBUTES if limits.get(attribute) is not None}
+
+
+def format_amount(attribute, value):
+    return f"{round(value, 1):g} {BUDGET_ATTRIBUTES[attribute][1]}"
+
+
+# Running power, weight, heat and outlet totals for one rack. Placing a component
+# adds its load and removing one subtracts it, so checking a placement against the
+# limits costs the same on a full rack as on an empty one.
+class RackBudget:
+    def __init__(self, limits=None):
+        self.totals = [0] * len(BUDGET_ATTRIBUTES)
+        self.limits = {}
+        self.set_limits(limits)
+
+    def set_limits(self, limits):
+        self.limits = validate_limits(limits)
+
+    def add(self, load):
+        if load is not None:
+            totals = self.totals
+            for i, value in enumerate(load):
+                totals[i] += value
+
+    def remove(self, load):
+        if load is not None:
+            totals = self.totals
+            for i, value in enumerate(load):
+                totals[i] -= value
+
+    def rebuild(self, components):
+        self.totals = [0] * len(BUDGET_ATTRIBUTES)
+        for comp in components:
+            self.add(comp.load)
+
+    def total(self, attribute):
+        return self.totals[list(BUDGET_ATTRIBUTES).index(attribute)]
+
+    # (attribute, total, limit) for every attribute that has a total or a limit.
+    def summary(self):
+        return [(attribute, total, self.limits.get(attribute)) for attribute, total in zip(BUDGET_ATTRIBUTES, self.totals)
+                if total or attribute in self.limits]
+
+    def exceeded(self, load=None):
+        if not self.limits:
+            return []
+        over = []
+        for i, attribute in enumerate(BUDGET_ATTRIBUTES):
+            limit = self.limits.get(attribute)
+            total = self.totals[i] + (load[i] if load is not None else 0)
+            if limit is not None and total > limit + 1e-9:
+                over.append((attribute, total, limit))
+        return over
+
+
+def rack_record(rack):
+    record = {'name': rack.name, 'rack_height': rack.rack_height, 'placed_components': [component_record(comp) for comp in rack.components]}
+    if rack.budget.limits:
+        record['limits'] = dict(rack.budget.limits)
+    return record
+
+
+def catalog_index(component_categories):
+    index = {}
+    for category_items in component_categories.values():
+        for name, info in category_items.items():
+            index.setdefault(name, info)
+    return index
+
+
+# Built-in categories are indexed once by name. "Custom" is read directly because
+# it is edited and replaced while the app runs, so the index never goes stale.
+def catalog_lookup(component_categories):
+    index = catalog_index({category: items for category, items in component_categories.items() if category != "Custom"})
+
+    def lookup(name):
+        info = index.get(name)
+        if info is None:
+            info = component_categories["Custom"].get(name)
+        return info
+    return lookup
+
+
+# Type-ahead search over the component catalog for the palette. Each entry gets a
+# lowercase key of "name category NU" and every query term must be a substring of
+# it. A trigram index narrows terms of three or more characters to a short
+# candidate list, and a query that extends the previous one only re-checks the
+# previous matches. Entries are only ever appended; redefining a name retires the
+# old entry.
+class CatalogSearch:
+    def __init__(self, component_categories=None):
+        self.rebuild(component_categories or {})
+
+    def rebuild(self, component_categories):
+        self.entries = []
+        self._keys = []
+        self._grams = {}
+        self._positions = {}
+        self._category_rank = {}
+        self._in_order = True
+        self._last_query = None
+        self._last_result = None
+        for category, items in component_categories.items():
+            for name, info in items.items():
+                self.add(category, name, info)
+
+    def __len__(self):
+        return len(self._positions)
+
+    def add(self, category, name, info):
+        previous = self._positions.get((category, name))
+        if previous is not None:
+            self.entries[previous] = None
+            self._keys[previous] = None
+        if category not in self._category_rank:
+            self._category_rank[category] = len(self._category_rank)
+        elif self.entries and self._last_category() != category:
+            self._in_order = False
+
+        index = len(self.entries)
+        key = f"{name} {category} {info['size']}u".lower()
+        self.entries.append((category, name, info['size'], info.get('color', DEFAULT_COLOR)))
+        self._keys.append(key)
+        self._positions[(category, name)] = index
+        for gram in {key[i:i + 3] for i in range(len(key) - 2)}:
+            self._grams.setdefault(gram, []).append(index)
+        self._last_query = None
+        return index
+
+    def _last_category(self):
+        for entry in reversed(self.entries):
+            if entry is not None:
+                return entry[0]
+        return None
+
+    def search(self, query=""):
+        query = query.strip().lower()
+        terms = query.split()
+        if self._last_query is not None and query.startswith(self._last_query):
+            candidates = self._last_result
+        else:
+            candidates = range(len(self.entries))
+        for term in terms:
+            for i in range(len(term) - 2):
+                postings = self._grams.get(term[i:i + 3], ())
+                if len(postings) < len(candidates):
+                    candidates = postings
+
+        keys = self._keys
+        result = [i for i in candidates if keys[i] is not None and all(term in keys[i] for term in terms)]
+        if not self._in_order:
+            rank = self._category_rank
+            entries = self.entries
+            result.sort(key=lambda i: (rank[entries[i][0]], i))
+        self._last_query, self._last_result = query, result
+        return result
+
+
+def is_count(value):
+    return isinstance(value, int) and not isinstance(value, bool) and value >= 1
+
+
+def validate_catalog_entry(name, info):
+    if not (isinstance(name, str) and name and isinstance(info, dict) and 'size' in info and 'color' in info):
+        raise ValueError("Invalid format for custom component data.")
+    if not is_count(info['size']):
+        raise ValueError(f"Custom component '{name}' has an invalid size {info['size']!r}.")
+    if not isinstance(info['color'], str):
+        raise ValueError(f"Custom component '{name}' has an invalid color {info['color']!r}.")
+    try:
+        budget_load(info)
+    except ValueError as e:
+        raise ValueError(f"Custom component '{name}': {e}")
+    return info
+
+
+def validate_custom_components(data):
+    if not isinstance(data, dict):
+        raise ValueError("Loaded data is not in the expected dictionary format.")
+    for name, info in data.items():
+        validate_catalog_entry(name, info)
+    return data
+
+
+# Checks a saved rack (rack_height and placed_components) in a single pass and
+# returns new Components. Overlaps and out-of-range slots are caught by
+# occupying a scratch OccupancyIndex as the records are read; missing colors are
+# filled in through lookup (normally RackModel.get_component_info).
+def parse_rack_dict(data, lookup=None):
+    if not isinstance(data, dict):
+        raise ValueError("Rack data is not in the expected dictionary format.")
+    rack_height = data.get("rack_height", DEFAULT_U)
+    if not is_count(rack_height):
+        raise ValueError(f"Invalid rack height {rack_height!r}.")
+    records = data.get("placed_components", [])
+    if not isinstance(records, list):
+        raise ValueError("placed_components must be a list.")
+
+    occupancy = OccupancyIndex(rack_height)
+    components = []
+    for number, record in enumerate(records, 1):
+        if not isinstance(record, dict):
+            raise ValueError(f"Component {number} is not an object.")
+        name, start_u_slot, size_u = record.get('name'), record.get('start_u_slot'), record.get('size_u')
+        if not isinstance(name, str) or not name:
+            raise ValueError(f"Component {number} has no name.")
+        if not is_count(start_u_slot) or not is_count(size_u):
+            raise ValueError(f"Component {number} ('{name}') has an invalid start_u_slot or size_u.")
+        if not occupancy.is_free(start_u_slot, size_u):
+            raise ValueError(f"Component {number} ('{name}') at {start_u_slot}U overlaps another component or does not fit in a {rack_height}U rack.")
+        occupancy.occupy(start_u_slot, size_u)
+
+        color = record.get('color')
+        if color is not None and not isinstance(color, str):
+            raise ValueError(f"Component {number} ('{name}') has an invalid color {color!r}.")
+        try:
+            load = budget_load(record)
+        except ValueError as e:
+            raise ValueError(f"Component {number} ('{name}'): {e}")
+        if (color is None or load is None) and lookup:
+            info = lookup(name)
+            if info:
+                color = color or info.get('color')
+                load = load or budget_load(info)
+        components.append(Component(name, start_u_slot, size_u, color, load))
+    return rack_height, components
+
+
+# Each strategy maps an OccupancyIndex and a size to a start_u_slot, or None when
+# there is no contiguous run large enough. Add entries here to make them selectable.
+PLACEMENT_STRATEGIES = {
+    'first-fit': OccupancyIndex.first_fit,
+    'best-fit': OccupancyIndex.best_fit,
+    'top-down': OccupancyIndex.last_fit,
+}
+
+
+def _pack_into_gaps(sizes, gaps):
+    order = sorted(range(len(sizes)), key=lambda i: -sizes[i])
+    remaining = list(gaps)
+    assignment = [None] * len(sizes)
+    failed = set()
+
+    def search(k):
+        if k == len(order):
+            return True
+        key = (k, tuple(sorted(remaining)))
+        if key in failed:
+            return False
+        size_u = sizes[order[k]]
+        tried = set()
+        for g, free in enumerate(remaining):
+            if free < size_u or free in tried:
+                continue
+            tried.add(free)
+            remaining[g] -= size_u
+            assignment[order[k]] = g
+            if search(k + 1):
+                return True
+            remaining[g] += size_u
+        failed.add(key)
+        return False
+
+    return assignment if search(0) else None
+
+
+# Rearrange components so the free space becomes one run at the top of the rack while
+# moving as few components as possible. Branch and bound over which components stay
+# in place; the moved ones must exactly fill the gaps the kept ones leave below the
+# used-U line. Falls back to the best layout found once node_limit is exhausted.
+# Returns {component index: new start_u_slot} for the components that move.
+def plan_compaction(components, rack_height, node_limit=COMPACTION_NODE_LIMIT):
+    total = sum(comp.size_u for comp in components)
+    if total > rack_height:
+        raise RackError("Components overlap and do not fit in the rack; cannot compact.")
+    order = sorted(range(len(components)), key=lambda i: components[i].start_u_slot)
+    sizes = [comp.size_u for comp in components]
+
+    best_layout = {}
+    u = 1
+    for i in order:
+        best_layout[i] = u
+        u += sizes[i]
+    best_kept = sum(1 for i in order if best_layout[i] == components[i].start_u_slot)
+
+    candidates = [i for i in order
+                  if components[i].start_u_slot >= 1 and components[i].start_u_slot + sizes[i] - 1 <= total]
+    kept = []
+    nodes = 0
+
+    def evaluate():
+        gaps, gap_starts = [], []
+        cursor = 1
+        for i in kept:
+            if components[i].start_u_slot > cursor:
+                gap_starts.append(cursor)
+                gaps.append(components[i].start_u_slot - cursor)
+            cursor = components[i].start_u_slot + sizes[i]
+        if cursor <= total:
+            gap_starts.append(cursor)
+            gaps.append(total - cursor + 1)
+        kept_set = set(kept)
+        moved = [i for i in order if i not in kept_set]
+        assignment = _pack_into_gaps([sizes[i] for i in moved], gaps)
+        if assignment is None:
+            return None
+        layout = {i: components[i].start_u_slot for i in kept}
+        for i, g in zip(moved, assignment):
+            layout[i] = gap_starts[g]
+            gap_starts[g] += sizes[i]
+        return layout
+
+    def search(k, last_end):
+        nonlocal best_layout, best_kept, nodes
+        nodes += 1
+        if len(kept) + len(candidates) - k <= best_kept or nodes > node_limit:
+            return
+        if k == len(candidates):
+            layout = evaluate()
+            if layout is not None:
+                best_layout, best_kept = layout, len(kept)
+            return
+        i = candidates[k]
+        if components[i].start_u_slot > last_end:
+            kept.append(i)
+            search(k + 1, components[i].start_u_slot + sizes[i] - 1)
+            kept.pop()
+        search(k + 1, last_end)
+
+    search(0, 0)
+    return {i: start for i, start in best_layout.items() if start != components[i].start_u_slot}
+
+
+# One undoable edit. Only the fields the action needs are filled in:
+#   add/delete: component, index           move: component, before/after start_u_slot
+#   rename: component, before/after name   resize: before (height, [(index, removed)]), after height
+#   compact/rearrange: before/after [(component, start_u_slot)]
+#   add_group: after [(index, component)]    delete_group: before [(index, component)], both in index order
+#   replace (clear/load): before/after (height, components)
+class Change:
+    __slots__ = ('action', 'component', 'index', 'before', 'after')
+
+    def __init__(self, action, component=None, index=None, before=None, after=None):
+        self.action = action
+        self.component = component
+        self.index = index
+        self.before = before
+        self.after = after
+
+    def __repr__(self):
+        return f"Change({self.action!r}, index={self.index}, before={self.before!r}, after={self.after!r})"
+
+
+class RackModel:
+    def __init__(self, rack_height=DEFAULT_U, component_categories=None, track_history=True, placement_strategy=DEFAULT_STRATEGY,
+                 history_limit=DEFAULT_HISTORY_LIMIT, name=None, copy_categories=True, limits=None):
+        self.name = name
+        self.rack_height = rack_height
+        self.placement_strategy = placement_strategy
+        self.components = []
+        self.occupancy = OccupancyIndex(rack_height)
+        self.budget = RackBudget(limits)
+        if component_categories is None:
+            component_categories = DEFAULT_COMPONENT_CATEGORIES
+            copy_categories = True
+        if copy_categories:
+            component_categories = copy.deepcopy(component_categories)
+        self.component_categories = component_categories
+        self.component_categories.setdefault("Custom", {})
+        self._lookup = None
+
+        self.track_history = track_history
+        self._undo_stack = deque(maxlen=history_limit)
+        self._redo_stack = []
+        # Called as listener(model, change, undo) after every change is made, undone
+        # or redone, whether or not history is kept (the autosave journal uses it).
+        self.listener = None
+
+    @classmethod
+    def from_dict(cls, data, **kwargs):
+        model = cls(**kwargs)
+        model.load_dict(data)
+        return model
+
+    @property
+    def used_u(self):
+        return self.occupancy.used_u
+
+    @property
+    def free_u(self):
+        return self.occupancy.free_u
+
+    def get_component_info(self, component_name):
+        # Built on first use: packed and loaded racks that never look names up
+        # should not each carry their own index.
+        if self._lookup is None:
+            self._lookup = catalog_lookup(self.component_categories)
+        return self._lookup(component_name)
+
+    def is_slot_available(self, start_u_slot, size_u):
+        return self.occupancy.is_free(start_u_slot, size_u)
+
+    def clamp_start_u_slot(self, start_u_slot, size_u):
+        start_u_slot = max(1, start_u_slot)
+        return min(start_u_slot, self.rack_height - size_u + 1)
+
+    def find_slot(self, size_u, strategy=None):
+        try:
+            fit = PLACEMENT_STRATEGIES[strategy or self.placement_strategy]
+        except KeyError:
+            raise ValueError(f"Unknown placement strategy '{strategy or self.placement_strategy}'.")
+        return fit(self.occupancy, size_u)
+
+    def place(self, name, size_u, color=None, strategy=None, load=None):
+        self.check_budget(name, load)
+        start_u_slot = self.find_slot(size_u, strategy)
+        if start_u_slot is None:
+            raise NoSpaceError(f"Cannot place '{name}' ({size_u}U). No available contiguous space in the rack.")
+        return self.place_at(name, size_u, start_u_slot, color, load)
+
+    def place_catalog(self, name, strategy=None):
+        info = self.get_component_info(name)
+        if info is None:
+            raise KeyError(name)
+        return self.place(name, info['size'], info.get('color', DEFAULT_COLOR), strategy, budget_load(info))
+
+    def check_budget(self, name, load):
+        self._check_budget(f"'{name}'", load)
+
+    def _check_budget(self, what, load):
+        exceeded = self.budget.exceeded(load)
+        if exceeded:
+            details = ", ".join(f"{BUDGET_ATTRIBUTES[attribute][0].lower()} would reach {format_amount(attribute, total)} (limit {format_amount(attribute, limit)})"
+                                for attribute, total, limit in exceeded)
+            raise BudgetExceededError(f"Cannot place {what}: {details}.")
+
+    def place_at(self, name, size_u, start_u_slot, color=None, load=None):
+        if not self.occupancy.is_free(start_u_slot, size_u):
+            raise InvalidPlacementError(f"Cannot place '{name}' at {start_u_slot}U. Slots are occupied or out of bounds.")
+        self.check_budget(name, load)
+        comp = Component(name, start_u_slot, size_u, color, load)
+        self.occupancy.occupy(start_u_slot, size_u)
+        self.budget.add(load)
+        self.components.append(comp)
+        self._record(Change('add', comp, len(self.components) - 1))
+        return comp
+
+    def delete(self, comp):
+        index = self.index_of(comp)
+        del self.components[index]
+        self.occupancy.release(comp.start_u_slot, comp.size_u)
+        self.budget.remove(comp.load)
+        self._record(Change('delete', comp, index))
+
+    # Removes several components as one undoable step.
+    def delete_many(self, comps):
+        positions = {id(comp): i for i, comp in enumerate(self.components)}
+        removed = []
+        for comp in comps:
+            if id(comp) not in positions:
+                raise ValueError(f"Component '{comp.name}' is not in the rack.")
+            removed.append((positions[id(comp)], comp))
+        if not removed:
+            return []
+        removed.sort(key=lambda entry: entry[0])
+        self._remove_placed(removed)
+        self._record(Change('delete_group', before=removed))
+        return [comp for _, comp in removed]
+
+    # Places several components as one undoable step. Each of placements is (name,
+    # size_u, start_u_slot, color, load); the slots and the budget are checked for
+    # the whole group before anything is placed.
+    def place_many(self, placements):
+        occupancy = self.occupancy.copy()
+        total = [0] * len(BUDGET_ATTRIBUTES)
+        for name, size_u, start_u_slot, _, load in placements:
+            if not occupancy.is_free(start_u_slot, size_u):
+                raise InvalidPlacementError(f"Cannot place '{name}' at {start_u_slot}U. Slots are occupied or out of bounds.")
+            occupancy.occupy(start_u_slot, size_u)
+            for i, value in enumerate(load or ()):
+                total[i] += value
+        self._check_budget(f"{len(placements)} components", total)
+        added = []
+        for name, size_u, start_u_slot, color, load in placements:
+            added.append((len(self.components), Component(name, start_u_slot, size_u, color, load)))
+            self.components.append(added[-1][1])
+        self.occupancy = occupancy
+        for _, comp in added:
+            self.budget.add(comp.load)
+        if added:
+            self._record(Change('add_group', after=added))
+        return [comp for _, comp in added]
+
+    # Copies of comps, keeping their layout, at the nearest offset where the whole
+    # group fits: above it first, then below.
+    def duplicate(self, comps):
+        if not comps:
+            return []
+        bottom = min(comp.start_u_slot for comp in comps)
+        top = max(comp.start_u_slot + comp.size_u - 1 for comp in comps)
+        offsets = sorted(range(1 - bottom, self.rack_height - top + 1), key=lambda offset: (offset <= 0, abs(offset)))
+        for offset in offsets:
+            if offset and all(self.occupancy.is_free(comp.start_u_slot + offset, comp.size_u) for comp in comps):
+                return self.place_many([(comp.name, comp.size_u, comp.start_u_slot + offset, comp.color, comp.load) for comp in comps])
+        raise NoSpaceError(f"No room for a copy of the {len(comps)} selected component(s) ({top - bottom + 1}U).")
+
+    # Moves several components by the same number of U as one undoable step.
+    def shift(self, comps, offset):
+        positions = {id(comp): i for i, comp in enumerate(self.components)}
+        return self.rearrange({positions[id(comp)]: comp.start_u_slot + offset for comp in comps})
+
+    def index_of(self, comp):
+        for i, other in enumerate(self.components):
+            if other is comp:
+                return i
+        raise ValueError(f"Component '{comp.name}' is not in the rack.")
+
+    def rename(self, comp, new_name):
+        if not new_name or new_name == comp.name:
+            return False
+        change = Change('rename', comp, before=comp.name, after=new_name)
+        comp.name = sys.intern(new_name)
+        self._record(change)
+        return True
+
+    # A lifted component keeps its start_u_slot but no longer occupies the index,
+    # so drag validation can test targets that overlap its own footprint.
+    def lift(self, comp):
+        self.occupancy.release(comp.start_u_slot, comp.size_u)
+
+    def settle(self, comp):
+        self.occupancy.occupy(comp.start_u_slot, comp.size_u)
+
+    def drop(self, comp, start_u_slot):
+        if not self.occupancy.is_free(start_u_slot, comp.size_u):
+            self.settle(comp)
+            raise InvalidPlacementError("Cannot place component here. Slots are occupied or out of bounds.")
+        previous_start_u_slot = comp.start_u_slot
+        comp.start_u_slot = start_u_slot
+        self.settle(comp)
+        if start_u_slot != previous_start_u_slot:
+            self._record(Change('move', comp, before=previous_start_u_slot, after=start_u_slot))
+
+    def move(self, comp, start_u_slot):
+        self.lift(comp)
+        self.drop(comp, start_u_slot)
+
+    def overflowing(self, new_height):
+        return [comp for comp in self.components if comp.start_u_slot + comp.size_u - 1 > new_height]
+
+    def resize(self, new_height):
+        if new_height == self.rack_height:
+            return []
+        removed = [(i, comp) for i, comp in enumerate(self.components) if comp.start_u_slot + comp.size_u - 1 > new_height]
+        change = Change('resize', before=(self.rack_height, removed), after=new_height)
+        self._set_height(new_height, removed)
+        self._record(change)
+        return [comp for _, comp in removed]
+
+    def _set_height(self, new_height, removed=()):
+        if removed:
+            removed_ids = {id(comp) for _, comp in removed}
+            self.components = [comp for comp in self.components if id(comp) not in removed_ids]
+            for _, comp in removed:
+                self.budget.remove(comp.load)
+            self.rack_height = new_height
+            self._rebuild_occupancy()
+        else:
+            self.rack_height = new_height
+            self.occupancy.resize(new_height)
+
+    def compact(self, node_limit=COMPACTION_NODE_LIMIT):
+        moves = plan_compaction(self.components, self.rack_height, node_limit)
+        if not moves:
+            return []
+        placements = [(self.components[i], start_u_slot) for i, start_u_slot in moves.items()]
+        change = Change('compact', before=[(comp, comp.start_u_slot) for comp, _ in placements], after=placements)
+        self._set_starts(placements)
+        self._record(change)
+        return [comp for comp, _ in placements]
+
+    # Moves several components as one undoable step. moves maps component index to
+    # its new start_u_slot; the resulting layout must fit without overlaps.
+    def rearrange(self, moves):
+        moving = set(moves)
+        occupancy = OccupancyIndex(self.rack_height)
+        for i, comp in enumerate(self.components):
+            start_u_slot = moves[i] if i in moving else comp.start_u_slot
+            if not occupancy.is_free(start_u_slot, comp.size_u):
+                raise InvalidPlacementError(f"'{comp.name}' cannot go to {start_u_slot}U: the slots are occupied or out of bounds.")
+            occupancy.occupy(start_u_slot, comp.size_u)
+        placements = [(self.components[i], start_u_slot) for i, start_u_slot in moves.items()
+                      if self.components[i].start_u_slot != start_u_slot]
+        if not placements:
+            return []
+        change = Change('rearrange', before=[(comp, comp.start_u_slot) for comp, _ in placements], after=placements)
+        self._set_starts(placements)
+        self._record(change)
+        return [comp for comp, _ in placements]
+
+    def _remove_placed(self, removed):
+        removed_ids = {id(comp) for _, comp in removed}
+        self.components = [comp for comp in self.components if id(comp) not in removed_ids]
+        for _, comp in removed:
+            self.occupancy.release(comp.start_u_slot, comp.size_u)
+            self.budget.remove(comp.load)
+
+    def _insert_placed(self, placed):
+        for index, comp in placed:
+            self.components.insert(index, comp)
+            self.occupancy.occupy(comp.start_u_slot, comp.size_u)
+            self.budget.add(comp.load)
+
+    def _set_starts(self, placements):
+        for comp, start_u_slot in placements:
+            comp.start_u_slot = start_u_slot
+        self._rebuild_occupancy()
+
+    def clear(self):
+        self._replace(self.rack_height, [])
+
+    def add_custom_component(self, name, size_u, color=None, **attributes):
+        info = {"size": size_u, "color": color or DEFAULT_COLOR}
+        for attribute, value in attributes.items():
+            if attribute not in BUDGET_ATTRIBUTES:
+                raise ValueError(f"Unknown budget attribute '{attribute}'.")
+            if value is not None:
+                info[attribute] = value
+        self.component_categories["Custom"][name] = validate_catalog_entry(name, info)
+
+    def merge_custom_components(self, data):
+        self.component_categories["Custom"].update(validate_custom_components(data))
+
+    def to_dict(self):
+        data = {
+            "rack_height": self.rack_height,
+            "placed_components": [component_record(comp) for comp in self.components],
+            "custom_components": self.component_categories["Custom"]
+        }
+        if self.budget.limits:
+            data["limits"] = dict(self.budget.limits)
+        return data
+
+    # Everything in data is checked before any of it is applied, so a file that
+    # fails to load leaves the rack, its catalog and its limits as they were.
+    def load_dict(self, data):
+        if not isinstance(data, dict):
+            raise ValueError("Rack data is not in the expected dictionary format.")
+        custom = validate_custom_components(data.get("custom_components", {}))
+        limits = validate_limits(data.get("limits"))
+        layout = parse_rack_dict(data, catalog_lookup({**self.component_categories, "Custom": custom}))
+        self.component_categories["Custom"] = custom
+        self.budget.limits = limits
+        self._replace(*layout)
+
+    def _replace(self, rack_height, components):
+        change = Change('replace', before=(self.rack_height, self.components), after=(rack_height, components))
+        self._set_layout(rack_height, components)
+        self._record(change)
+
+    def _set_layout(self, rack_height, components):
+        self.rack_height = rack_height
+        self.components = list(components)
+        self._rebuild_occupancy()
+        self.budget.rebuild(self.components)
+
+    def _rebuild_occupancy(self):
+        self.occupancy.rebuild(self.rack_height, ((comp.start_u_slot, comp.size_u) for comp in self.components))
+
+    def snapshot(self):
+        return {
+            'rack_height': self.rack_height,
+            'placed_components': [component_record(comp) for comp in self.components]
+        }
+
+    def restore(self, state_data):
+        self._set_layout(state_data['rack_height'], [Component.from_record(record) for record in state_data['placed_components']])
+
+    def _record(self, change):
+        if self.listener is not None:
+            self.listener(self, change, False)
+        if not self.track_history:
+            return
+        self._undo_stack.append(change)
+        self._redo_stack.clear()
+
+    @property
+    def history_limit(self):
+        return self._undo_stack.maxlen
+
+    @history_limit.setter
+    def history_limit(self, limit):
+        self._undo_stack = deque(self._undo_stack, maxlen=limit)
+
+    @property
+    def history_size(self):
+        return len(self._undo_stack) + len(self._redo_stack)
+
+    def clear_history(self):
+        self._undo_stack.clear()
+        self._redo_stack.clear()
+
+    @property
+    def can_undo(self):
+        return bool(self._undo_stack)
+
+    @property
+    def can_redo(self):
+        return bool(self._redo_stack)
+
+    def undo(self):
+        if not self._undo_stack:
+            return None
+        change = self._undo_stack.pop()
+        self._apply(change, undo=True)
+        self._redo_stack.append(change)
+        if self.listener is not None:
+            self.listener(self, change, True)
+        return change
+
+    def redo(self):
+        if not self._redo_stack:
+            return None
+        change = self._redo_stack.pop()
+        self._apply(change, undo=False)
+        self._undo_stack.append(change)
+        if self.listener is not None:
+            self.listener(self, change, False)
+        return change
+
+    def _apply(self, change, undo):
+        action, comp = change.action, change.component
+        if action in ('add', 'delete'):
+            if (action == 'add') == undo:
+                del self.components[change.index]
+                self.occupancy.release(comp.start_u_slot, comp.size_u)
+                self.budget.remove(comp.load)
+            else:
+                self.components.insert(change.index, comp)
+                self.occupancy.occupy(comp.start_u_slot, comp.size_u)
+                self.budget.add(comp.load)
+        elif action in ('add_group', 'delete_group'):
+            placed = change.after if action == 'add_group' else change.before
+            if (action == 'add_group') == undo:
+                self._remove_placed(placed)
+            else:
+                self._insert_placed(placed)
+        elif action == 'move':
+            self.occupancy.release(comp.start_u_slot, comp.size_u)
+            comp.start_u_slot = change.before if undo else change.after
+            self.occupancy.occupy(comp.start_u_slot, comp.size_u)
+        elif action == 'rename':
+            comp.name = change.before if undo else change.after
+        elif action == 'resize':
+            old_height, removed = change.before
+            if undo:
+                for index, removed_comp in removed:
+                    self.components.insert(index, removed_comp)
+                    self.budget.add(removed_comp.load)
+                self.rack_height = old_height
+                self._rebuild_occupancy()
+            else:
+                self._set_height(change.after, removed)
+        elif action in ('compact', 'rearrange'):
+            self._set_starts(change.before if undo else change.after)
+        elif action == 'replace':
+            self._set_layout(*(change.before if undo else change.after))
+        else:
+            raise ValueError(f"Unknown history action '{action}'.")
+
+
+# A change as plain JSON data: what it does to the rack when applied in the given
+# direction, with components referred to by their index in the rack and spelled out
+# in full only when they come back (an add, an undone delete or resize). Replaying
+# the records with apply_change_record rebuilds the rack without any history.
+def change_record(model, change, undo):
+    action, comp = change.action, change.component
+    if action in ('add', 'delete'):
+        if (action == 'add') == undo:
+            return {'op': 'remove', 'index': change.index}
+        return {'op': 'insert', 'index': change.index, 'component': component_record(comp)}
+    if action in ('add_group', 'delete_group'):
+        placed = change.after if action == 'add_group' else change.before
+        if (action == 'add_group') == undo:
+            return {'op': 'remove_group', 'indexes': [index for index, _ in placed]}
+        return {'op': 'insert_group', 'components': [[index, component_record(comp)] for index, comp in placed]}
+    if action == 'move':
+        return {'op': 'move', 'index': model.index_of(comp), 'start_u_slot': change.before if undo else change.after}
+    if action == 'rename':
+        return {'op': 'rename', 'index': model.index_of(comp), 'name': change.before if undo else change.after}
+    if action == 'resize':
+        if not undo:
+            return {'op': 'resize', 'rack_height': change.after}
+        old_height, removed = change.before
+        return {'op': 'resize', 'rack_height': old_height, 'restore': [[index, component_record(comp)] for index, comp in removed]}
+    if action in ('compact', 'rearrange'):
+        return {'op': 'starts', 'moves': [[model.index_of(comp), start_u_slot] for comp, start_u_slot in (change.before if undo else change.after)]}
+    if action == 'replace':
+        rack_height, components = change.before if undo else change.after
+        return {'op': 'layout', 'rack_height': rack_height, 'components': [component_record(comp) for comp in components]}
+    raise ValueError(f"Unknown history action '{action}'.")
+
+
+def apply_change_record(model, record):
+    op, components = record['op'], model.components
+    if op == 'insert':
+        model._apply(Change('add', Component.from_record(record['component']), record['index']), undo=False)
+    elif op == 'remove':
+        model._apply(Change('delete', components[record['index']], record['index']), undo=False)
+    elif op == 'insert_group':
+        model._apply(Change('add_group', after=[(index, Component.from_record(data)) for index, data in record['components']]), undo=False)
+    elif op == 'remove_group':
+        model._apply(Change('delete_group', before=[(index, components[index]) for index in record['indexes']]), undo=False)
+    elif op == 'move':
+        model._apply(Change('move', components[record['index']], after=record['start_u_slot']), undo=False)
+    elif op == 'rename':
+        model._apply(Change('rename', components[record['index']], after=sys.intern(record['name'])), undo=False)
+    elif op == 'resize':
+        if 'restore' in record:
+            removed = [(index, Component.from_record(data)) for index, data in record['restore']]
+            model._apply(Change('resize', before=(record['rack_height'], removed)), undo=True)
+        else:
+            removed = [(i, comp) for i, comp in enumerate(components) if comp.start_u_slot + comp.size_u - 1 > record['rack_height']]
+            model._apply(Change('resize', before=(model.rack_height, removed), after=record['rack_height']), undo=False)
+    elif op == 'starts':
+        model._apply(Change('rearrange', after=[(components[index], start_u_slot) for index, start_u_slot in record['moves']]), undo=False)
+    elif op == 'layout':
+        model._apply(Change('replace', after=(record['rack_height'], [Component.from_record(data) for data in record['components']])), undo=False)
+    else:
+        raise ValueError(f"Unknown change record '{op}'.")
+
+
+# First-fit decreasing across racks. Devices are visited largest first, so a rack
+# that cannot take the current size cannot take it later either; the cursor only
+# rewinds when the size changes.
+def pack_inventory(devices, rack_count, rack_height=DEFAULT_U, component_categories=None, strategy=DEFAULT_STRATEGY):
+    component_categories = copy.deepcopy(component_categories if component_categories is not None else DEFAULT_COMPONENT_CATEGORIES)
+    racks = [RackModel(rack_height, component_categories, track_history=False, placement_strategy=strategy, copy_categories=False)
+             for _ in range(rack_count)]
+    unplaced = []
+    cursor, cursor_size = 0, None
+    for name, size_u, color in sorted(devices, key=lambda device: -device[1]):
+        if size_u != cursor_size:
+            cursor, cursor_size = 0, size_u
+        start_u_slot = None
+        while cursor < rack_count:
+            start_u_slot = racks[cursor].find_slot(size_u)
+            if start_u_slot is not None:
+                break
+            cursor += 1
+        if start_u_slot is None:
+            unplaced.append((name, size_u, color))
+            continue
+        racks[cursor].place_at(name, size_u, start_u_slot, color)
+    return racks, unplaced
+
+
+# A row (or hall) of racks sharing one component catalog. Each rack keeps its own
+# occupancy index and undo history; the workspace only tracks order and selection.
+class Workspace:
+    def __init__(self, rack_count=1, rack_height=DEFAULT_U, component_categories=None, **rack_options):
+        if component_categories is None:
+            component_categories = DEFAULT_COMPONENT_CATEGORIES
+        self.component_categories = copy.deepcopy(component_categories)
+        self.component_categories.setdefault("Custom", {})
+        self.rack_options = rack_options
+        self._lookup = catalog_lookup(self.component_categories)
+        self.racks = []
+        self.active_index = 0
+        for _ in range(rack_count):
+            self.add_rack(rack_height)
+
+    @classmethod
+    def from_dict(cls, data, **kwargs):
+        workspace = cls(rack_count=0, **kwargs)
+        workspace.load_dict(data)
+        return workspace
+
+    def __len__(self):
+        return len(self.racks)
+
+    def __iter__(self):
+        return iter(self.racks)
+
+    @property
+    def active(self):
+        return self.racks[self.active_index]
+
+    def select(self, index):
+        if not 0 <= index < len(self.racks):
+            raise IndexError(f"No rack at position {index + 1}.")
+        self.active_index = index
+        return self.active
+
+    def _new_rack(self, rack_height, name):
+        return RackModel(rack_height, self.component_categories, name=name, copy_categories=False, **self.rack_options)
+
+    def add_rack(self, rack_height=DEFAULT_U, name=None, index=None):
+        rack = self._new_rack(rack_height, name or self.next_rack_name())
+        if index is None:
+            index = len(self.racks)
+        self.racks.insert(index, rack)
+        return rack
+
+    def next_rack_name(self):
+        taken = {rack.name for rack in self.racks}
+        number = len(self.racks) + 1
+        while f"Rack {number}" in taken:
+            number += 1
+        return f"Rack {number}"
+
+    def remove_rack(self, index):
+        if len(self.racks) == 1:
+            raise RackError("A workspace must keep at least one rack.")
+        rack = self.racks.pop(index)
+        if self.active_index >= len(self.racks) or self.active_index > index:
+            self.active_index = max(self.active_index - 1, 0)
+        return rack
+
+    @property
+    def used_u(self):
+        return sum(rack.used_u for rack in self.racks)
+
+    @property
+    def total_u(self):
+        return sum(rack.rack_height for rack in self.racks)
+
+    def to_dict(self):
+        return {
+            "racks": [rack_record(rack) for rack in self.racks],
+            "custom_components": self.component_categories["Custom"]
+        }
+
+    # A detached copy without history, for saving in the background: later edits to
+    # this workspace, its racks, components or custom components do not reach it.
+    def copy(self):
+        clone = Workspace(rack_count=0, component_categories={}, **dict(self.rack_options, track_history=False))
+        clone.component_categories = dict(self.component_categories)
+        clone.component_categories["Custom"] = {name: dict(info) for name, info in self.component_categories["Custom"].items()}
+        clone._lookup = catalog_lookup(clone.component_categories)
+        for rack in self.racks:
+            copied = clone._new_rack(rack.rack_height, rack.name)
+            copied.placement_strategy = rack.placement_strategy
+            copied.budget.set_limits(rack.budget.limits)
+            copied._set_layout(rack.rack_height, [comp.copy() for comp in rack.components])
+            clone.racks.append(copied)
+        clone.active_index = self.active_index
+        return clone
+
+    def load_dict(self, data):
+        racks_data = data.get("racks") if isinstance(data, dict) else None
+        if not isinstance(racks_data, list) or not racks_data:
+            raise ValueError("Project file does not contain any racks.")
+        custom = validate_custom_components(data.get("custom_components", {}))
+        # load_rack appends to self.racks and looks names up in the live catalog, so
+        # the new catalog goes in first and the old state comes back on failure.
+        previous = self.component_categories["Custom"], self.racks, self.active_index
+        self.component_categories["Custom"] = custom
+        self.racks = []
+        self.active_index = 0
+        try:
+            for rack_data in racks_data:
+                self.load_rack(rack_data)
+        except BaseException:
+            self.component_categories["Custom"], self.racks, self.active_index = previous
+            raise
+
+    # Appends one saved rack without recording history. Streaming loaders call this
+    # once per rack record, after any custom components the racks refer to.
+    def load_rack(self, rack_data):
+        try:
+            rack_height, components = parse_rack_dict(rack_data, self._lookup)
+        except ValueError as e:
+            raise ValueError(f"Rack {len(self.racks) + 1}: {e}")
+        name = rack_data.get("name")
+        rack = self._new_rack(rack_height, name if isinstance(name, str) and name else self.next_rack_name())
+        try:
+            rack.budget.set_limits(rack_data.get("limits"))
+        except ValueError as e:
+            raise ValueError(f"Rack {len(self.racks) + 1}: {e}")
+        rack._set_layout(rack_height, components)
+        self.racks.append(rack)
+        return rack
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+import math
+import os
+import random
+import time
+
+from rackmodel import BUDGET_ATTRIBUTES
+
+OPTIMIZE_STEPS = 20000
+OPTIMIZE_TIME_BUDGET = 0.5
+
+# Cost per unit of each layout rule; the optimizer minimizes their sum.
+DEFAULT_LAYOUT_RULES = {
+    'heavy_low': 0.1,          # per kg, for every U a component sits above the bottom
+    'patch_near_switch': 5.0,  # per U between a patch panel and the nearest switch
+    'gaps': 3.0,               # per empty U below the highest component
+    'moves': 0.5,              # per component moved from where it is now
+}
+
+# Components are recognised by name. Heavy ones without a kg value are assumed to
+# weigh HEAVY_KG; filler panels count as components, so they can close a gap.
+HEAVY_NAMES = ('UPS', 'Battery')
+HEAVY_KG = 25
+PATCH_NAMES = ('Patch Panel',)
+SWITCH_NAMES = ('Switch',)
+NOT_SWITCH_NAMES = ('KVM',)
+
+_KG = list(BUDGET_ATTRIBUTES).index('kg')
+_INFEASIBLE = float('inf')
+
+
+def _name_has(name, words):
+    lowered = name.lower()
+    return any(word.lower() in lowered for word in words)
+
+
+def _mass(comp):
+    if comp.load is not None and comp.load[_KG]:
+        return comp.load[_KG]
+    return HEAVY_KG if _name_has(comp.name, HEAVY_NAMES) else 0
+
+
+# Everything the search needs about one rack, as plain values so batches can be
+# sent to worker processes cheaply.
+def layout_problem(components, rack_height):
+    return (rack_height,
+            [comp.size_u for comp in components],
+            [comp.start_u_slot for comp in components],
+            [_mass(comp) for comp in components],
+            [i for i, comp in enumerate(components) if _name_has(comp.name, PATCH_NAMES)],
+            [i for i, comp in enumerate(components)
+             if _name_has(comp.name, SWITCH_NAMES) and not _name_has(comp.name, NOT_SWITCH_NAMES)])
+
+
+def _layout_rules(rules):
+    unknown = set(rules or ()) - set(DEFAULT_LAYOUT_RULES)
+    if unknown:
+        raise ValueError(f"Unknown layout rule '{sorted(unknown)[0]}'. Use one of: {', '.join(DEFAULT_LAYOUT_RULES)}.")
+    return dict(DEFAULT_LAYOUT_RULES, **(rules or {}))
+
+
+def _cost_function(problem, rules, max_moves):
+    _, sizes, original, masses, patches, switches = problem
+    heavy = [(i, mass * rules['heavy_low']) for i, mass in enumerate(masses) if mass]
+    pairs = [(p, [s for s in switches if s != p]) for p in patches] if switches else []
+    used = sum(sizes)
+    gap_cost, patch_cost, move_cost = rules['gaps'], rules['patch_near_switch'], rules['moves']
+    count = len(sizes)
+
+    # Stacks the blocks bottom up: a component index, or -1 for one empty U.
+    def cost(blocks, starts):
+        u = 1
+        top = 0
+        for block in blocks:
+            if block < 0:
+                u += 1
+            else:
+                starts[block] = u
+                u += sizes[block]
+                top = u - 1
+        moved = 0
+        for i in range(count):
+            if starts[i] != original[i]:
+                moved += 1
+        if max_moves is not None and moved > max_moves:
+            return _INFEASIBLE
+        total = gap_cost * (top - used) + move_cost * moved
+        for i, weight in heavy:
+            total += weight * (starts[i] - 1)
+        for p, near in pairs:
+            if near:
+                p_start, p_end = starts[p], starts[p] + sizes[p]
+                total += patch_cost * min(max(starts[s] - p_end, p_start - starts[s] - sizes[s], 0) for s in near)
+        return total
+
+    return cost
+
+
+def _initial_blocks(problem):
+    rack_height, sizes, starts = problem[:3]
+    owner = {}
+    for i, start in enumerate(starts):
+        owner[start] = i
+    blocks = []
+    u = 1
+    while u <= rack_height:
+        i = owner.get(u)
+        if i is None:
+            blocks.append(-1)
+            u += 1
+        else:
+            blocks.append(i)
+            u += sizes[i]
+    return blocks
+
+
+def _plan(problem, rules=None, max_moves=None, steps=OPTIMIZE_STEPS, time_budget=OPTIMIZE_TIME_BUDGET, seed=None):
+    original = problem[2]
+    if not original or max_moves == 0:
+        return {}
+    cost = _cost_function(problem, _layout_rules(rules), max_moves)
+    rng = random.Random(seed)
+    blocks = _initial_blocks(problem)
+    starts = list(original)
+    current = best = cost(blocks, starts)
+    best_blocks = blocks[:]
+    n = len(blocks)
+    if n < 2 or best == 0:
+        return {}
+
+    def mutate():
+        i, j = rng.randrange(n), rng.randrange(n)
+        if i == j or blocks[i] == blocks[j]:
+            return None
+        if rng.random() < 0.5:
+            blocks[i], blocks[j] = blocks[j], blocks[i]
+            return 'swap', i, j
+        blocks.insert(j, blocks.pop(i))
+        return 'shift', i, j
+
+    def revert(step):
+        kind, i, j = step
+        if kind == 'swap':
+            blocks[i], blocks[j] = blocks[j], blocks[i]
+        else:
+            blocks.insert(i, blocks.pop(j))
+
+    # Start hot enough to accept a typical uphill step about a third of the time.
+    deltas = []
+    for _ in range(64):
+        step = mutate()
+        if step is not None:
+            value = cost(blocks, starts)
+            if value != _INFEASIBLE and value != current:
+                deltas.append(abs(value - current))
+            revert(step)
+    t_start = sum(deltas) / len(deltas) if deltas else 1.0
+    t_end = t_start / 1000
+
+    # The temperature follows whichever of the step count and the time budget is
+    # further along, so a search cut short by the clock still ends cold.
+    started = time.perf_counter()
+    time_progress = 0.0
+    done = 0
+    while done < steps:
+        if time_budget is not None and done % 128 == 0:
+            elapsed = time.perf_counter() - started
+            if elapsed >= time_budget:
+                break
+            time_progress = elapsed / time_budget
+        progress = max(done / steps, time_progress)
+        done += 1
+        step = mutate()
+        if step is None:
+            continue
+        value = cost(blocks, starts)
+        if value <= current or (value != _INFEASIBLE and rng.random() < math.exp((current - value) / (t_start * (t_end / t_start) ** progress))):
+            current = value
+            if value < best:
+                best = value
+                best_blocks = blocks[:]
+        else:
+            revert(step)
+
+    cost(best_blocks, starts)
+    return {i: start for i, start in enumerate(starts) if start != original[i]}
+
+
+def layout_cost(components, rack_height, rules=None):
+    problem = layout_problem(components, rack_height)
+    return _cost_function(problem, _layout_rules(rules), None)(_initial_blocks(problem), list(problem[2]))
+
+
+# Rearrange components to follow the layout rules: heavy gear low, patch panels next
+# to switches and no empty U between components, moving at most max_moves of them.
+# Simulated annealing over the bottom-to-top order of components and empty U, so
+# every candidate is a valid layout. It runs for `steps` steps or time_budget
+# seconds, whichever ends first; with a seed and time_budget=None the result is
+# reproducible. Returns {component index: new start_u_slot} for the components
+# that move.
+def plan_layout(components, rack_height, rules=None, max_moves=None, steps=OPTIMIZE_STEPS, time_budget=OPTIMIZE_TIME_BUDGET, seed=None):
+    return _plan(layout_problem(components, rack_height), rules, max_moves, steps, time_budget, seed)
+
+
+# Applies plan_layout to a rack as a single undoable step and returns the moved components.
+def optimize_rack(model, **options):
+    return model.rearrange(plan_layout(model.components, model.rack_height, **options))
+
+
+def _plan_job(job):
+    problem, options = job
+    return _plan(problem, **options)
+
+
+# Optimizes every rack, spreading the searches over worker processes. Each rack
+# gets its own seed (seed + rack index) so a seeded batch gives the same result
+# whatever the number of workers. Returns the moved components per rack.
+def optimize_workspace(workspace, jobs=None, seed=None, **options):
+    work = [(layout_problem(rack.components, rack.rack_height), dict(options, seed=None if seed is None else seed + n))
+            for n, rack in enumerate(workspace.racks)]
+    if jobs == 1 or len(work) < 2:
+        plans = [_plan_job(job) for job in work]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            plans = list(pool.map(_plan_job, work, chunksize=max(len(work) // (4 * (jobs or os.cpu_count() or 1)), 1)))
+    return [rack.rearrange(moves) for rack, moves in zip(workspace.racks, plans)]
@@ -2,88 +2,244 @@
 import tkinter as tk
 from tkinter import messagebox, simpledialog, ttk, filedialog, colorchooser
 import json
-from PIL import ImageGrab, Image
+import os
+import sys
+
+import rackio
+import rackprofile
+from rackjournal import Journal
+from racktasks import TaskRunner
+from rackmodel import BUDGET_ATTRIBUTES, DEFAULT_U, PLACEMENT_STRATEGIES, CatalogSearch, RackError, Workspace, budget_load, format_amount
+from rackoptimize import optimize_rack
+from rackrender import U_HEIGHT, RACK_WIDTH_PX, RACK_LEFT_MARGIN, RACK_RIGHT_MARGIN, export_rack, text_color_for
 
-U_HEIGHT = 40
-DEFAULT_U = 12
-RACK_WIDTH_PX = 280
-RACK_LEFT_MARGIN = 30
-RACK_RIGHT_MARGIN = RACK_LEFT_MARGIN + RACK_WIDTH_PX
 PALETTE_WIDTH_PX = 200
+PALETTE_ROW_PX = 26
+DRAG_FRAME_MS = 16
+STRIP_HEIGHT_PX = 220
+THUMB_WIDTH_PX = 60
+THUMB_GAP_PX = 14
+THUMB_PITCH_PX = THUMB_WIDTH_PX + THUMB_GAP_PX
+THUMB_TOP_PX = 18
+THUMB_U_PX = 3
+OVERLAY_REFRESH_MS = 500
+STATUS_CLEAR_MS = 5000
+AUTOSAVE_CHECK_MS = 2000
+PALETTE_CHUNK = 500
+SELECTION_COLOR = '#FFEB3B'
+
+# Startup target, from launching the app to the first frame with the rack drawn;
+# rackbench's startup suite measures against it. With RACKPLANNER_STARTUP_PROBE set
+# the app prints "first-frame" and "ready" (palette built) lines, then exits.
+FIRST_FRAME_TARGET_MS = 500
+STARTUP_PROBE_ENV = 'RACKPLANNER_STARTUP_PROBE'
+
+# Handlers timed when RACKPLANNER_INSTRUMENT is set (see rackprofile.py).
+INSTRUMENTED_HANDLERS = (
+    '_start_drag', '_drag_motion', '_flush_drag_motion', '_drop', '_place_component_from_palette',
+    'update_palette', '_filter_palette', '_render_visible_palette_rows', '_draw_rack_and_components',
+    '_render_visible_racks', '_select_in_band', '_delete_selection', '_shift_selection', '_duplicate_selection', 'undo', 'redo', 'load_rack_config', 'load_project', 'save_rack_config', 'save_project',
+)
+
+
+def _parse_amount(text):
+    value = float(text)
+    return int(value) if value.is_integer() else value
+
 
 class RackPlannerApp:
-    def __init__(self, root):
+    def __init__(self, root, instrumentation=None, autosave=True):
         self.root = root
+        self.instrumentation = instrumentation
+        self.autosave = autosave
+        self.journal = None
+        self._autosave_error = None
+        self.tasks = TaskRunner(root, on_progress=self._show_task_progress)
+        self._status_after_id = None
+        self.root.protocol("WM_DELETE_WINDOW", self._on_close)
         self.root.title("RackPlanner")
         self.root.configure(bg='#2e2e2e')
         
-        self.rack_height = DEFAULT_U
-        self.rack_items = [None] * self.rack_height
-        self.placed_components_data = []
+        self.workspace = Workspace(1, DEFAULT_U)
 
         self._dragging_component = None
         self._drag_start_x = 0
         self._drag_start_y = 0
         self._drag_highlight_rects = []
+        self._drag_last_slot = None
+        self._pending_drag_y = None
+        self._drag_after_id = None
         self._ghost_rect_id = None
         self._ghost_text_id = None
 
-        self._history = []
-        self._history_index = -1
-
-        self.component_categories = {
-            "Networking": {
-                "UDM Pro": {"size": 1, "color": "#FFC107"},
-                "Router": {"size": 1, "color": "#FFC107"},
-                "Firewall": {"size": 1, "color": "#FFC107"},
-                "Managed Switch": {"size": 1, "color": "#FFC107"},
-                "PoE Switch": {"size": 1, "color": "#FFC107"},
-                "Media Converter": {"size": 1, "color": "#FFC107"},
-                "Modem/ONT": {"size": 1, "color": "#FFC107"}
-            },
-            "Servers": {
-                "1U Server": {"size": 1, "color": "#4CAF50"},
-                "2U Server": {"size": 2, "color": "#4CAF50"},
-                "3U Server": {"size": 3, "color": "#4CAF50"},
-                "4U Server": {"size": 4, "color": "#4CAF50"},
-                "Rackmount Workstation": {"size": 4, "color": "#4CAF50"},
-                "Mini PC/NUC": {"size": 1, "color": "#4CAF50"}
-            },
-            "Storage": {
-                "Disk Shelf": {"size": 3, "color": "#9E9E9E"},
-                "NAS Appliance": {"size": 2, "color": "#9E9E9E"},
-                "Tape Drive": {"size": 1, "color": "#9E9E9E"},
-                "HDD Enclosure": {"size": 2, "color": "#9E9E9E"}
-            },
-            "Power": {
-                "Power Strip": {"size": 1, "color": "#F44336"},
-                "UPS": {"size": 2, "color": "#F44336"},
-                "PDU": {"size": 1, "color": "#F44336"},
-                "ATS": {"size": 1, "color": "#F44336"}
-            },
-            "Management & Accessories": {
-                "Patch Panel": {"size": 1, "color": "#8BC34A"},
-                "KVM Switch": {"size": 1, "color": "#8BC34A"},
-                "Cable Management": {"size": 1, "color": "#8BC34A"},
-                "2U Shelf": {"size": 2, "color": "#8BC34A"},
-                "Rackmount Monitor/KVM Drawer": {"size": 1, "color": "#8BC34A"}
-            },
-            "Cooling": {
-                "Rackmount Fan Unit": {"size": 1, "color": "#00BCD4"}
-            },
-            "Filler": {
-                "Brush Panel": {"size": 1, "color": "#2196F3"},
-                "Blanking Panel": {"size": 1, "color": "#2196F3"},
-                "Ventilated Panel": {"size": 1, "color": "#2196F3"}
-            },
-            "Custom": {}
-        }
+        # Selected components by id, for group move, shift, delete and duplicate.
+        # Shift-click toggles one; dragging on empty rack space selects every
+        # component the band touches. A group drag keeps (components, anchor y,
+        # offset in U); a band drag keeps (start y, band item).
+        self._selection = {}
+        self._group_drag = None
+        self._band = None
+
+        # Retained canvas state: rack frame items, one (line, label) pair per U keyed
+        # by U number, the model geometry each component was last drawn with and
+        # its (rect, text) canvas items.
+        self._frame_items = None
+        self._row_items = {}
+        self._drawn_height = 0
+        self._rendered = {}
+        self._component_items = {}
+        self._item_components = {}
+
+        # Rack row thumbnails, drawn only while they are scrolled into view.
+        self._thumbnails = {}
+        self._thumbnail_refresh_pending = False
+
+        # Palette rows (category headers and catalog entries) matching the search
+        # box; only the rows scrolled into view have canvas items.
+        self.palette_search = CatalogSearch()
+        self._palette_rows = []
+        self._palette_items = {}
+        self._palette_build = None
 
         self.setup_ui()
+        if instrumentation is not None:
+            self._setup_instrumentation()
         self._draw_rack_and_components()
-        self._record_current_state()
+        self.canvas.bind("<Expose>", self._on_first_expose)
+
+    # Work that can wait until the window has been drawn once: the palette and the
+    # autosave, which may restore the last session.
+    def _on_first_expose(self, event):
+        self.canvas.unbind("<Expose>")
+        self.root.after_idle(self._after_first_frame)
+
+    def _after_first_frame(self):
+        probe = os.environ.get(STARTUP_PROBE_ENV)
+        if probe:
+            print("first-frame", flush=True)
+        self._build_palette_in_chunks(self._probe_ready if probe else None)
+        if self.autosave:
+            self._start_autosave()
+
+    def _probe_ready(self):
+        print("ready", flush=True)
+        self._on_close()
+
+    # The Debug menu: a latency overlay, stats dumps and cProfile / tracemalloc
+    # sessions, only present when the app runs instrumented.
+    def _setup_instrumentation(self):
+        instrumentation = self.instrumentation
+        instrumentation.gauge('canvas_items', lambda: len(self.canvas.find_all()))
+        instrumentation.gauge('palette_items', lambda: len(self.palette_canvas.find_all()))
+        instrumentation.gauge('strip_items', lambda: len(self.strip_canvas.find_all()))
+        instrumentation.gauge('components', lambda: len(self.model.components))
+        instrumentation.gauge('history_size', lambda: self.model.history_size)
+        self._overlay = None
+        self._overlay_after_id = None
+        self._overlay_var = tk.BooleanVar(value=False)
+        self._profiler_var = tk.BooleanVar(value=False)
+        self._tracemalloc_var = tk.BooleanVar(value=False)
+
+        menubar = tk.Menu(self.root)
+        debug_menu = tk.Menu(menubar, tearoff=0)
+        debug_menu.add_checkbutton(label="Latency Overlay", variable=self._overlay_var, command=self._toggle_overlay)
+        debug_menu.add_command(label="Dump Stats...", command=self._dump_instrumentation)
+        debug_menu.add_command(label="Reset Stats", command=instrumentation.reset)
+        debug_menu.add_separator()
+        debug_menu.add_checkbutton(label="cProfile Session", variable=self._profiler_var, command=self._toggle_profiler)
+        debug_menu.add_checkbutton(label="tracemalloc Session", variable=self._tracemalloc_var, command=self._toggle_tracemalloc)
+        menubar.add_cascade(label="Debug", menu=debug_menu)
+        self.root.config(menu=menubar)
+
+    def _toggle_overlay(self):
+        if self._overlay_var.get():
+            self._overlay = tk.Toplevel(self.root, bg='#1e1e1e')
+            self._overlay.title("Handler Latency")
+            self._overlay.protocol("WM_DELETE_WINDOW", self._close_overlay)
+            self._overlay_label = tk.Label(self._overlay, bg='#1e1e1e', fg='white', font=('Courier', 9), justify=tk.LEFT, anchor='nw')
+            self._overlay_label.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+            self._refresh_overlay()
+        else:
+            self._close_overlay()
+
+    def _close_overlay(self):
+        self._overlay_var.set(False)
+        if self._overlay_after_id is not None:
+            self.root.after_cancel(self._overlay_after_id)
+            self._overlay_after_id = None
+        if self._overlay is not None:
+            self._overlay.destroy()
+            self._overlay = None
+
+    def _refresh_overlay(self):
+        self._overlay_label.config(text="\n".join(self.instrumentation.summary_lines()))
+        self._overlay_after_id = self.root.after(OVERLAY_REFRESH_MS, self._refresh_overlay)
+
+    def _dump_instrumentation(self):
+        file_path = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("JSON files", "*.json")], title="Dump Handler Stats")
+        if not file_path:
+            return
+        try:
+            self.instrumentation.dump(file_path)
+        except OSError as e:
+            messagebox.showerror("Dump Stats", f"Failed to write stats: {e}")
+
+    def _toggle_profiler(self):
+        if self._profiler_var.get():
+            self.instrumentation.start_profiler()
+            return
+        file_path = filedialog.asksaveasfilename(defaultextension=".prof", filetypes=[("cProfile stats", "*.prof")], title="Save Profile (cancel to only view it)")
+        self._show_report("cProfile", self.instrumentation.stop_profiler(file_path or None))
+
+    def _toggle_tracemalloc(self):
+        if self._tracemalloc_var.get():
+            self.instrumentation.start_tracemalloc()
+        else:
+            self._show_report("tracemalloc", "\n".join(self.instrumentation.stop_tracemalloc()))
+
+    def _show_report(self, title, report):
+        window = tk.Toplevel(self.root)
+        window.title(title)
+        text = tk.Text(window, width=120, height=30, font=('Courier', 9))
+        text.insert(tk.END, report or "Nothing was recorded.")
+        text.config(state=tk.DISABLED)
+        text.pack(fill=tk.BOTH, expand=True)
+
+    @property
+    def model(self):
+        return self.workspace.active
+
+    @property
+    def rack_height(self):
+        return self.model.rack_height
+
+    @property
+    def placed_components_data(self):
+        return self.model.components
+
+    @property
+    def component_categories(self):
+        return self.model.component_categories
+
+    @property
+    def occupancy(self):
+        return self.model.occupancy
 
     def setup_ui(self):
+        strip_frame = tk.Frame(self.root, bg='#2e2e2e')
+        strip_frame.pack(side=tk.BOTTOM, fill=tk.X, padx=10, pady=(0, 10))
+
+        self.strip_scrollbar = tk.Scrollbar(strip_frame, orient="horizontal")
+        self.strip_scrollbar.pack(side="bottom", fill="x")
+
+        self.strip_canvas = tk.Canvas(strip_frame, height=STRIP_HEIGHT_PX, bg='#1e1e1e', highlightthickness=0, xscrollcommand=self._on_strip_scroll)
+        self.strip_canvas.pack(fill=tk.X)
+        self.strip_scrollbar.config(command=self.strip_canvas.xview)
+
+        self.strip_canvas.bind("<Configure>", lambda e: self._render_visible_racks())
+        self.strip_canvas.bind("<Button-1>", self._on_strip_click)
+        self._update_strip_scrollregion()
+
         main_frame = tk.Frame(self.root, bg='#2e2e2e')
         main_frame.pack(fill=tk.BOTH, expand=True)
 
@@ -93,18 +249,20 @@ class RackPlannerApp:
         palette_label = tk.Label(palette_frame, text="Components", bg='#3c3c3c', fg='white', font=('Arial', 10, 'bold'))
         palette_label.pack(pady=5)
 
+        self.palette_search_var = tk.StringVar()
+        self.palette_search_var.trace_add("write", lambda *args: self._filter_palette())
+        tk.Entry(palette_frame, textvariable=self.palette_search_var, bg='#2e2e2e', fg='white', insertbackground='white').pack(fill=tk.X, padx=5, pady=(0, 5))
+
         self.palette_scrollbar = tk.Scrollbar(palette_frame, orient="vertical")
         self.palette_scrollbar.pack(side="right", fill="y")
 
-        self.palette_canvas = tk.Canvas(palette_frame, bg='#3c3c3c', highlightthickness=0, yscrollcommand=self.palette_scrollbar.set)
+        self.palette_canvas = tk.Canvas(palette_frame, bg='#3c3c3c', width=PALETTE_WIDTH_PX, highlightthickness=0, yscrollcommand=self._on_palette_scroll)
         self.palette_canvas.pack(fill=tk.BOTH, expand=True)
         
         self.palette_scrollbar.config(command=self.palette_canvas.yview)
-        
-        self.palette_inner_frame = tk.Frame(self.palette_canvas, bg='#3c3c3c')
-        self.palette_canvas.create_window((0, 0), window=self.palette_inner_frame, anchor="nw")
-        self.palette_inner_frame.bind("<Configure>", lambda e: self.palette_canvas.configure(scrollregion = self.palette_canvas.bbox("all")))
 
+        self.palette_canvas.bind("<Configure>", lambda e: self._reset_palette_items())
+        self.palette_canvas.bind("<Button-1>", self._on_palette_click)
         self.palette_canvas.bind("<Button-4>", self._on_palette_mousewheel)
         self.palette_canvas.bind("<Button-5>", self._on_palette_mousewheel)
         self.palette_canvas.bind("<MouseWheel>", self._on_palette_mousewheel)
@@ -116,10 +274,26 @@ class RackPlannerApp:
         self.canvas.bind("<Button-1>", self._start_drag)
         self.canvas.bind("<B1-Motion>", self._drag_motion)
         self.canvas.bind("<ButtonRelease-1>", self._drop)
+        self.canvas.bind("<Shift-Button-1>", self._toggle_selection)
+        self.canvas.bind("<Delete>", lambda e: self._delete_selection())
+        self.canvas.bind("<BackSpace>", lambda e: self._delete_selection())
+        self.canvas.bind("<Up>", lambda e: self._shift_selection(1))
+        self.canvas.bind("<Down>", lambda e: self._shift_selection(-1))
+        self.canvas.bind("<Control-d>", lambda e: self._duplicate_selection())
+        self.canvas.bind("<Control-a>", lambda e: self._select_all())
+        self.canvas.bind("<Escape>", lambda e: self._clear_selection())
 
         controls = tk.Frame(main_frame, bg='#2e2e2e')
         controls.pack(side=tk.RIGHT, padx=10, pady=10, fill=tk.BOTH)
 
+        self.rack_name_label = tk.Label(controls, text="", bg='#2e2e2e', fg='white', font=('Arial', 10, 'bold'))
+        self.rack_name_label.pack(anchor='w', pady=(0, 5))
+
+        rack_buttons_frame = tk.Frame(controls, bg='#2e2e2e')
+        rack_buttons_frame.pack(fill=tk.X, pady=(0, 5))
+        tk.Button(rack_buttons_frame, text="Add Rack", command=self.add_rack, bg='#607D8B', fg='white').pack(side=tk.LEFT, expand=True, fill=tk.X, padx=(0,2))
+        tk.Button(rack_buttons_frame, text="Remove Rack", command=self.remove_rack, bg='#607D8B', fg='white').pack(side=tk.RIGHT, expand=True, fill=tk.X, padx=(2,0))
+
         tk.Label(controls, text="Rack Size:", bg='#2e2e2e', fg='white').pack(anchor='w')
         self.rack_size_var = tk.IntVar(value=DEFAULT_U)
         size_options = [4, 6, 9, 12, 16, 19, 24, 32, 42]
@@ -127,6 +301,12 @@ class RackPlannerApp:
         self.rack_size_menu.pack(fill=tk.X, pady=(0, 10))
         self.rack_size_menu.bind("<<ComboboxSelected>>", self.change_rack_size)
 
+        tk.Label(controls, text="Placement:", bg='#2e2e2e', fg='white').pack(anchor='w')
+        self.strategy_var = tk.StringVar(value=self.model.placement_strategy)
+        self.strategy_menu = ttk.Combobox(controls, textvariable=self.strategy_var, values=list(PLACEMENT_STRATEGIES), state='readonly')
+        self.strategy_menu.pack(fill=tk.X, pady=(0, 10))
+        self.strategy_menu.bind("<<ComboboxSelected>>", self.change_placement_strategy)
+
         tk.Button(controls, text="Define Custom Component", command=self.add_custom_component, bg='#2196f3', fg='white').pack(fill=tk.X, pady=5)
         
         tk.Button(controls, text="Save Custom Components", command=self.save_custom_components, bg='#4CAF50', fg='white').pack(fill=tk.X, pady=2)
@@ -134,6 +314,9 @@ class RackPlannerApp:
 
         tk.Frame(controls, height=5, bg='#2e2e2e').pack()
 
+        tk.Button(controls, text="Rack Limits", command=self.set_rack_limits, bg='#607D8B', fg='white').pack(fill=tk.X, pady=5)
+        tk.Button(controls, text="Optimize Layout", command=self.optimize_layout, bg='#2196f3', fg='white').pack(fill=tk.X, pady=5)
+        tk.Button(controls, text="Compact Rack", command=self.compact_rack, bg='#2196f3', fg='white').pack(fill=tk.X, pady=5)
         tk.Button(controls, text="Clear Rack", command=self.clear_rack, bg='#f44336', fg='white').pack(fill=tk.X, pady=5)
         
         undo_redo_frame = tk.Frame(controls, bg='#2e2e2e')
@@ -147,6 +330,8 @@ class RackPlannerApp:
 
         tk.Button(controls, text="Save Rack", command=self.save_rack_config, bg='#ff9800', fg='white').pack(fill=tk.X, pady=5)
         tk.Button(controls, text="Load Rack", command=self.load_rack_config, bg='#ff9800', fg='white').pack(fill=tk.X, pady=5)
+        tk.Button(controls, text="Save Project", command=self.save_project, bg='#ff9800', fg='white').pack(fill=tk.X, pady=5)
+        tk.Button(controls, text="Load Project", command=self.load_project, bg='#ff9800', fg='white').pack(fill=tk.X, pady=5)
         tk.Button(controls, text="Export to Image", command=self.export_canvas_as_image, bg='#009688', fg='white').pack(fill=tk.X, pady=5)
 
 
@@ -156,205 +341,403 @@ class RackPlannerApp:
         self.unused_u_label = tk.Label(controls, text="Unused U: 0", bg='#2e2e2e', fg='white', font=('Arial', 10, 'bold'))
         self.used_u_label.pack(anchor='w', pady=(5, 0))
         self.unused_u_label.pack(anchor='w', pady=(0, 5))
+        self.budget_label = tk.Label(controls, text="", bg='#2e2e2e', fg='white', font=('Arial', 9), justify=tk.LEFT)
+        self.budget_label.pack(anchor='w', pady=(0, 5))
+
+        # File loads and saves run in the background; this shows the current one.
+        self.task_frame = tk.Frame(controls, bg='#2e2e2e')
+        self.task_label = tk.Label(self.task_frame, text="", bg='#2e2e2e', fg='white', anchor='w')
+        self.task_label.pack(fill=tk.X)
+        self.task_progress = ttk.Progressbar(self.task_frame, mode='determinate', maximum=1.0)
+        self.task_progress.pack(fill=tk.X, pady=2)
+        tk.Button(self.task_frame, text="Cancel", command=self.tasks.cancel_all, bg='#f44336', fg='white').pack(fill=tk.X)
+        self._task_frame_shown = False
+        self.status_label = tk.Label(controls, text="", bg='#2e2e2e', fg='#a5d6a7', font=('Arial', 9), anchor='w', justify=tk.LEFT, wraplength=180)
+        self.status_label.pack(fill=tk.X, pady=(0, 5))
 
-        self.update_palette()
         self._update_undo_redo_buttons()
 
     def _draw_rack_and_components(self):
-        self.canvas.delete("all")
-        self.rack_items = [None] * self.rack_height
-
-        self.canvas.config(height=U_HEIGHT * self.rack_height)
-
-        self.canvas.create_rectangle(
-            RACK_LEFT_MARGIN, 0, RACK_RIGHT_MARGIN, self.rack_height * U_HEIGHT,
-            fill='#282828', outline='#555555', width=2
-        )
-
-        for i in range(self.rack_height):
-            y = i * U_HEIGHT
-            self.canvas.create_line(RACK_LEFT_MARGIN, y, RACK_RIGHT_MARGIN, y, fill='#666666', width=1)
-            self.canvas.create_text(2, y + U_HEIGHT // 2, anchor='w', fill='white', text=f"{self.rack_height - i}U")
-        
-        self.canvas.create_line(RACK_LEFT_MARGIN, self.rack_height * U_HEIGHT, RACK_RIGHT_MARGIN, self.rack_height * U_HEIGHT, fill='#666666', width=1)
-
-        self.canvas.create_line(RACK_LEFT_MARGIN, 0, RACK_LEFT_MARGIN, self.rack_height * U_HEIGHT, fill='#555555', width=2)
-        self.canvas.create_line(RACK_RIGHT_MARGIN, 0, RACK_RIGHT_MARGIN, self.rack_height * U_HEIGHT, fill='#555555', width=2)
+        self._sync_rack_frame()
 
+        live = set()
         for comp_data in self.placed_components_data:
-            self._render_single_component(comp_data)
+            live.add(id(comp_data))
+            drawn = self._rendered.get(id(comp_data))
+            if drawn is None:
+                self._render_single_component(comp_data)
+                continue
+            if drawn[1:4] != (comp_data.start_u_slot, comp_data.size_u, self.rack_height):
+                self._move_component_items(comp_data)
+            if drawn[4] != comp_data.name:
+                self._update_component_text(comp_data)
+        for key in [key for key in self._rendered if key not in live]:
+            self._remove_component_items(self._rendered[key][0])
         
-        self._sync_rack_items()
         self.update_u_display()
 
-    def _render_single_component(self, comp_data):
-        start_index_0_based_top = self.rack_height - (comp_data['start_u_slot'] + comp_data['size_u'] - 1)
-
-        y1 = start_index_0_based_top * U_HEIGHT
-        y2 = y1 + comp_data['size_u'] * U_HEIGHT
-        
-        color_hex = comp_data.get('color', 'skyblue')
-        if len(color_hex) == 7:
-            r = int(color_hex[1:3], 16)
-            g = int(color_hex[3:5], 16)
-            b = int(color_hex[5:7], 16)
+    def _sync_rack_frame(self):
+        height = self.rack_height
+        if height == self._drawn_height:
+            return
+        bottom = height * U_HEIGHT
+
+        self.canvas.config(height=bottom)
+        if self._frame_items is None:
+            self._frame_items = (
+                self.canvas.create_rectangle(RACK_LEFT_MARGIN, 0, RACK_RIGHT_MARGIN, bottom, fill='#282828', outline='#555555', width=2, tags="rack_frame"),
+                self.canvas.create_line(RACK_LEFT_MARGIN, bottom, RACK_RIGHT_MARGIN, bottom, fill='#666666', width=1, tags="rack_frame"),
+                self.canvas.create_line(RACK_LEFT_MARGIN, 0, RACK_LEFT_MARGIN, bottom, fill='#555555', width=2, tags=("rack_frame", "rack_rail")),
+                self.canvas.create_line(RACK_RIGHT_MARGIN, 0, RACK_RIGHT_MARGIN, bottom, fill='#555555', width=2, tags=("rack_frame", "rack_rail")),
+            )
         else:
-            r, g, b = 135, 206, 235
+            background, bottom_line, left_rail, right_rail = self._frame_items
+            self.canvas.coords(background, RACK_LEFT_MARGIN, 0, RACK_RIGHT_MARGIN, bottom)
+            self.canvas.coords(bottom_line, RACK_LEFT_MARGIN, bottom, RACK_RIGHT_MARGIN, bottom)
+            self.canvas.coords(left_rail, RACK_LEFT_MARGIN, 0, RACK_LEFT_MARGIN, bottom)
+            self.canvas.coords(right_rail, RACK_RIGHT_MARGIN, 0, RACK_RIGHT_MARGIN, bottom)
+
+        for u in range(height + 1, self._drawn_height + 1):
+            self.canvas.delete(*self._row_items.pop(u))
+        if self._row_items:
+            self.canvas.move("rack_row", 0, (height - self._drawn_height) * U_HEIGHT)
+        for u in range(self._drawn_height + 1, height + 1):
+            y = (height - u) * U_HEIGHT
+            self._row_items[u] = (
+                self.canvas.create_line(RACK_LEFT_MARGIN, y, RACK_RIGHT_MARGIN, y, fill='#666666', width=1, tags="rack_row"),
+                self.canvas.create_text(2, y + U_HEIGHT // 2, anchor='w', fill='white', text=f"{u}U", tags="rack_row"),
+            )
+        if height > self._drawn_height:
+            self.canvas.tag_raise("rack_rail")
+            self.canvas.tag_raise("component_item")
+        self._drawn_height = height
+
+    def _component_y(self, comp_data):
+        y1 = (self.rack_height - (comp_data.start_u_slot + comp_data.size_u - 1)) * U_HEIGHT
+        return y1, y1 + comp_data.size_u * U_HEIGHT
+
+    def _remember_drawn(self, comp_data):
+        self._rendered[id(comp_data)] = (comp_data, comp_data.start_u_slot, comp_data.size_u, self.rack_height, comp_data.name)
 
-        luminance = (0.299 * r + 0.587 * g + 0.114 * b) / 255
-        text_color = 'white' if luminance < 0.5 else 'black'
+    def _render_single_component(self, comp_data):
+        y1, y2 = self._component_y(comp_data)
+        color = comp_data.color
 
         rect = self.canvas.create_rectangle(RACK_LEFT_MARGIN, y1, RACK_RIGHT_MARGIN, y2, 
-                                            fill=comp_data.get('color', 'skyblue'), outline='#333333', width=2, tags="component_item")
+                                            fill=color, outline='#333333', width=2, tags="component_item")
         text = self.canvas.create_text(RACK_LEFT_MARGIN + RACK_WIDTH_PX // 2, (y1 + y2) // 2, 
-                                        fill=text_color, font=('Arial', 10, 'bold'), text=comp_data['name'], tags="component_item")
+                                        fill=text_color_for(color), font=('Arial', 10, 'bold'), text=comp_data.name, tags="component_item")
 
-        comp_data['rect_id'] = rect
-        comp_data['text_id'] = text
+        self._component_items[id(comp_data)] = (rect, text)
+        self._item_components[rect] = comp_data
+        self._item_components[text] = comp_data
+        self._remember_drawn(comp_data)
 
         self.canvas.tag_bind(rect, '<Button-3>', lambda e, data=comp_data: self.delete_component_on_click(e, data))
         self.canvas.tag_bind(text, '<Button-3>', lambda e, data=comp_data: self.delete_component_on_click(e, data))
-        
 
-    def _sync_rack_items(self):
-        self.rack_items = [None] * self.rack_height
-        for comp_data in self.placed_components_data:
-            start_index_0_based_top = self.rack_height - (comp_data['start_u_slot'] + comp_data['size_u'] - 1)
-            for i in range(start_index_0_based_top, start_index_0_based_top + comp_data['size_u']):
-                if 0 <= i < self.rack_height:
-                    self.rack_items[i] = comp_data['name']
-
-    def _record_current_state(self):
-        current_state = {
-            'rack_height': self.rack_height,
-            'placed_components': [
-                {'name': comp['name'], 'start_u_slot': comp['start_u_slot'], 'size_u': comp['size_u'], 'color': comp.get('color', 'skyblue')}
-                for comp in self.placed_components_data
-            ]
-        }
-        
-        self._history = self._history[:self._history_index + 1]
-        self._history.append(current_state)
-        self._history_index = len(self._history) - 1
-        self._update_undo_redo_buttons()
+    def _remove_component_items(self, comp_data):
+        for item in self._component_items.pop(id(comp_data)):
+            self.canvas.delete(item)
+            self._item_components.pop(item, None)
+        self._rendered.pop(id(comp_data), None)
+        self._selection.pop(id(comp_data), None)
 
-    def _load_state_from_history(self, state_data):
-        self.rack_height = state_data['rack_height']
-        self.rack_size_var.set(self.rack_height)
-        self.placed_components_data = []
-        
-        for comp_data in state_data['placed_components']:
-            self.placed_components_data.append(comp_data.copy())
+    def _move_component_items(self, comp_data):
+        y1, y2 = self._component_y(comp_data)
+        rect, text = self._component_items[id(comp_data)]
+        self.canvas.coords(rect, RACK_LEFT_MARGIN, y1, RACK_RIGHT_MARGIN, y2)
+        self.canvas.coords(text, RACK_LEFT_MARGIN + RACK_WIDTH_PX // 2, (y1 + y2) // 2)
+        self._remember_drawn(comp_data)
 
-        self._draw_rack_and_components()
-        self._update_undo_redo_buttons()
+    def _update_component_text(self, comp_data):
+        self.canvas.itemconfig(self._component_items[id(comp_data)][1], text=comp_data.name)
+        self._remember_drawn(comp_data)
+
+    def _set_component_state(self, comp_data, state):
+        for item in self._component_items[id(comp_data)]:
+            self.canvas.itemconfig(item, state=state)
 
     def _update_undo_redo_buttons(self):
-        self.undo_btn.config(state=tk.NORMAL if self._history_index > 0 else tk.DISABLED)
-        self.redo_btn.config(state=tk.NORMAL if self._history_index < len(self._history) - 1 else tk.DISABLED)
+        self.undo_btn.config(state=tk.NORMAL if self.model.can_undo else tk.DISABLED)
+        self.redo_btn.config(state=tk.NORMAL if self.model.can_redo else tk.DISABLED)
+
+    def _after_model_change(self):
+        self.rack_size_var.set(self.rack_height)
+        self._draw_rack_and_components()
+        self._update_undo_redo_buttons()
 
     def undo(self):
-        if self._history_index > 0:
-            self._history_index -= 1
-            self._load_state_from_history(self._history[self._history_index])
+        change = self.model.undo()
+        if change:
+            self._apply_change_to_canvas(change, undo=True)
 
     def redo(self):
-        if self._history_index < len(self._history) - 1:
-            self._history_index += 1
-            self._load_state_from_history(self._history[self._history_index])
+        change = self.model.redo()
+        if change:
+            self._apply_change_to_canvas(change, undo=False)
+
+    def _apply_change_to_canvas(self, change, undo):
+        action, comp_data = change.action, change.component
+        if action in ('add', 'delete'):
+            if (action == 'add') == undo:
+                self._remove_component_items(comp_data)
+            else:
+                self._render_single_component(comp_data)
+        elif action in ('add_group', 'delete_group'):
+            placed = change.after if action == 'add_group' else change.before
+            for _, comp_data in placed:
+                if (action == 'add_group') == undo:
+                    self._remove_component_items(comp_data)
+                else:
+                    self._render_single_component(comp_data)
+        elif action == 'move':
+            self._move_component_items(comp_data)
+        elif action == 'rename':
+            self._update_component_text(comp_data)
+        elif action in ('compact', 'rearrange'):
+            for comp_data, _ in change.after:
+                self._move_component_items(comp_data)
+        else:
+            self._after_model_change()
+            return
+        self.update_u_display()
+        self._update_undo_redo_buttons()
 
     def change_rack_size(self, event=None):
         new_height = self.rack_size_var.get()
         if new_height < self.rack_height:
-            highest_u_used = 0
-            for item in self.placed_components_data:
-                highest_u_used = max(highest_u_used, item['start_u_slot'] + item['size_u'] - 1)
-            
-            if highest_u_used > new_height:
+            if self.occupancy.highest_used_u > new_height:
                 if not messagebox.askyesno("Warning", "Reducing rack size will cut off placed components. Are you sure?"):
                     self.rack_size_var.set(self.rack_height)
                     return
 
-        self.rack_height = new_height
-        
-        new_placed_components_data = []
-        removed_count = 0
-        for comp_data in list(self.placed_components_data):
-            if comp_data['start_u_slot'] + comp_data['size_u'] - 1 <= self.rack_height:
-                new_placed_components_data.append(comp_data)
-            else:
-                removed_count += 1
-                messagebox.showwarning("Component Removed", f"Component '{comp_data['name']}' was removed because it no longer fits in the {self.rack_height}U rack.")
-        self.placed_components_data = new_placed_components_data
+        removed = self.model.resize(new_height)
+        for comp_data in removed:
+            messagebox.showwarning("Component Removed", f"Component '{comp_data.name}' was removed because it no longer fits in the {self.rack_height}U rack.")
 
-        self._draw_rack_and_components()
-        self._record_current_state()
+        self._after_model_change()
 
 
     def get_component_info(self, component_name):
-        for category_name, category_items in self.component_categories.items():
-            if component_name in category_items:
-                return category_items[component_name]
-        return None
+        return self.model.get_component_info(component_name)
 
     def is_slot_available(self, start_u_slot, size_u):
-        start_index_0_based_top = self.rack_height - (start_u_slot + size_u - 1)
-        end_index_0_based_top = start_index_0_based_top + size_u
-
-        if start_index_0_based_top < 0 or end_index_0_based_top > self.rack_height:
-            return False
-
-        for i in range(start_index_0_based_top, end_index_0_based_top):
-            if self.rack_items[i] is not None:
-                return False
-        return True
+        return self.model.is_slot_available(start_u_slot, size_u)
 
     def add_component_manual(self):
         messagebox.showinfo("Info", "Please click components in the 'Components' palette on the left to place them.")
         
     def delete_component_on_click(self, event, component_data):
-        if messagebox.askyesno("Delete Component", f"Are you sure you want to delete '{component_data['name']}' at {component_data['start_u_slot']}U?"):
+        if id(component_data) in self._selection and len(self._selection) > 1:
+            self._delete_selection()
+            return
+        if messagebox.askyesno("Delete Component", f"Are you sure you want to delete '{component_data.name}' at {component_data.start_u_slot}U?"):
             self._delete_component_logic(component_data)
 
     def _delete_component_logic(self, component_data):
-        self.canvas.delete(component_data['rect_id'])
-        self.canvas.delete(component_data['text_id'])
+        self._remove_component_items(component_data)
 
-        self.placed_components_data.remove(component_data)
+        self.model.delete(component_data)
         
-        self._sync_rack_items()
         self.update_u_display()
-        self._record_current_state()
+        self._update_undo_redo_buttons()
 
     def rename_component_on_click(self, event, component_data):
-        new_name = simpledialog.askstring("Rename Component", "Enter new name:", initialvalue=component_data['name'])
-        if new_name and new_name != component_data['name']:
-            component_data['name'] = new_name
-            self.canvas.itemconfig(component_data['text_id'], text=new_name)
-            self._sync_rack_items()
-            self._record_current_state()
+        new_name = simpledialog.askstring("Rename Component", "Enter new name:", initialvalue=component_data.name)
+        if self.model.rename(component_data, new_name):
+            self._update_component_text(component_data)
+            self._update_undo_redo_buttons()
+
 
+    def change_placement_strategy(self, event=None):
+        self.model.placement_strategy = self.strategy_var.get()
+
+    def compact_rack(self):
+        try:
+            moved = self.model.compact()
+        except RackError as e:
+            messagebox.showerror("Compact Rack", str(e))
+            return
+        if not moved:
+            messagebox.showinfo("Compact Rack", "The rack is already compact.")
+            return
+        self._after_model_change()
+        messagebox.showinfo("Compact Rack", f"Moved {len(moved)} component(s) to close the gaps.")
+
+    def optimize_layout(self):
+        value = simpledialog.askstring("Optimize Layout", "Move at most how many components? (leave blank for no limit)")
+        if value is None:
+            return
+        try:
+            max_moves = int(value) if value.strip() else None
+        except ValueError:
+            messagebox.showerror("Optimize Layout", f"'{value}' is not a whole number.")
+            return
+        moved = optimize_rack(self.model, max_moves=max_moves)
+        if not moved:
+            messagebox.showinfo("Optimize Layout", "No better layout was found.")
+            return
+        for comp_data in moved:
+            self._move_component_items(comp_data)
+        self.update_u_display()
+        self._update_undo_redo_buttons()
+        messagebox.showinfo("Optimize Layout", f"Moved {len(moved)} component(s). Use Undo to restore the previous layout.")
 
     def clear_rack(self):
         if messagebox.askyesno("Clear Rack", "Are you sure you want to clear the entire rack?"):
-            self.placed_components_data = []
-            self._draw_rack_and_components()
-            self._record_current_state()
+            self.model.clear()
+            self._after_model_change()
 
     def update_u_display(self):
-        used_u = 0
-        occupied_slots = set()
-        for comp in self.placed_components_data:
-            start_index_0_based_top = self.rack_height - (comp['start_u_slot'] + comp['size_u'] - 1)
-            for i in range(start_index_0_based_top, start_index_0_based_top + comp['size_u']):
-                if 0 <= i < self.rack_height:
-                    occupied_slots.add(i)
-        
-        used_u = len(occupied_slots)
-        unused_u = self.rack_height - used_u
+        used_u = self.model.used_u
+        unused_u = self.model.free_u
 
         self.used_u_label.config(text=f"Used U: {used_u}")
         self.unused_u_label.config(text=f"Unused U: {unused_u}")
+        self._update_budget_display()
+        self.rack_name_label.config(text=f"{self.model.name} ({self.workspace.active_index + 1} of {len(self.workspace)})")
+        self._schedule_thumbnail_refresh()
+
+    def select_rack(self, index):
+        if self._dragging_component or self._group_drag or index == self.workspace.active_index:
+            return
+        previous = self.model
+        self.workspace.select(index)
+        self._redraw_thumbnail(previous)
+        self.strategy_var.set(self.model.placement_strategy)
+        self._after_model_change()
+
+    def add_rack(self):
+        self.workspace.add_rack(self.rack_height, index=self.workspace.active_index + 1)
+        self._checkpoint_autosave()
+        self._reset_strip()
+        self.select_rack(self.workspace.active_index + 1)
+        self._scroll_strip_to(self.workspace.active_index)
+
+    def remove_rack(self):
+        if len(self.workspace) == 1:
+            messagebox.showerror("Remove Rack", "The workspace must keep at least one rack.")
+            return
+        if not messagebox.askyesno("Remove Rack", f"Are you sure you want to remove '{self.model.name}' and everything placed in it?"):
+            return
+        self.workspace.remove_rack(self.workspace.active_index)
+        self._checkpoint_autosave()
+        self._reset_strip()
+        self.strategy_var.set(self.model.placement_strategy)
+        self._after_model_change()
+
+    def _reset_strip(self):
+        self.strip_canvas.delete("all")
+        self._thumbnails = {}
+        self._update_strip_scrollregion()
+        self._render_visible_racks()
+
+    def _update_strip_scrollregion(self):
+        self.strip_canvas.configure(scrollregion=(0, 0, len(self.workspace) * THUMB_PITCH_PX, STRIP_HEIGHT_PX))
+
+    def _scroll_strip_to(self, index):
+        total_px = len(self.workspace) * THUMB_PITCH_PX
+        left = self.strip_canvas.canvasx(0)
+        width = self.strip_canvas.winfo_width()
+        x = index * THUMB_PITCH_PX
+        if x < left or x + THUMB_PITCH_PX > left + width:
+            self.strip_canvas.xview_moveto(max(x + THUMB_PITCH_PX - width, 0) / total_px if total_px else 0)
+
+    def _on_strip_scroll(self, first, last):
+        self.strip_scrollbar.set(first, last)
+        self._render_visible_racks()
+
+    def _on_strip_click(self, event):
+        index = int(self.strip_canvas.canvasx(event.x) // THUMB_PITCH_PX)
+        if 0 <= index < len(self.workspace):
+            self.select_rack(index)
+
+    def _visible_rack_range(self):
+        left = self.strip_canvas.canvasx(0)
+        right = left + self.strip_canvas.winfo_width()
+        first = max(int(left // THUMB_PITCH_PX), 0)
+        last = min(int(right // THUMB_PITCH_PX) + 1, len(self.workspace))
+        return range(first, last)
+
+    def _render_visible_racks(self):
+        visible = self._visible_rack_range()
+        wanted = {id(self.workspace.racks[i]): i for i in visible}
+        for key in [key for key, (_, _, index) in self._thumbnails.items() if wanted.get(key) != index]:
+            self.strip_canvas.delete(*self._thumbnails.pop(key)[1])
+        for i in visible:
+            rack = self.workspace.racks[i]
+            if id(rack) not in self._thumbnails:
+                self._draw_thumbnail(rack, i)
+
+    def _draw_thumbnail(self, rack, index):
+        x1 = index * THUMB_PITCH_PX + THUMB_GAP_PX // 2
+        x2 = x1 + THUMB_WIDTH_PX
+        bottom = THUMB_TOP_PX + rack.rack_height * THUMB_U_PX
+        active = rack is self.model
+
+        items = [
+            self.strip_canvas.create_text((x1 + x2) // 2, THUMB_TOP_PX // 2, text=rack.name, fill='white', font=('Arial', 8), width=THUMB_PITCH_PX),
+            self.strip_canvas.create_rectangle(x1, THUMB_TOP_PX, x2, bottom, fill='#282828',
+                                               outline='#2196f3' if active else '#555555', width=2 if active else 1),
+        ]
+        for comp in rack.components:
+            y1 = THUMB_TOP_PX + (rack.rack_height - (comp.start_u_slot + comp.size_u - 1)) * THUMB_U_PX
+            items.append(self.strip_canvas.create_rectangle(x1 + 2, y1, x2 - 2, y1 + comp.size_u * THUMB_U_PX,
+                                                            fill=comp.color, outline=''))
+        items.append(self.strip_canvas.create_text((x1 + x2) // 2, bottom + 8, text=f"{rack.used_u}/{rack.rack_height}U",
+                                                   fill='white', font=('Arial', 8)))
+        self._thumbnails[id(rack)] = (rack, items, index)
+
+    def _redraw_thumbnail(self, rack):
+        entry = self._thumbnails.pop(id(rack), None)
+        if entry is not None:
+            self.strip_canvas.delete(*entry[1])
+            self._draw_thumbnail(rack, entry[2])
+
+    def _schedule_thumbnail_refresh(self):
+        if not self._thumbnail_refresh_pending:
+            self._thumbnail_refresh_pending = True
+            self.root.after_idle(self._refresh_active_thumbnail)
+
+    def _refresh_active_thumbnail(self):
+        self._thumbnail_refresh_pending = False
+        self._redraw_thumbnail(self.model)
+
+    def _update_budget_display(self):
+        lines = []
+        over = False
+        for attribute, total, limit in self.model.budget.summary():
+            line = f"{BUDGET_ATTRIBUTES[attribute][0]}: {format_amount(attribute, total)}"
+            if limit is not None:
+                line += f" / {format_amount(attribute, limit)}"
+                if total > limit:
+                    line += " (over)"
+                    over = True
+            lines.append(line)
+        self.budget_label.config(text="\n".join(lines), fg='#ff8a80' if over else 'white')
+
+    def set_rack_limits(self):
+        limits = {}
+        for attribute, (label, unit) in BUDGET_ATTRIBUTES.items():
+            current = self.model.budget.limits.get(attribute)
+            value = simpledialog.askstring("Rack Limits", f"{label} limit in {unit} (leave blank for none):",
+                                           initialvalue="" if current is None else f"{current:g}")
+            if value is None:
+                return
+            if value.strip():
+                try:
+                    limits[attribute] = _parse_amount(value)
+                except ValueError:
+                    messagebox.showerror("Rack Limits", f"'{value}' is not a number.")
+                    return
+        try:
+            self.model.budget.set_limits(limits)
+        except ValueError as e:
+            messagebox.showerror("Rack Limits", str(e))
+            return
+        self._checkpoint_autosave()
+        self.update_u_display()
 
     def add_custom_component(self):
         name = simpledialog.askstring("Custom Component", "Enter component name:")
@@ -369,60 +752,275 @@ class RackPlannerApp:
         if not color_code:
             color_code = 'skyblue'
 
-        self.component_categories["Custom"][name] = {"size": size, "color": color_code}
-        self.update_palette()
+        attributes = simpledialog.askstring("Custom Component", "Optional power, weight and outlets, e.g. 'watts=350 kg=12 outlets=2':")
+        try:
+            values = {attribute: _parse_amount(value) for attribute, value in (item.split('=', 1) for item in (attributes or "").split())}
+        except ValueError:
+            messagebox.showerror("Custom Component", f"Could not read '{attributes}'. Use name=value pairs such as watts=350.")
+            return
+        try:
+            self.model.add_custom_component(name, size, color_code, **values)
+        except ValueError as e:
+            messagebox.showerror("Custom Component", str(e))
+            return
+        self._checkpoint_autosave()
+        self._add_palette_entries({name: self.component_categories["Custom"][name]})
         
         messagebox.showinfo("Success", f"Custom component '{name}' ({size}U) added to 'Custom' category.")
 
-    def _place_component_from_palette(self, comp_name, comp_size, comp_color):
-        placed = False
-        for start_u_slot in range(1, self.rack_height - comp_size + 2):
-            if self.is_slot_available(start_u_slot, comp_size):
-                new_comp_data = {
-                    'name': comp_name,
-                    'start_u_slot': start_u_slot,
-                    'size_u': comp_size,
-                    'color': comp_color
-                }
-                self.placed_components_data.append(new_comp_data)
-                self._render_single_component(new_comp_data)
-                self._sync_rack_items()
-                self.update_u_display()
-                self._record_current_state()
-                placed = True
-                break
-        
-        if not placed:
-            messagebox.showerror("No Space", f"Cannot place '{comp_name}' ({comp_size}U). No available contiguous space in the rack.")
+    def _place_component_from_palette(self, comp_name, comp_size, comp_color, load=None):
+        try:
+            new_comp_data = self.model.place(comp_name, comp_size, comp_color, load=load)
+        except RackError as e:
+            messagebox.showerror("Cannot Place", str(e))
+            return
+        self._render_single_component(new_comp_data)
+        self.update_u_display()
+        self._update_undo_redo_buttons()
 
 
     def update_palette(self):
-        for widget in self.palette_inner_frame.winfo_children():
-            widget.destroy()
+        self._palette_build = None
+        self.palette_search.rebuild(self.component_categories)
+        self._filter_palette()
+
+    # Fills the palette PALETTE_CHUNK entries at a time from idle callbacks, so a
+    # large catalog holds up neither the first frame nor the events after it.
+    # With no search term each chunk's rows are appended as they come; a search
+    # term is applied once, after the last chunk. update_palette() during the
+    # build replaces it.
+    def _build_palette_in_chunks(self, on_done=None):
+        entries = [(category, name, info) for category, items in self.component_categories.items() for name, info in items.items()]
+        self.palette_search.rebuild({})
+        self._filter_palette(keep_position=True)
+        build = self._palette_build = iter(range(0, len(entries), PALETTE_CHUNK))
+
+        def step():
+            if self._palette_build is not build:
+                return
+            start = next(build, None)
+            if start is not None:
+                added = [self.palette_search.add(category, name, info) for category, name, info in entries[start:start + PALETTE_CHUNK]]
+                if not self.palette_search_var.get().strip():
+                    self._append_palette_rows(added)
+                self.root.after_idle(step)
+                return
+            self._palette_build = None
+            self._filter_palette(keep_position=True)
+            if on_done is not None:
+                on_done()
+
+        step()
+
+    def _add_palette_entries(self, custom_components):
+        for name, info in custom_components.items():
+            self.palette_search.add("Custom", name, info)
+        self._filter_palette(keep_position=True)
+
+    # Adds rows for newly indexed entries below the current ones. Rows already
+    # drawn keep their positions, so only the rows scrolled into view are drawn.
+    def _append_palette_rows(self, indexes):
+        rows = self._palette_rows
+        category = None
+        if rows:
+            category = rows[-1] if isinstance(rows[-1], str) else rows[-1][0]
+        for index in indexes:
+            entry = self.palette_search.entries[index]
+            if entry[0] != category:
+                category = entry[0]
+                rows.append(category)
+            rows.append(entry)
+        self.palette_canvas.configure(scrollregion=(0, 0, PALETTE_WIDTH_PX, len(rows) * PALETTE_ROW_PX))
+        self._render_visible_palette_rows()
+
+    def _filter_palette(self, keep_position=False):
+        rows = []
+        category = None
+        for index in self.palette_search.search(self.palette_search_var.get()):
+            entry = self.palette_search.entries[index]
+            if entry[0] != category:
+                category = entry[0]
+                rows.append(category)
+            rows.append(entry)
+        self._palette_rows = rows
+        self.palette_canvas.configure(scrollregion=(0, 0, PALETTE_WIDTH_PX, len(rows) * PALETTE_ROW_PX))
+        if not keep_position:
+            self.palette_canvas.yview_moveto(0)
+        self._reset_palette_items()
+
+    def _reset_palette_items(self):
+        self.palette_canvas.delete("all")
+        self._palette_items = {}
+        self._render_visible_palette_rows()
+
+    def _on_palette_scroll(self, first, last):
+        self.palette_scrollbar.set(first, last)
+        self._render_visible_palette_rows()
+
+    def _visible_palette_range(self):
+        top = self.palette_canvas.canvasy(0)
+        bottom = top + self.palette_canvas.winfo_height()
+        first = max(int(top // PALETTE_ROW_PX), 0)
+        last = min(int(bottom // PALETTE_ROW_PX) + 1, len(self._palette_rows))
+        return range(first, last)
+
+    def _render_visible_palette_rows(self):
+        visible = self._visible_palette_range()
+        for row in [row for row in self._palette_items if row not in visible]:
+            self.palette_canvas.delete(*self._palette_items.pop(row))
+        for row in visible:
+            if row not in self._palette_items:
+                self._draw_palette_row(row)
+
+    def _draw_palette_row(self, row):
+        y1 = row * PALETTE_ROW_PX
+        x2 = max(self.palette_canvas.winfo_width(), PALETTE_WIDTH_PX) - 5
+        entry = self._palette_rows[row]
+        if isinstance(entry, str):
+            items = (self.palette_canvas.create_text(x2 // 2, y1 + PALETTE_ROW_PX // 2 + 2, text=f"-- {entry} --", fill='white', font=('Arial', 9)),)
+        else:
+            _, comp_name, comp_size, comp_color = entry
+            items = (
+                self.palette_canvas.create_rectangle(5, y1 + 2, x2, y1 + PALETTE_ROW_PX - 2, fill=comp_color, outline='black'),
+                self.palette_canvas.create_text(10, y1 + PALETTE_ROW_PX // 2, text=f"{comp_name} ({comp_size}U)", fill='black', font=('Arial', 9), anchor='w'),
+            )
+        self._palette_items[row] = items
+
+    def _on_palette_click(self, event):
+        row = int(self.palette_canvas.canvasy(event.y) // PALETTE_ROW_PX)
+        if 0 <= row < len(self._palette_rows) and not isinstance(self._palette_rows[row], str):
+            category, comp_name, comp_size, comp_color = self._palette_rows[row]
+            info = self.component_categories[category].get(comp_name, {})
+            self._place_component_from_palette(comp_name, comp_size, comp_color, budget_load(info))
+
+
+    def _show_task_progress(self, task):
+        if task is None:
+            if self._task_frame_shown:
+                self.task_frame.pack_forget()
+                self._task_frame_shown = False
+            return
+        if not self._task_frame_shown:
+            self.task_frame.pack(fill=tk.X, pady=(0, 5), before=self.status_label)
+            self._task_frame_shown = True
+        queued = len(self.tasks.active) - 1
+        self.task_label.config(text=task.name + (f" (+{queued} queued)" if queued else "") + "...")
+        self.task_progress.config(value=task.fraction or 0)
+
+    def _set_status(self, text):
+        self.status_label.config(text=text)
+        if self._status_after_id is not None:
+            self.root.after_cancel(self._status_after_id)
+        self._status_after_id = self.root.after(STATUS_CLEAR_MS, lambda: self.status_label.config(text=""))
+
+    def _show_file_error(self, title, action, e):
+        if isinstance(e, FileNotFoundError):
+            messagebox.showerror(title, "File not found.")
+        elif isinstance(e, json.JSONDecodeError):
+            messagebox.showerror(title, "Invalid JSON file.")
+        else:
+            messagebox.showerror(title, f"Failed to {action}: {e}")
+
+    # Runs work(task) off the main loop; on_done(result) and errors are handled back
+    # on it. Saves are kept on close so the app never exits half-way through one.
+    def _run_file_task(self, name, work, on_done, title, action, save=False):
+        return self.tasks.submit(name, work, on_done, lambda e: self._show_file_error(title, action, e), keep_on_close=save)
+
+    def _on_close(self):
+        if any(task.keep_on_close for task in self.tasks.active):
+            self.task_label.config(text="Finishing save...")
+            self.root.update_idletasks()
+        self.tasks.shutdown()
+        if self.journal is not None:
+            # A recovery that was cancelled never started journaling; keep its files.
+            started = self.journal.workspace is not None
+            if started:
+                try:
+                    self.journal.save_session(self.workspace)
+                except OSError:
+                    pass
+            self.journal.close(discard=started)
+        self.root.destroy()
+
+    # Journals every change to the autosave folder (see rackjournal.py), first
+    # offering to recover what a crashed session left there. A second running
+    # instance finds the folder taken and does without autosave.
+    def _start_autosave(self):
+        journal = Journal()
+        try:
+            if not journal.acquire():
+                return
+        except OSError:
+            return
+        self.journal = journal
+        self.root.after(AUTOSAVE_CHECK_MS, self._watch_autosave)
+        if not journal.recoverable():
+            journal.start(self.workspace)
+            if journal.has_session():
+                self._restore_last_session()
+            return
+        if not messagebox.askyesno("Recover Work", "RackPlanner did not close properly last time. Recover the unsaved work?"):
+            journal.discard()
+            journal.start(self.workspace)
+            return
 
-        for category_name, category_items in self.component_categories.items():
-            ttk.Label(self.palette_inner_frame, text=f"-- {category_name} --") \
-                .pack(fill=tk.X, pady=(5,2))
-            
-            for comp_name, comp_info in category_items.items():
-                comp_size = comp_info['size']
-                comp_color = comp_info['color']
-                
-                palette_item_frame = tk.Frame(self.palette_inner_frame, bd=1, relief="solid", bg=comp_color)
-                palette_item_frame.pack(fill=tk.X, padx=5, pady=2)
-                
-                palette_label = tk.Label(palette_item_frame, text=f"{comp_name} ({comp_size}U)", 
-                                         bg=comp_color, fg='black', font=('Arial', 9))
-                palette_label.pack(side=tk.LEFT, padx=5, pady=2)
+        def recovered(workspace):
+            self._set_workspace(workspace)
+            journal.start(workspace)
+            self._set_status(f"Recovered {len(workspace)} rack(s) from the autosave.")
+
+        def failed(e):
+            messagebox.showerror("Recover Work", f"Could not recover the autosave: {e}")
+            journal.discard()
+            journal.start(self.workspace)
 
-                palette_item_frame.bind("<Button-1>", lambda e, name=comp_name, size=comp_size, color=comp_color: 
-                                        self._place_component_from_palette(name, size, color))
-                palette_label.bind("<Button-1>", lambda e, name=comp_name, size=comp_size, color=comp_color: 
-                                   self._place_component_from_palette(name, size, color))
+        self.tasks.submit("Recovering autosave", lambda task: journal.recover(progress=task.report), recovered, failed)
 
-        self.palette_inner_frame.update_idletasks()
-        self.palette_canvas.configure(scrollregion=self.palette_canvas.bbox("all"))
+    # Reopens the workspace the app was closed with. It loads in the background,
+    # and is dropped if the blank workspace was already changed in the meantime.
+    def _restore_last_session(self):
+        blank = self.workspace
 
+        def restored(workspace):
+            if self.workspace is not blank or len(blank) > 1 or blank.active.components or blank.active.history_size:
+                return
+            self._set_workspace(workspace)
+            self._set_status(f"Reopened the last session ({len(workspace)} rack(s)).")
+
+        self.tasks.submit("Reopening last session", lambda task: self.journal.load_session(progress=task.report), restored,
+                          lambda e: self._set_status(f"Could not reopen the last session: {e}"))
+
+    # Racks added or removed, limits, custom components and loaded files are not
+    # rack changes the journal records, so they start a new snapshot instead.
+    def _checkpoint_autosave(self):
+        if self.journal is not None and self.journal.workspace is not None:
+            self.journal.checkpoint(self.workspace)
+            self._check_autosave()
+
+    # Snapshots are written on the journal's own thread, and the journal also
+    # checkpoints by itself, so its error is checked here at every checkpoint
+    # and every AUTOSAVE_CHECK_MS. The first failure gets a dialog, since work is
+    # no longer protected; once a snapshot succeeds again the status line says so.
+    def _check_autosave(self):
+        error = self.journal.error if self.journal is not None else None
+        if error is None:
+            if self._autosave_error is not None:
+                self._autosave_error = None
+                self._set_status("Autosave is working again.")
+            return
+        if self._autosave_error is None:
+            self._autosave_error = error
+            messagebox.showwarning("Autosave", f"Autosave could not write a snapshot: {error}\n\n"
+                                               "Recovery still works from the last good one, but save your work to be safe.")
+        elif str(error) != str(self._autosave_error):
+            self._autosave_error = error
+            self._set_status(f"Autosave failed: {error}")
+
+    def _watch_autosave(self):
+        if self.journal is None:
+            return
+        self._check_autosave()
+        self.root.after(AUTOSAVE_CHECK_MS, self._watch_autosave)
 
     def save_rack_config(self):
         file_path = filedialog.asksaveasfilename(defaultextension=".json",
@@ -431,21 +1029,11 @@ class RackPlannerApp:
         if not file_path:
             return
 
-        save_data = {
-            "rack_height": self.rack_height,
-            "placed_components": [
-                {'name': comp['name'], 'start_u_slot': comp['start_u_slot'], 'size_u': comp['size_u'], 'color': comp.get('color', 'skyblue')}
-                for comp in self.placed_components_data
-            ],
-            "custom_components": self.component_categories["Custom"]
-        }
-
-        try:
-            with open(file_path, 'w') as f:
-                json.dump(save_data, f, indent=4)
-            messagebox.showinfo("Save Success", "Rack configuration saved successfully!")
-        except Exception as e:
-            messagebox.showerror("Save Error", f"Failed to save configuration: {e}")
+        save_data = self.model.to_dict()
+        save_data["custom_components"] = dict(save_data["custom_components"])
+        self._run_file_task(f"Saving {os.path.basename(file_path)}", lambda task: rackio.save_json(file_path, save_data, task.report),
+                            lambda _: self._set_status(f"Rack saved to {os.path.basename(file_path)}."),
+                            "Save Error", "save configuration", save=True)
 
     def load_rack_config(self):
         file_path = filedialog.askopenfilename(defaultextension=".json",
@@ -454,99 +1042,237 @@ class RackPlannerApp:
         if not file_path:
             return
 
-        try:
-            with open(file_path, 'r') as f:
-                loaded_data = json.load(f)
-
-            self.rack_height = loaded_data.get("rack_height", DEFAULT_U)
-            self.rack_size_var.set(self.rack_height)
-            
-            self.component_categories["Custom"] = loaded_data.get("custom_components", {})
+        def loaded(loaded_data):
+            self._cancel_drag()
+            try:
+                self.model.load_dict(loaded_data)
+            except Exception as e:
+                self._show_file_error("Load Error", "load configuration", e)
+                return
+            self._checkpoint_autosave()
             self.update_palette()
+            self._after_model_change()
+            self._set_status(f"Rack loaded from {os.path.basename(file_path)}.")
 
-            loaded_components_with_color = []
-            for comp in loaded_data.get("placed_components", []):
-                if 'color' not in comp:
-                    comp_info = self.get_component_info(comp['name'])
-                    comp['color'] = comp_info.get('color', 'skyblue') if comp_info else 'skyblue'
-                loaded_components_with_color.append(comp)
-
-            self.placed_components_data = loaded_components_with_color
-            self._draw_rack_and_components()
-            
-            self._record_current_state()
-            messagebox.showinfo("Load Success", "Rack configuration loaded successfully!")
-
-        except FileNotFoundError:
-            messagebox.showerror("Load Error", "File not found.")
-        except json.JSONDecodeError:
-            messagebox.showerror("Load Error", "Invalid JSON file.")
-        except Exception as e:
-            messagebox.showerror("Load Error", f"Failed to load configuration: {e}")
+        self._run_file_task(f"Loading {os.path.basename(file_path)}", lambda task: rackio.load_json(file_path, task.report),
+                            loaded, "Load Error", "load configuration")
 
     def save_custom_components(self):
         file_path = filedialog.asksaveasfilename(defaultextension=".json",
-                                                filetypes=[("JSON files", "*.json"), ("All files", "*.*")],
+                                                filetypes=[("JSON files", "*.json"), ("JSON Lines files", "*.jsonl"), ("All files", "*.*")],
                                                 title="Save Custom Components")
         if not file_path:
             return
 
-        try:
-            with open(file_path, 'w') as f:
-                json.dump(self.component_categories["Custom"], f, indent=4)
-            messagebox.showinfo("Save Success", "Custom components saved successfully!")
-        except Exception as e:
-            messagebox.showerror("Save Error", f"Failed to save custom components: {e}")
+        custom_components = dict(self.component_categories["Custom"])
+        self._run_file_task(f"Saving {os.path.basename(file_path)}", lambda task: rackio.save_catalog(file_path, custom_components, task.report),
+                            lambda _: self._set_status(f"{len(custom_components)} custom component(s) saved."),
+                            "Save Error", "save custom components", save=True)
+
+    # The project is copied when the save starts, so edits made while it is being
+    # written go into the next save rather than half into this one.
+    def save_project(self):
+        file_path = filedialog.asksaveasfilename(defaultextension=".json",
+                                                filetypes=[("JSON files", "*.json"), ("JSON Lines files", "*.jsonl"), ("Binary projects", "*.rackbin"), ("All files", "*.*")],
+                                                title="Save Project")
+        if not file_path:
+            return
+
+        workspace = self.workspace.copy()
+        self._run_file_task(f"Saving {os.path.basename(file_path)}", lambda task: rackio.save_project(file_path, workspace, task.report),
+                            lambda _: self._set_status(f"Project with {len(workspace)} rack(s) saved."),
+                            "Save Error", "save project", save=True)
+
+    def load_project(self):
+        file_path = filedialog.askopenfilename(defaultextension=".json",
+                                              filetypes=[("JSON files", "*.json"), ("JSON Lines files", "*.jsonl"), ("Binary projects", "*.rackbin"), ("All files", "*.*")],
+                                              title="Load Project")
+        if not file_path:
+            return
+
+        def loaded(workspace):
+            self._set_workspace(workspace)
+            self._set_status(f"Project with {len(self.workspace)} rack(s) loaded.")
+
+        self._run_file_task(f"Loading {os.path.basename(file_path)}", lambda task: rackio.load_project(file_path, progress=task.report),
+                            loaded, "Load Error", "load project")
+
+    def _set_workspace(self, workspace):
+        self._cancel_drag()
+        self.workspace = workspace
+        self._checkpoint_autosave()
+        self._build_palette_in_chunks()
+        self._reset_strip()
+        self.strategy_var.set(self.model.placement_strategy)
+        self._after_model_change()
 
     def load_custom_components(self):
         file_path = filedialog.askopenfilename(defaultextension=".json",
-                                              filetypes=[("JSON files", "*.json"), ("All files", "*.*")],
+                                              filetypes=[("JSON files", "*.json"), ("JSON Lines files", "*.jsonl"), ("All files", "*.*")],
                                               title="Load Custom Components")
         if not file_path:
             return
 
-        try:
-            with open(file_path, 'r') as f:
-                loaded_custom_data = json.load(f)
-            
-            if isinstance(loaded_custom_data, dict):
-                for name, info in loaded_custom_data.items():
-                    if not (isinstance(info, dict) and 'size' in info and 'color' in info):
-                        raise ValueError("Invalid format for custom component data.")
-                self.component_categories["Custom"].update(loaded_custom_data)
-                self.update_palette()
-                messagebox.showinfo("Load Success", "Custom components loaded successfully!")
-            else:
-                raise ValueError("Loaded data is not in the expected dictionary format.")
+        def loaded(custom_components):
+            self.model.merge_custom_components(custom_components)
+            self._checkpoint_autosave()
+            self._add_palette_entries(custom_components)
+            self._set_status(f"{len(custom_components)} custom component(s) loaded.")
 
-        except FileNotFoundError:
-            messagebox.showerror("Load Error", "File not found.")
-        except json.JSONDecodeError:
-            messagebox.showerror("Load Error", "Invalid JSON file. Please ensure it contains valid custom component data.")
-        except ValueError as e:
-            messagebox.showerror("Load Error", f"Invalid custom components file format: {e}")
-        except Exception as e:
-            messagebox.showerror("Load Error", f"Failed to load custom components: {e}")
+        self._run_file_task(f"Loading {os.path.basename(file_path)}", lambda task: rackio.load_catalog(file_path, task.report),
+                            loaded, "Load Error", "load custom components")
 
     def export_canvas_as_image(self):
-        self.canvas.update_idletasks() 
-
-        x=self.root.winfo_x()+self.canvas.winfo_x()
-        y=self.root.winfo_y()+self.canvas.winfo_y()
-        x1=x+self.canvas.winfo_width()
-        y1=y+self.canvas.winfo_height()
-
         file_path = filedialog.asksaveasfilename(defaultextension=".png",
-                                                filetypes=[("PNG files", "*.png"), ("All files", "*.*")],
+                                                filetypes=[("PNG files", "*.png"), ("PDF files", "*.pdf"), ("SVG files", "*.svg"), ("All files", "*.*")],
                                                 title="Export Rack Diagram as Image")
         if not file_path:
             return
         
         try:
-            ImageGrab.grab(bbox=(x, y, x1, y1)).save(file_path)
+            export_rack(self.model, file_path)
             messagebox.showinfo("Export Success", f"Rack diagram exported to {file_path}")
         except Exception as e:
-            messagebox.showerror("Export Error", f"Failed to export image. Make sure Pillow is installed (pip install Pillow) and necessary screenshot utilities are available on Linux/macOS. Error: {e}")
+            messagebox.showerror("Export Error", f"Failed to export image: {e}")
+
+    def _set_selected(self, comp_data, selected):
+        if selected:
+            self._selection[id(comp_data)] = comp_data
+        else:
+            self._selection.pop(id(comp_data), None)
+        self.canvas.itemconfig(self._component_items[id(comp_data)][0], outline=SELECTION_COLOR if selected else '#333333', width=3 if selected else 2)
+
+    def _clear_selection(self):
+        for comp_data in list(self._selection.values()):
+            self._set_selected(comp_data, False)
+
+    def _select_all(self):
+        for comp_data in self.placed_components_data:
+            self._set_selected(comp_data, True)
+
+    def _selected_components(self):
+        return sorted(self._selection.values(), key=lambda comp_data: comp_data.start_u_slot)
+
+    def _component_at(self, event):
+        closest_item_ids = self.canvas.find_closest(event.x, event.y)
+        if not closest_item_ids:
+            return None
+        comp_data = self._item_components.get(closest_item_ids[0])
+        if comp_data is None:
+            return None
+        x1, y1, x2, y2 = self.canvas.coords(self._component_items[id(comp_data)][0])
+        return comp_data if x1 <= event.x <= x2 and y1 <= event.y <= y2 else None
+
+    def _toggle_selection(self, event):
+        self.canvas.focus_set()
+        comp_data = self._component_at(event)
+        if comp_data is None:
+            self._start_band(event)
+        else:
+            self._set_selected(comp_data, id(comp_data) not in self._selection)
+
+    def _start_band(self, event):
+        self._band = (event.y, self.canvas.create_rectangle(RACK_LEFT_MARGIN, event.y, RACK_RIGHT_MARGIN, event.y,
+                                                            outline=SELECTION_COLOR, dash=(4, 2), tags="selection_band"))
+
+    # Adds every component with a U between the band's ends to the selection.
+    def _select_in_band(self, top_y, bottom_y):
+        high_u = self.rack_height - max(int(top_y // U_HEIGHT), 0)
+        low_u = self.rack_height - min(int(bottom_y // U_HEIGHT), self.rack_height - 1)
+        for comp_data in self.placed_components_data:
+            if comp_data.start_u_slot <= high_u and comp_data.start_u_slot + comp_data.size_u - 1 >= low_u:
+                self._set_selected(comp_data, True)
+
+    def _finish_band(self, event):
+        start_y, band = self._band
+        self._band = None
+        self.canvas.delete(band)
+        self._select_in_band(min(start_y, event.y), max(start_y, event.y))
+
+    # Group operations check the whole group once, go into the history as one step
+    # and update the canvas and the U display once.
+    def _delete_selection(self):
+        selected = self._selected_components()
+        if not selected or not messagebox.askyesno("Delete Components", f"Are you sure you want to delete the {len(selected)} selected component(s)?"):
+            return
+        for comp_data in self.model.delete_many(selected):
+            self._remove_component_items(comp_data)
+        self.update_u_display()
+        self._update_undo_redo_buttons()
+
+    def _shift_selection(self, offset):
+        selected = self._selected_components()
+        if not selected:
+            return
+        try:
+            moved = self.model.shift(selected, offset)
+        except RackError as e:
+            self._set_status(str(e))
+            return
+        for comp_data in moved:
+            self._move_component_items(comp_data)
+        self.update_u_display()
+        self._update_undo_redo_buttons()
+
+    def _duplicate_selection(self):
+        selected = self._selected_components()
+        if not selected:
+            return
+        try:
+            copies = self.model.duplicate(selected)
+        except RackError as e:
+            messagebox.showerror("Duplicate", str(e))
+            return
+        self._clear_selection()
+        for comp_data in copies:
+            self._render_single_component(comp_data)
+            self._set_selected(comp_data, True)
+        self.update_u_display()
+        self._update_undo_redo_buttons()
+        self._set_status(f"Duplicated {len(copies)} component(s) at {copies[0].start_u_slot}U.")
+
+    # Dragging one of several selected components moves them all: they are lifted
+    # together and each gets a ghost, outlined green where the whole group fits.
+    def _start_group_drag(self, event):
+        comps = self._selected_components()
+        for comp_data in comps:
+            self.model.lift(comp_data)
+            self._set_component_state(comp_data, 'hidden')
+            x1, y1, x2, y2 = self.canvas.coords(self._component_items[id(comp_data)][0])
+            self.canvas.create_rectangle(x1, y1, x2, y2, fill=comp_data.color, outline='#A5D6A7', stipple='gray50', width=2, tags=("ghost_item", "group_ghost"))
+            self.canvas.create_text((x1 + x2) / 2, (y1 + y2) / 2, fill='black', font=('Arial', 10, 'bold'), text=comp_data.name, tags="ghost_item")
+        self._group_drag = (comps, event.y, 0)
+
+    def _flush_group_drag(self, event_y):
+        comps, anchor_y, offset = self._group_drag
+        bottom = min(comp_data.start_u_slot for comp_data in comps)
+        top = max(comp_data.start_u_slot + comp_data.size_u - 1 for comp_data in comps)
+        new_offset = min(max(round((anchor_y - event_y) / U_HEIGHT), 1 - bottom), self.rack_height - top)
+        if new_offset == offset:
+            return
+        self._group_drag = (comps, anchor_y, new_offset)
+        self.canvas.move("ghost_item", 0, (offset - new_offset) * U_HEIGHT)
+        fits = all(self.is_slot_available(comp_data.start_u_slot + new_offset, comp_data.size_u) for comp_data in comps)
+        self.canvas.itemconfig("group_ghost", outline='#A5D6A7' if fits else '#EF9A9A')
+
+    def _drop_group(self):
+        comps, _, offset = self._group_drag
+        self._group_drag = None
+        self.canvas.delete("ghost_item")
+        for comp_data in comps:
+            self.model.settle(comp_data)
+            self._set_component_state(comp_data, 'normal')
+        if not offset:
+            return
+        try:
+            moved = self.model.shift(comps, offset)
+        except RackError:
+            messagebox.showerror("Invalid Drop", "Cannot move the selection here. Slots are occupied or out of bounds.")
+            return
+        for comp_data in moved:
+            self._move_component_items(comp_data)
+        self.update_u_display()
+        self._update_undo_redo_buttons()
 
     def _start_drag(self, event):
         self._dragging_component = None
@@ -554,60 +1280,82 @@ class RackPlannerApp:
         self._clear_ghost()
 
         if event.widget == self.canvas:
-            closest_item_ids = self.canvas.find_closest(event.x, event.y)
-            if not closest_item_ids:
+            self.canvas.focus_set()
+            comp_data = self._component_at(event)
+            if comp_data is None:
+                self._clear_selection()
+                self._start_band(event)
                 return
-
-            clicked_item_id = closest_item_ids[0]
-
-            for comp_data in self.placed_components_data:
-                if comp_data['rect_id'] == clicked_item_id or comp_data['text_id'] == clicked_item_id:
-                    self._dragging_component = comp_data
-                    
-                    start_index_0_based_top = self.rack_height - (self._dragging_component['start_u_slot'] + self._dragging_component['size_u'] - 1)
-                    for i in range(start_index_0_based_top, start_index_0_based_top + self._dragging_component['size_u']):
-                        if 0 <= i < self.rack_height:
-                            self.rack_items[i] = None
-                    self.canvas.itemconfig(self._dragging_component['rect_id'], state='hidden')
-                    self.canvas.itemconfig(self._dragging_component['text_id'], state='hidden')
-
-                    original_coords = self.canvas.coords(comp_data['rect_id'])
-                    x1_orig, y1_orig, x2_orig, y2_orig = original_coords
-
-                    ghost_fill_color = self._dragging_component['color']
-                    ghost_outline_color = 'gray'
-                    ghost_text_color = 'black'
-
-                    self._ghost_rect_id = self.canvas.create_rectangle(
-                        x1_orig, y1_orig, x2_orig, y2_orig,
-                        fill=ghost_fill_color, outline=ghost_outline_color, stipple='gray50', tags="ghost_item",
-                        width=2
-                    )
-                    self._ghost_text_id = self.canvas.create_text(
-                        (x1_orig + x2_orig) / 2, (y1_orig + y2_orig) / 2,
-                        fill=ghost_text_color, font=('Arial', 10, 'bold'), text=self._dragging_component['name'], tags="ghost_item"
-                    )
-                    self.canvas.tag_raise(self._ghost_rect_id)
-                    self.canvas.tag_raise(self._ghost_text_id)
-                    break
+            if id(comp_data) in self._selection and len(self._selection) > 1:
+                self._start_group_drag(event)
+                return
+            self._clear_selection()
+            self._set_selected(comp_data, True)
+            self._dragging_component = comp_data
+            self._drag_last_slot = None
+            
+            self.model.lift(comp_data)
+            self._set_component_state(self._dragging_component, 'hidden')
+
+            original_coords = self.canvas.coords(self._component_items[id(comp_data)][0])
+            x1_orig, y1_orig, x2_orig, y2_orig = original_coords
+
+            ghost_fill_color = self._dragging_component.color
+            ghost_outline_color = 'gray'
+            ghost_text_color = 'black'
+
+            self.canvas.tag_raise("highlight_rect")
+            self._ghost_rect_id = self.canvas.create_rectangle(
+                x1_orig, y1_orig, x2_orig, y2_orig,
+                fill=ghost_fill_color, outline=ghost_outline_color, stipple='gray50', tags="ghost_item",
+                width=2
+            )
+            self._ghost_text_id = self.canvas.create_text(
+                (x1_orig + x2_orig) / 2, (y1_orig + y2_orig) / 2,
+                fill=ghost_text_color, font=('Arial', 10, 'bold'), text=self._dragging_component.name, tags="ghost_item"
+            )
+            self.canvas.tag_raise(self._ghost_rect_id)
+            self.canvas.tag_raise(self._ghost_text_id)
         
         if self._dragging_component:
             self._drag_start_x = event.x 
             self._drag_start_y = event.y
 
 
+    # Motion events are coalesced to one update per display frame, and a frame whose
+    # snapped slot matches the previous one does no canvas or model work.
     def _drag_motion(self, event):
-        if self._dragging_component:
-            self._clear_highlights()
-
-            target_u_index_0_based_top = int(event.y / U_HEIGHT)
+        if self._band is not None:
+            self.canvas.coords(self._band[1], RACK_LEFT_MARGIN, min(self._band[0], event.y), RACK_RIGHT_MARGIN, max(self._band[0], event.y))
+        elif self._dragging_component or self._group_drag:
+            self._pending_drag_y = event.y
+            if self._drag_after_id is None:
+                self._drag_after_id = self.root.after(DRAG_FRAME_MS, self._flush_drag_motion)
+
+    def _cancel_drag_motion(self):
+        if self._drag_after_id is not None:
+            self.root.after_cancel(self._drag_after_id)
+            self._drag_after_id = None
+        self._pending_drag_y = None
+
+    def _flush_drag_motion(self):
+        self._drag_after_id = None
+        if self._pending_drag_y is None:
+            return
+        event_y, self._pending_drag_y = self._pending_drag_y, None
+        if self._group_drag:
+            self._flush_group_drag(event_y)
+        elif self._dragging_component:
+            target_u_index_0_based_top = int(event_y / U_HEIGHT)
             
-            size_u = self._dragging_component['size_u']
+            size_u = self._dragging_component.size_u
 
             potential_start_u_slot = self.rack_height - (target_u_index_0_based_top + size_u - 1)
 
-            potential_start_u_slot = max(1, potential_start_u_slot)
-            potential_start_u_slot = min(potential_start_u_slot, self.rack_height - size_u + 1)
+            potential_start_u_slot = self.model.clamp_start_u_slot(potential_start_u_slot, size_u)
+            if potential_start_u_slot == self._drag_last_slot:
+                return
+            self._drag_last_slot = potential_start_u_slot
             
             is_valid_drop = self.is_slot_available(potential_start_u_slot, size_u)
 
@@ -626,12 +1374,24 @@ class RackPlannerApp:
             self._highlight_slots(potential_start_u_slot, size_u, is_valid_drop)
 
     def _drop(self, event):
+        if self._band is not None:
+            self._finish_band(event)
+            return
+        if self._group_drag:
+            if self._pending_drag_y is not None:
+                self._flush_drag_motion()
+            self._cancel_drag_motion()
+            self._drop_group()
+            return
         if self._dragging_component:
+            if self._pending_drag_y is not None:
+                self._flush_drag_motion()
+            self._cancel_drag_motion()
+            self._drag_last_slot = None
             if self._ghost_rect_id is None:
                 if self._dragging_component:
-                    self.canvas.itemconfig(self._dragging_component['rect_id'], state='normal')
-                    self.canvas.itemconfig(self._dragging_component['text_id'], state='normal')
-                    self._sync_rack_items()
+                    self._set_component_state(self._dragging_component, 'normal')
+                    self.model.settle(self._dragging_component)
                 self._dragging_component = None
                 self._clear_highlights()
                 self._clear_ghost()
@@ -640,57 +1400,62 @@ class RackPlannerApp:
             ghost_rect_coords = self.canvas.coords(self._ghost_rect_id)
             final_ghost_top_y = ghost_rect_coords[1]
             
-            size_u = self._dragging_component['size_u']
+            size_u = self._dragging_component.size_u
 
             final_u_index_0_based_top = int(final_ghost_top_y / U_HEIGHT)
             target_start_u_slot = self.rack_height - (final_u_index_0_based_top + size_u - 1)
 
-            target_start_u_slot = max(1, target_start_u_slot)
-            target_start_u_slot = min(target_start_u_slot, self.rack_height - size_u + 1)
-
-            is_valid_drop = self.is_slot_available(target_start_u_slot, size_u)
+            target_start_u_slot = self.model.clamp_start_u_slot(target_start_u_slot, size_u)
 
             self._clear_highlights()
             self._clear_ghost() 
 
-            if is_valid_drop:
-                self._dragging_component['start_u_slot'] = target_start_u_slot
-
-                start_index_new_0_based_top = self.rack_height - (target_start_u_slot + size_u - 1)
-                y1_new = start_index_new_0_based_top * U_HEIGHT
-                y2_new = y1_new + size_u * U_HEIGHT
+            try:
+                self.model.drop(self._dragging_component, target_start_u_slot)
+                is_valid_drop = True
+            except RackError:
+                is_valid_drop = False
 
-                self.canvas.coords(self._dragging_component['rect_id'], RACK_LEFT_MARGIN, y1_new, RACK_RIGHT_MARGIN, y2_new)
-                self.canvas.coords(self._dragging_component['text_id'], RACK_LEFT_MARGIN + RACK_WIDTH_PX // 2, (y1_new + y2_new) // 2)
+            if is_valid_drop:
+                self._move_component_items(self._dragging_component)
 
-                self._sync_rack_items()
                 self.update_u_display()
-                self.canvas.itemconfig(self._dragging_component['rect_id'], state='normal')
-                self.canvas.itemconfig(self._dragging_component['text_id'], state='normal')
-                self._record_current_state()
+                self._set_component_state(self._dragging_component, 'normal')
+                self._update_undo_redo_buttons()
 
             else:
                 messagebox.showerror("Invalid Drop", "Cannot place component here. Slots are occupied or out of bounds.")
                 
-                original_start_u_slot = self._dragging_component['start_u_slot']
-                original_size_u = self._dragging_component['size_u']
-                original_start_index_0_based_top = self.rack_height - (original_start_u_slot + original_size_u - 1)
-                
-                original_y1 = original_start_index_0_based_top * U_HEIGHT
-                original_y2 = original_y1 + original_size_u * U_HEIGHT
-                self.canvas.coords(self._dragging_component['rect_id'], RACK_LEFT_MARGIN, original_y1, RACK_RIGHT_MARGIN, original_y2)
-                self.canvas.itemconfig(self._dragging_component['rect_id'], state='normal')
-                self.canvas.coords(self._dragging_component['text_id'], RACK_LEFT_MARGIN + RACK_WIDTH_PX // 2, (original_y1 + original_y2) // 2)
-                self.canvas.itemconfig(self._dragging_component['text_id'], state='normal')
-                
-                self._sync_rack_items()
+                self._move_component_items(self._dragging_component)
+                self._set_component_state(self._dragging_component, 'normal')
 
             self._dragging_component = None
             self.update_u_display()
 
-    def _highlight_slots(self, start_u_slot, size_u, is_valid):
+    # Puts a dragged component or group back where it was, without a move in the
+    # history. Loaded results replace the model, so a drag in progress has to end
+    # first; otherwise its drop would land in a model the component is not in.
+    def _cancel_drag(self):
+        if self._group_drag:
+            comps = self._group_drag[0]
+        elif self._dragging_component:
+            comps = [self._dragging_component]
+        else:
+            return
+        self._cancel_drag_motion()
+        for comp_data in comps:
+            self.model.settle(comp_data)
+            self._set_component_state(comp_data, 'normal')
+        self._dragging_component = None
+        self._group_drag = None
+        self._drag_last_slot = None
         self._clear_highlights()
+        self._clear_ghost()
+        self.canvas.delete("ghost_item")
 
+    # Highlight rectangles are a pool that only grows to the largest dragged size;
+    # spare ones are hidden rather than deleted.
+    def _highlight_slots(self, start_u_slot, size_u, is_valid):
         color = '#A5D6A7' if is_valid else '#EF9A9A'
         
         start_index_0_based_top = self.rack_height - (start_u_slot + size_u - 1)
@@ -698,22 +1463,27 @@ class RackPlannerApp:
 
         start_index_0_based_top = max(0, start_index_0_based_top)
         end_index_0_based_top = min(self.rack_height, end_index_0_based_top)
-
-        for i in range(start_index_0_based_top, end_index_0_based_top):
-            y1 = i * U_HEIGHT
-            y2 = y1 + U_HEIGHT
-            rect_id = self.canvas.create_rectangle(RACK_LEFT_MARGIN, y1, RACK_RIGHT_MARGIN, y2, 
-                                                   fill=color, stipple='gray50', outline=color,
-                                                   tags="highlight_rect") 
-            self._drag_highlight_rects.append(rect_id)
-        if self._ghost_rect_id:
-             self.canvas.tag_raise(self._ghost_rect_id)
-             self.canvas.tag_raise(self._ghost_text_id)
+        count = end_index_0_based_top - start_index_0_based_top
+
+        if len(self._drag_highlight_rects) < count:
+            while len(self._drag_highlight_rects) < count:
+                self._drag_highlight_rects.append(self.canvas.create_rectangle(
+                    RACK_LEFT_MARGIN, 0, RACK_RIGHT_MARGIN, U_HEIGHT, stipple='gray50', state='hidden', tags="highlight_rect"))
+            if self._ghost_rect_id:
+                self.canvas.tag_raise(self._ghost_rect_id)
+                self.canvas.tag_raise(self._ghost_text_id)
+
+        for n, rect_id in enumerate(self._drag_highlight_rects):
+            if n < count:
+                y1 = (start_index_0_based_top + n) * U_HEIGHT
+                self.canvas.coords(rect_id, RACK_LEFT_MARGIN, y1, RACK_RIGHT_MARGIN, y1 + U_HEIGHT)
+                self.canvas.itemconfig(rect_id, fill=color, outline=color, state='normal')
+            else:
+                self.canvas.itemconfig(rect_id, state='hidden')
 
     def _clear_highlights(self):
         for rect_id in self._drag_highlight_rects:
-            self.canvas.delete(rect_id)
-        self._drag_highlight_rects = []
+            self.canvas.itemconfig(rect_id, state='hidden')
 
     def _clear_ghost(self):
         if self._ghost_rect_id:
@@ -731,6 +1501,12 @@ class RackPlannerApp:
 
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        import rackcli
+        sys.exit(rackcli.main())
+    instrumentation = rackprofile.from_environment()
+    if instrumentation is not None:
+        instrumentation.instrument(RackPlannerApp, INSTRUMENTED_HANDLERS)
     root = tk.Tk()
-    app = RackPlannerApp(root)
+    app = RackPlannerApp(root, instrumentation)
     root.mainloop()
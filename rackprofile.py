@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+import atexit
+import functools
+import json
+import os
+import time
+from bisect import bisect_left
+
+# Upper bounds of the latency buckets in milliseconds; slower calls go in a final
+# overflow bucket. 16 ms is one frame at 60 Hz.
+LATENCY_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 33, 66, 133, 266, 533, 1066)
+INSTRUMENT_ENV = 'RACKPLANNER_INSTRUMENT'
+TOP_STATS = 15
+
+
+class LatencyHistogram:
+    __slots__ = ('counts', 'count', 'total', 'max')
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, ms):
+        self.counts[bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        if ms > self.max:
+            self.max = ms
+
+    # The upper bound of the bucket holding the given fraction of calls, so the
+    # real value is at most this (and never more than the slowest call).
+    def percentile(self, fraction):
+        if not self.count:
+            return 0.0
+        wanted = fraction * self.count
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS_MS, self.counts):
+            seen += count
+            if seen >= wanted:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'total_ms': round(self.total, 3),
+            'mean_ms': round(self.total / self.count, 3) if self.count else 0.0,
+            'p50_ms': self.percentile(0.5),
+            'p95_ms': self.percentile(0.95),
+            'p99_ms': self.percentile(0.99),
+            'max_ms': round(self.max, 3),
+            'buckets': [[bound, count] for bound, count in zip(LATENCY_BUCKETS_MS + (None,), self.counts) if count],
+        }
+
+
+# Opt-in timing for UI handlers. instrument() swaps methods on a class for timed
+# wrappers before any instance binds them to Tk events, so nothing has to be patched
+# by hand and nothing is timed unless it was asked for. Gauges are callables read
+# whenever stats are taken (canvas items, history size and so on). cProfile, pstats
+# and tracemalloc are only imported once used, as they cost more to import than
+# the rest of the app.
+class Instrumentation:
+    def __init__(self):
+        self.histograms = {}
+        self.gauges = {}
+        self._originals = []
+        self._profiler = None
+        self.allocations = None
+
+    def instrument(self, cls, names):
+        for name in names:
+            original = getattr(cls, name)
+            self._originals.append((cls, name, original))
+            setattr(cls, name, self._timed(name, original))
+
+    def uninstrument(self):
+        for cls, name, original in reversed(self._originals):
+            setattr(cls, name, original)
+        self._originals = []
+
+    def _timed(self, name, func):
+        histogram = self.histograms.setdefault(name, LatencyHistogram())
+
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                histogram.add((time.perf_counter() - started) * 1000)
+        return timed
+
+    def gauge(self, name, read):
+        self.gauges[name] = read
+
+    def reset(self):
+        for name in self.histograms:
+            self.histograms[name].__init__()
+
+    def stats(self):
+        gauges = {}
+        for name, read in self.gauges.items():
+            try:
+                gauges[name] = read()
+            except Exception as e:
+                gauges[name] = f"error: {e}"
+        stats = {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'handlers': {name: histogram.to_dict() for name, histogram in self.histograms.items() if histogram.count},
+            'gauges': gauges,
+        }
+        if self.allocations is not None:
+            stats['allocations'] = self.allocations
+        return stats
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.stats(), f, indent=4)
+        return path
+
+    def summary_lines(self):
+        lines = [f"{'handler (ms)':<32}{'calls':>7}{'p50':>9}{'p95':>9}{'max':>9}"]
+        for name, histogram in sorted(self.histograms.items(), key=lambda item: -item[1].total):
+            if histogram.count:
+                lines.append(f"{name:<32}{histogram.count:>7}{histogram.percentile(0.5):>9.2f}{histogram.percentile(0.95):>9.2f}{histogram.max:>9.2f}")
+        lines.extend(f"{name}: {value}" for name, value in self.stats()['gauges'].items())
+        return lines
+
+    @property
+    def profiling(self):
+        return self._profiler is not None
+
+    def start_profiler(self):
+        import cProfile
+        if self._profiler is None:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+
+    # Stops cProfile, writes the raw stats to path (for snakeviz, pstats and so on)
+    # when one is given, and returns the slowest functions by cumulative time.
+    def stop_profiler(self, path=None):
+        profiler, self._profiler = self._profiler, None
+        if profiler is None:
+            return ""
+        import io
+        import pstats
+        profiler.disable()
+        if path:
+            profiler.dump_stats(path)
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(TOP_STATS)
+        return out.getvalue()
+
+    @property
+    def tracing_allocations(self):
+        import tracemalloc
+        return tracemalloc.is_tracing()
+
+    def start_tracemalloc(self):
+        import tracemalloc
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    # Stops tracemalloc and keeps the lines that allocated the most memory still
+    # alive, which are also written by dump().
+    def stop_tracemalloc(self):
+        import tracemalloc
+        if not tracemalloc.is_tracing():
+            return []
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        self.allocations = [f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}: {stat.size / 1024:.1f} KiB in {stat.count} blocks"
+                            for stat in snapshot.statistics('lineno')[:TOP_STATS]]
+        return self.allocations
+
+
+# Instrumentation for the current process, or None unless RACKPLANNER_INSTRUMENT is
+# set. Any value other than 1 is also taken as a file to write the stats to on exit.
+def from_environment():
+    value = os.environ.get(INSTRUMENT_ENV)
+    if not value:
+        return None
+    instrumentation = Instrumentation()
+    if value != '1':
+        atexit.register(instrumentation.dump, value)
+    return instrumentation
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+import os
+from functools import lru_cache
+
+import rackio
+from rackmodel import RackError
+
+U_HEIGHT = 40
+RACK_WIDTH_PX = 280
+RACK_LEFT_MARGIN = 30
+RACK_RIGHT_MARGIN = RACK_LEFT_MARGIN + RACK_WIDTH_PX
+IMAGE_WIDTH_PX = RACK_RIGHT_MARGIN + 10
+
+BACKGROUND_COLOR = '#1e1e1e'
+RACK_COLOR = '#282828'
+RAIL_COLOR = '#555555'
+ROW_COLOR = '#666666'
+COMPONENT_OUTLINE = '#333333'
+FALLBACK_RGB = (135, 206, 235)
+
+EXPORT_FORMATS = ('png', 'pdf', 'svg')
+PNG_COMPRESS_LEVEL = 1
+
+
+@lru_cache(maxsize=None)
+def text_color_for(color_hex):
+    try:
+        if len(color_hex) != 7 or not color_hex.startswith('#'):
+            raise ValueError(color_hex)
+        r = int(color_hex[1:3], 16)
+        g = int(color_hex[3:5], 16)
+        b = int(color_hex[5:7], 16)
+    except ValueError:
+        r, g, b = FALLBACK_RGB
+
+    luminance = (0.299 * r + 0.587 * g + 0.114 * b) / 255
+    return 'white' if luminance < 0.5 else 'black'
+
+
+def component_y(comp, rack_height):
+    y1 = (rack_height - (comp.start_u_slot + comp.size_u - 1)) * U_HEIGHT
+    return y1, y1 + comp.size_u * U_HEIGHT
+
+
+def _pil_color(color):
+    from PIL import ImageColor
+    try:
+        return ImageColor.getrgb(color)
+    except ValueError:
+        return FALLBACK_RGB
+
+
+@lru_cache(maxsize=None)
+def _fonts():
+    from PIL import ImageFont
+    fonts = []
+    for name, size in (("DejaVuSans-Bold.ttf", 13), ("DejaVuSans.ttf", 11)):
+        try:
+            fonts.append(ImageFont.truetype(name, size))
+        except OSError:
+            fonts.append(ImageFont.load_default())
+    return tuple(fonts)
+
+
+# The empty rack (frame, rows and U labels) only depends on the height, so batch
+# exports draw it once per height and copy it for every rack.
+@lru_cache(maxsize=16)
+def _empty_rack_image(rack_height):
+    from PIL import Image, ImageDraw
+
+    bottom = rack_height * U_HEIGHT
+    image = Image.new('RGB', (IMAGE_WIDTH_PX, bottom + 1), _pil_color(BACKGROUND_COLOR))
+    draw = ImageDraw.Draw(image)
+    label_font = _fonts()[1]
+
+    draw.rectangle((RACK_LEFT_MARGIN, 0, RACK_RIGHT_MARGIN, bottom), fill=_pil_color(RACK_COLOR), outline=_pil_color(RAIL_COLOR), width=2)
+    for i in range(rack_height):
+        y = i * U_HEIGHT
+        draw.line((RACK_LEFT_MARGIN, y, RACK_RIGHT_MARGIN, y), fill=_pil_color(ROW_COLOR), width=1)
+        draw.text((2, y + U_HEIGHT // 2), f"{rack_height - i}U", fill='white', font=label_font, anchor='lm')
+    draw.line((RACK_LEFT_MARGIN, bottom, RACK_RIGHT_MARGIN, bottom), fill=_pil_color(ROW_COLOR), width=1)
+    return image
+
+
+def render_image(model):
+    try:
+        from PIL import ImageDraw
+    except ImportError:
+        raise RackError("Image export needs Pillow (pip install Pillow). SVG export works without it.")
+
+    image = _empty_rack_image(model.rack_height).copy()
+    draw = ImageDraw.Draw(image)
+    name_font = _fonts()[0]
+
+    for comp in model.components:
+        y1, y2 = component_y(comp, model.rack_height)
+        color = comp.color
+        draw.rectangle((RACK_LEFT_MARGIN, y1, RACK_RIGHT_MARGIN, y2), fill=_pil_color(color), outline=_pil_color(COMPONENT_OUTLINE), width=2)
+        draw.text((RACK_LEFT_MARGIN + RACK_WIDTH_PX // 2, (y1 + y2) // 2), comp.name, fill=text_color_for(color), font=name_font, anchor='mm')
+    return image
+
+
+def render_svg(model):
+    from xml.sax.saxutils import escape
+    bottom = model.rack_height * U_HEIGHT
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{IMAGE_WIDTH_PX}" height="{bottom + 1}" viewBox="0 0 {IMAGE_WIDTH_PX} {bottom + 1}" font-family="Arial, sans-serif">',
+        f'<rect width="100%" height="100%" fill="{BACKGROUND_COLOR}"/>',
+        f'<rect x="{RACK_LEFT_MARGIN}" y="0" width="{RACK_WIDTH_PX}" height="{bottom}" fill="{RACK_COLOR}" stroke="{RAIL_COLOR}" stroke-width="2"/>',
+    ]
+    for i in range(model.rack_height + 1):
+        y = i * U_HEIGHT
+        parts.append(f'<line x1="{RACK_LEFT_MARGIN}" y1="{y}" x2="{RACK_RIGHT_MARGIN}" y2="{y}" stroke="{ROW_COLOR}" stroke-width="1"/>')
+        if i < model.rack_height:
+            parts.append(f'<text x="2" y="{y + U_HEIGHT // 2}" fill="white" font-size="11" dominant-baseline="middle">{model.rack_height - i}U</text>')
+    for comp in model.components:
+        y1, y2 = component_y(comp, model.rack_height)
+        color = escape(comp.color, {'"': '&quot;'})
+        parts.append(f'<rect x="{RACK_LEFT_MARGIN}" y="{y1}" width="{RACK_WIDTH_PX}" height="{y2 - y1}" fill="{color}" stroke="{COMPONENT_OUTLINE}" stroke-width="2"/>')
+        parts.append(f'<text x="{RACK_LEFT_MARGIN + RACK_WIDTH_PX // 2}" y="{(y1 + y2) // 2}" fill="{text_color_for(comp.color)}" '
+                     f'font-size="13" font-weight="bold" text-anchor="middle" dominant-baseline="middle">{escape(comp.name)}</text>')
+    parts.append('</svg>')
+    return "\n".join(parts) + "\n"
+
+
+def export_rack(model, file_path, fmt=None):
+    fmt = (fmt or os.path.splitext(file_path)[1].lstrip('.') or 'png').lower()
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format '{fmt}'. Use one of: {', '.join(EXPORT_FORMATS)}.")
+    if fmt == 'svg':
+        with open(file_path, 'w') as f:
+            f.write(render_svg(model))
+    elif fmt == 'pdf':
+        render_image(model).save(file_path, 'PDF')
+    else:
+        render_image(model).save(file_path, 'PNG', compress_level=PNG_COMPRESS_LEVEL)
+    return file_path
+
+
+# A single saved rack opens as a one-rack project (see rackio.load_project) and
+# keeps the file's name; larger projects number their images by rack.
+def _export_file(job):
+    source, out_dir, fmt = job
+    try:
+        stem = os.path.splitext(os.path.basename(source))[0]
+        racks = rackio.load_project(source, track_history=False).racks
+        if len(racks) == 1:
+            models = [(racks[0], stem)]
+        else:
+            models = [(model, f"{stem}-{n:03d}") for n, model in enumerate(racks, 1)]
+        written = []
+        for model, name in models:
+            written.append(export_rack(model, os.path.join(out_dir, f"{name}.{fmt}"), fmt))
+        return source, written, None
+    except Exception as e:
+        return source, [], str(e)
+
+
+def export_files(sources, out_dir, fmt='png', jobs=None):
+    os.makedirs(out_dir, exist_ok=True)
+    work = [(source, out_dir, fmt) for source in sources]
+    if jobs == 1 or len(work) < 2:
+        return [_export_file(job) for job in work]
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        return list(pool.map(_export_file, work, chunksize=max(len(work) // (4 * (jobs or os.cpu_count() or 1)), 1)))
@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+import asyncio
+import json
+import signal
+import sys
+from urllib.parse import parse_qs, urlsplit
+
+import rackio
+from rackcapacity import PREFERENCES, CapacityIndex, parse_devices
+from rackmodel import DEFAULT_COLOR, RackError, budget_load, component_record, rack_record
+from rackrender import EXPORT_FORMATS, render_image, render_svg
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8080
+FLUSH_INTERVAL = 1.0
+MAX_BODY_BYTES = 1 << 20
+
+_REASONS = {200: 'OK', 201: 'Created', 204: 'No Content', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+            409: 'Conflict', 413: 'Payload Too Large', 500: 'Internal Server Error', 501: 'Not Implemented'}
+_WHOLE_NUMBER_FIELDS = (('start_u_slot', 1), ('size_u', 1), ('top', 0))
+_TEXT_FIELDS = ('name', 'color', 'strategy', 'prefer')
+_CONTENT_TYPES = {'svg': 'image/svg+xml', 'png': 'image/png', 'pdf': 'application/pdf'}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# A local HTTP/JSON API over one in-memory project, on asyncio streams with
+# HTTP/1.1 keep-alive and no dependencies beyond the standard library. Racks and
+# components are numbered from 1, as in the CLI.
+#
+#   GET    /racks                               summary of every rack
+#   GET    /racks/N                             rack N with its components
+#   POST   /racks/N/components                  place {"name", "size_u", "color", "start_u_slot", "strategy"}
+#   PATCH  /racks/N/components/M                move {"start_u_slot"}
+#   DELETE /racks/N/components/M                delete
+#   GET    /racks/N/export?format=svg           render (png and pdf need Pillow)
+#   POST   /capacity                            {"devices": [...], "top", "prefer"} as the capacity command (needs NumPy)
+#   POST   /save                                write the project now
+#
+# Every request is handled on the event loop, so a change to a rack cannot
+# interleave with another. The exceptions are renders, which run on a worker
+# thread: each rack has an asyncio.Lock that renders hold while they read the
+# rack and that changes to it take first, so other racks stay writable. Changes
+# mark the project dirty and a background task writes a snapshot at most every
+# flush_interval seconds, so a burst of writes costs one save.
+class RackServer:
+    def __init__(self, workspace, path=None, flush_interval=FLUSH_INTERVAL):
+        self.workspace = workspace
+        self.path = path
+        self.flush_interval = flush_interval
+        self.requests = 0
+        self.save_error = None
+        self._locks = {}
+        self._dirty = False
+        self._version = 0
+        self._capacity = None
+        self._flush_lock = None
+        self._server = None
+
+    def _lock(self, rack):
+        lock = self._locks.get(id(rack))
+        if lock is None:
+            lock = self._locks[id(rack)] = asyncio.Lock()
+        return lock
+
+    def _changed(self):
+        self._dirty = True
+        self._version += 1
+
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        self._flush_lock = asyncio.Lock()
+        self._server = await asyncio.start_server(self._handle_connection, host, port)
+        return self._server
+
+    @property
+    def port(self):
+        return self._server.sockets[0].getsockname()[1]
+
+    # Serves until cancelled, writing pending changes every flush_interval seconds
+    # and once more on the way out. on_ready(server) is called once listening.
+    async def serve_forever(self, host=DEFAULT_HOST, port=DEFAULT_PORT, on_ready=None):
+        await self.start(host, port)
+        if on_ready is not None:
+            on_ready(self)
+        flusher = asyncio.ensure_future(self._flush_periodically())
+        try:
+            async with self._server:
+                await self._server.serve_forever()
+        finally:
+            flusher.cancel()
+            await self.flush()
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    # The snapshot is taken on the event loop, so it holds no half-made change, and
+    # written on a worker thread while requests go on. Any failure is reported and
+    # kept in save_error, and the changes stay pending for the next try, so the
+    # periodic flush never stops.
+    async def flush(self):
+        if not self.path:
+            return
+        async with self._flush_lock:
+            if not self._dirty:
+                return
+            self._dirty = False
+            try:
+                snapshot = self.workspace.copy()
+                await asyncio.get_running_loop().run_in_executor(None, rackio.save_project, self.path, snapshot)
+                self.save_error = None
+            except Exception as e:
+                self._dirty = True
+                self.save_error = e
+                print(f"rackplanner: could not save {self.path}: {e}", file=sys.stderr)
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                try:
+                    parts = request_line.decode('latin-1').split()
+                    if len(parts) != 3:
+                        raise HTTPError(400, "Malformed request line.")
+                    method, target, version = parts
+                    keep_alive = keep_alive and version == 'HTTP/1.1'
+                    length = int(headers.get('content-length') or 0)
+                    if length > MAX_BODY_BYTES:
+                        keep_alive = False
+                        raise HTTPError(413, f"Request bodies are limited to {MAX_BODY_BYTES} bytes.")
+                    body = await reader.readexactly(length) if length else b''
+                    status, payload, content_type = await self.handle(method, target, body)
+                except HTTPError as e:
+                    status, payload, content_type = e.status, _json_bytes({'error': str(e)}), 'application/json'
+                except ValueError:
+                    status, payload, content_type, keep_alive = 400, _json_bytes({'error': "Malformed request."}), 'application/json', False
+                head = f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\nContent-Type: {content_type}\r\nContent-Length: {len(payload)}\r\n"
+                if not keep_alive:
+                    head += "Connection: close\r\n"
+                writer.write((head + "\r\n").encode('latin-1') + payload)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    # Runs one request and returns (status, body bytes, content type); errors come
+    # back as JSON {"error": message}.
+    async def handle(self, method, target, body=b''):
+        self.requests += 1
+        url = urlsplit(target)
+        parts = [part for part in url.path.split('/') if part]
+        try:
+            data = json.loads(body) if body else {}
+            if not isinstance(data, dict):
+                raise HTTPError(400, "The request body must be a JSON object.")
+            _check_fields(data)
+            result = await self._route(method, parts, parse_qs(url.query), data)
+        except HTTPError as e:
+            return e.status, _json_bytes({'error': str(e)}), 'application/json'
+        except RackError as e:
+            return 409, _json_bytes({'error': str(e)}), 'application/json'
+        except (ValueError, TypeError) as e:
+            return 400, _json_bytes({'error': str(e)}), 'application/json'
+        except Exception as e:
+            print(f"rackplanner: {method} {target} failed: {e!r}", file=sys.stderr)
+            return 500, _json_bytes({'error': "Internal error; see the server's log."}), 'application/json'
+        if isinstance(result[1], bytes):
+            return result
+        status, payload = result
+        return status, _json_bytes(payload), 'application/json'
+
+    async def _route(self, method, parts, query, data):
+        if parts == ['racks']:
+            _allow(method, 'GET')
+            return 200, [self._summary(number, rack) for number, rack in enumerate(self.workspace.racks, 1)]
+        if parts == ['capacity']:
+            _allow(method, 'POST')
+            return 200, self._query_capacity(data)
+        if parts == ['save']:
+            _allow(method, 'POST')
+            if not self.path:
+                raise HTTPError(409, "This server has no project file to save to.")
+            self._dirty = True
+            await self.flush()
+            if self.save_error is not None:
+                raise HTTPError(500, f"Could not save: {self.save_error}")
+            return 200, {'saved': self.path}
+        if len(parts) < 2 or parts[0] != 'racks':
+            raise HTTPError(404, "No such resource.")
+        number, rack = self._rack(parts[1])
+        rest = parts[2:]
+        if not rest:
+            _allow(method, 'GET')
+            return 200, dict(rack_record(rack), used_u=rack.used_u, free_u=rack.free_u)
+        if rest == ['export']:
+            _allow(method, 'GET')
+            return await self._export(rack, query.get('format', ['svg'])[0])
+        if rest == ['components']:
+            _allow(method, 'POST')
+            async with self._lock(rack):
+                comp = self._place(rack, data)
+                self._changed()
+                return 201, dict(component_record(comp), number=len(rack.components))
+        if len(rest) == 2 and rest[0] == 'components':
+            _allow(method, 'PATCH', 'DELETE')
+            if method == 'PATCH' and data.get('start_u_slot') is None:
+                raise HTTPError(400, "Give the new start_u_slot as a whole number.")
+            # The number is resolved only once the lock is held, so a request queued
+            # behind another never acts on a component that one removed.
+            async with self._lock(rack):
+                comp = _component(rack, rest[1])
+                if method == 'PATCH':
+                    rack.move(comp, data['start_u_slot'])
+                    self._changed()
+                    return 200, dict(component_record(comp), number=int(rest[1]))
+                rack.delete(comp)
+                self._changed()
+                return 200, component_record(comp)
+        raise HTTPError(404, "No such resource.")
+
+    def _rack(self, text):
+        try:
+            number = int(text)
+        except ValueError:
+            raise HTTPError(404, f"No rack '{text}'.")
+        if not 1 <= number <= len(self.workspace.racks):
+            raise HTTPError(404, f"No rack at position {number}.")
+        return number, self.workspace.racks[number - 1]
+
+    def _summary(self, number, rack):
+        return {'number': number, 'name': rack.name, 'rack_height': rack.rack_height, 'used_u': rack.used_u, 'placements': len(rack.components)}
+
+    # A catalog name places that component; a size_u places anything (taking the
+    # catalog's color and load when the name is known). Without start_u_slot the
+    # rack's placement strategy, or the one given, picks the slot.
+    def _place(self, rack, data):
+        name = data.get('name')
+        if not isinstance(name, str) or not name:
+            raise HTTPError(400, "Give the component's name.")
+        info = rack.get_component_info(name) or {}
+        size_u = data.get('size_u', info.get('size'))
+        if size_u is None:
+            raise HTTPError(400, f"Unknown component '{name}'; give its size_u.")
+        color = data.get('color') or info.get('color', DEFAULT_COLOR)
+        load = budget_load(data) or budget_load(info)
+        if data.get('start_u_slot') is not None:
+            return rack.place_at(name, size_u, data['start_u_slot'], color, load)
+        return rack.place(name, size_u, color, data.get('strategy'), load)
+
+    # The index is rebuilt only after the project changed.
+    def _query_capacity(self, data):
+        devices = data.get('devices')
+        if not isinstance(devices, list) or not devices or not all(isinstance(spec, str) for spec in devices):
+            raise HTTPError(400, "Give devices as a list of specs such as \"2x 2U Server\".")
+        prefer = data.get('prefer', PREFERENCES[0])
+        try:
+            if self._capacity is None or self._capacity[0] != self._version:
+                self._capacity = (self._version, CapacityIndex.from_workspace(self.workspace))
+            index = self._capacity[1]
+            matches = index.query(parse_devices(devices, self.workspace.component_categories), data.get('top', 10) or None, prefer)
+        except RackError as e:
+            raise HTTPError(501, str(e))
+        return [dict(match, rack=match['rack'] + 1, slots=[{'name': name, 'start_u_slot': slot} for name, slot in match['slots']])
+                for match in matches]
+
+    async def _export(self, rack, fmt):
+        if fmt not in EXPORT_FORMATS:
+            raise HTTPError(400, f"Unsupported export format '{fmt}'. Use one of: {', '.join(EXPORT_FORMATS)}.")
+        async with self._lock(rack):
+            try:
+                payload = await asyncio.get_running_loop().run_in_executor(None, _render, rack, fmt)
+            except RackError as e:
+                raise HTTPError(501, str(e))
+        return 200, payload, _CONTENT_TYPES[fmt]
+
+
+def _render(rack, fmt):
+    if fmt == 'svg':
+        return render_svg(rack).encode('utf-8')
+    import io
+    out = io.BytesIO()
+    image = render_image(rack)
+    image.save(out, 'PDF' if fmt == 'pdf' else 'PNG')
+    return out.getvalue()
+
+
+def _allow(method, *allowed):
+    if method not in allowed:
+        raise HTTPError(405, f"Use {' or '.join(allowed)} here.")
+
+
+# Rejects request fields of the wrong type before they reach the model, where
+# they could end up in a saved file that no longer loads. JSON true and false
+# are not numbers here, even though Python counts bool as int.
+def _check_fields(data):
+    for key, minimum in _WHOLE_NUMBER_FIELDS:
+        value = data.get(key)
+        if value is not None and (isinstance(value, bool) or not isinstance(value, int) or value < minimum):
+            raise HTTPError(400, f"{key} must be a whole number of at least {minimum}.")
+    for key in _TEXT_FIELDS:
+        value = data.get(key)
+        if value is not None and not isinstance(value, str):
+            raise HTTPError(400, f"{key} must be a string.")
+
+
+def _component(rack, text):
+    try:
+        number = int(text)
+    except ValueError:
+        raise HTTPError(404, f"No component '{text}'.")
+    if not 1 <= number <= len(rack.components):
+        raise HTTPError(404, f"No component at position {number}.")
+    return rack.components[number - 1]
+
+
+def _json_bytes(payload):
+    return json.dumps(payload, separators=(',', ':')).encode('utf-8')
+
+
+# Loads the project and serves it until interrupted or terminated; changes are
+# written back to it (or to save_to), including any still pending on the way out.
+def serve(path, host=DEFAULT_HOST, port=DEFAULT_PORT, flush_interval=FLUSH_INTERVAL, save_to=None):
+    workspace = rackio.load_project(path, track_history=False)
+    server = RackServer(workspace, save_to or path, flush_interval)
+
+    def ready(server):
+        print(f"Serving {len(workspace)} rack(s) from {path} on http://{host}:{server.port}/ (Ctrl+C to stop)", file=sys.stderr)
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        task = asyncio.current_task()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signum, task.cancel)
+            except (NotImplementedError, RuntimeError):
+                pass
+        try:
+            await server.serve_forever(host, port, ready)
+        except asyncio.CancelledError:
+            pass
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    print(f"Stopped after {server.requests} request(s).", file=sys.stderr)
+    return 0
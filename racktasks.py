@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+import queue
+import threading
+import time
+
+TASK_POLL_MS = 30
+PROGRESS_INTERVAL = 0.05
+
+
+class TaskCancelled(Exception):
+    pass
+
+
+# One piece of background work. The worker calls report(done, total) as it goes,
+# which doubles as the cancellation point: once cancel() was called it raises
+# TaskCancelled, so rackio's progress hooks stop a load or save mid-file.
+class Task:
+    def __init__(self, name, events, on_done, on_error, keep_on_close):
+        self.name = name
+        self.on_done = on_done
+        self.on_error = on_error
+        self.keep_on_close = keep_on_close
+        self.fraction = None
+        self._events = events
+        self._cancel = threading.Event()
+        self._last_report = 0.0
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def report(self, done, total):
+        if self._cancel.is_set():
+            raise TaskCancelled()
+        now = time.monotonic()
+        if now - self._last_report >= PROGRESS_INTERVAL or done >= total:
+            self._last_report = now
+            self._events.put(('progress', self, done / total if total else None))
+
+    def __repr__(self):
+        return f"Task({self.name!r})"
+
+
+# Runs file work off the Tk main loop. Tasks run one at a time on a single worker
+# thread, so saves and loads of the same file happen in the order they were asked
+# for. Workers never touch Tk: results, errors and progress go through a queue
+# that the main loop drains with root.after while any task is active, and the
+# callbacks run there. The worker is started by the first task, which keeps
+# concurrent.futures out of the app's startup.
+class TaskRunner:
+    def __init__(self, root, on_progress=None):
+        self.root = root
+        self.on_progress = on_progress
+        self.active = []
+        self._events = queue.SimpleQueue()
+        self._executor = None
+        self._poll_id = None
+
+    # work(task) runs on the worker thread; on_done(result) or on_error(exception)
+    # then run on the main loop. A cancelled task calls neither.
+    def submit(self, name, work, on_done, on_error, keep_on_close=False):
+        task = Task(name, self._events, on_done, on_error, keep_on_close)
+        self.active.append(task)
+        if self._executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='rackplanner-io')
+        self._executor.submit(self._run, task, work)
+        self._notify()
+        if self._poll_id is None:
+            self._poll_id = self.root.after(TASK_POLL_MS, self._poll)
+        return task
+
+    def _run(self, task, work):
+        try:
+            if task.cancelled:
+                raise TaskCancelled()
+            self._events.put(('done', task, work(task)))
+        except TaskCancelled:
+            self._events.put(('cancelled', task, None))
+        except Exception as e:
+            self._events.put(('error', task, e))
+
+    def _poll(self):
+        self._poll_id = None
+        while True:
+            try:
+                kind, task, value = self._events.get_nowait()
+            except queue.Empty:
+                break
+            if kind == 'progress':
+                task.fraction = value
+            else:
+                self.active.remove(task)
+                if kind == 'done' and not task.cancelled:
+                    task.on_done(value)
+                elif kind == 'error':
+                    task.on_error(value)
+            self._notify()
+        if self.active:
+            self._poll_id = self.root.after(TASK_POLL_MS, self._poll)
+
+    def _notify(self):
+        if self.on_progress is not None:
+            self.on_progress(self.active[0] if self.active else None)
+
+    def cancel_all(self):
+        for task in self.active:
+            task.cancel()
+
+    # Cancels loads and waits for saves (keep_on_close tasks) before the app exits.
+    def shutdown(self):
+        for task in self.active:
+            if not task.keep_on_close:
+                task.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+import random
+import unittest
+
+from rackdiff import diff_workspaces, merge_workspaces
+from rackmodel import RackError, Workspace
+
+NAMES = ('1U Server', '2U Server', '4U Server', 'Managed Switch', 'Patch Panel')
+
+
+def _random_workspace(rng, racks=4, rack_height=24, fill=0.6):
+    workspace = Workspace(racks, rack_height, track_history=False)
+    for rack in workspace.racks:
+        while rack.used_u < fill * rack_height:
+            try:
+                rack.place_catalog(rng.choice(NAMES), strategy='best-fit')
+            except RackError:
+                break
+    return workspace
+
+
+# A copy of workspace with random deletes, moves, placements and recolors.
+def _edited(rng, workspace, edits=15):
+    workspace = workspace.copy()
+    for _ in range(edits):
+        rack = rng.choice(workspace.racks)
+        kind = rng.random()
+        try:
+            if kind < 0.3 and rack.components:
+                rack.delete(rng.choice(rack.components))
+            elif kind < 0.6 and rack.components:
+                rack.move(rng.choice(rack.components), rng.randint(1, rack.rack_height))
+            elif kind < 0.8:
+                rack.place_catalog(rng.choice(NAMES))
+            elif rack.components:
+                rng.choice(rack.components).color = rng.choice(('red', 'blue'))
+        except (RackError, ValueError):
+            pass
+    return workspace
+
+
+def _layout(workspace):
+    return [(rack.name, rack.rack_height, sorted((comp.name, comp.start_u_slot, comp.size_u, comp.color) for comp in rack.components))
+            for rack in workspace.racks]
+
+
+class MergeWorkspacesTest(unittest.TestCase):
+    def assertValidRacks(self, workspace):
+        for rack in workspace.racks:
+            taken = set()
+            for comp in rack.components:
+                slots = set(range(comp.start_u_slot, comp.start_u_slot + comp.size_u))
+                self.assertGreaterEqual(comp.start_u_slot, 1)
+                self.assertLessEqual(comp.start_u_slot + comp.size_u - 1, rack.rack_height)
+                self.assertFalse(taken & slots, f"{rack.name}: {comp!r} overlaps another placement")
+                taken |= slots
+            self.assertEqual(rack.used_u, len(taken))
+
+    def test_random_merges(self):
+        rng = random.Random(24)
+        for _ in range(200):
+            base = _random_workspace(rng)
+            ours, theirs = _edited(rng, base), _edited(rng, base)
+            self.assertEqual(_layout(merge_workspaces(base, ours, base)[0]), _layout(ours))
+            self.assertEqual(_layout(merge_workspaces(base, base, theirs)[0]), _layout(theirs))
+            merged, _ = merge_workspaces(base, ours, theirs)
+            self.assertValidRacks(merged)
+            self.assertFalse(diff_workspaces(merged, merge_workspaces(base, ours, theirs)[0])['racks'])
+
+    def test_collision_keeps_ours(self):
+        base = Workspace(1, 12, track_history=False)
+        base.racks[0].place_at('2U Server', 2, 1)
+        ours, theirs = base.copy(), base.copy()
+        ours.racks[0].move(ours.racks[0].components[0], 9)
+        theirs.racks[0].place_at('4U Server', 4, 8)
+        merged, conflicts = merge_workspaces(base, ours, theirs)
+        self.assertEqual(_layout(merged), _layout(ours))
+        self.assertEqual([conflict['kind'] for conflict in conflicts], ['collision'])
+
+    def test_reverted_placement_evicts_theirs(self):
+        base = Workspace(1, 24, track_history=False)
+        base.racks[0].place_at('1U Server', 1, 10)
+        ours, theirs = base.copy(), base.copy()
+        ours.racks[0].place_at('Patch Panel', 1, 20)
+        theirs.racks[0].move(theirs.racks[0].components[0], 20)
+        theirs.racks[0].place_at('Managed Switch', 1, 10)
+        merged, conflicts = merge_workspaces(base, ours, theirs)
+        self.assertEqual(_layout(merged), _layout(ours))
+        self.assertEqual([conflict['kind'] for conflict in conflicts], ['collision', 'collision'])
+
+    def test_both_changed_keeps_ours(self):
+        base = Workspace(1, 12, track_history=False)
+        base.racks[0].place_at('1U Server', 1, 5)
+        ours, theirs = base.copy(), base.copy()
+        ours.racks[0].move(ours.racks[0].components[0], 2)
+        theirs.racks[0].move(theirs.racks[0].components[0], 10)
+        merged, conflicts = merge_workspaces(base, ours, theirs)
+        self.assertEqual(merged.racks[0].components[0].start_u_slot, 2)
+        self.assertEqual([conflict['kind'] for conflict in conflicts], ['both-changed'])
+
+    def test_rack_removed_by_ours_and_changed_by_theirs(self):
+        base = Workspace(2, 12, track_history=False)
+        ours, theirs = base.copy(), base.copy()
+        ours.remove_rack(1)
+        theirs.racks[1].place_at('1U Server', 1, 3)
+        merged, conflicts = merge_workspaces(base, ours, theirs)
+        self.assertEqual(_layout(merged), _layout(ours))
+        self.assertEqual([conflict['kind'] for conflict in conflicts], ['removed-changed'])
+        merged, conflicts = merge_workspaces(base, ours, base)
+        self.assertEqual((_layout(merged), conflicts), (_layout(ours), []))
+
+    def test_disjoint_changes_both_apply(self):
+        base = Workspace(1, 24, track_history=False)
+        base.racks[0].place_at('1U Server', 1, 1)
+        base.racks[0].place_at('2U Server', 2, 10)
+        ours, theirs = base.copy(), base.copy()
+        ours.racks[0].move(ours.racks[0].components[0], 5)
+        theirs.racks[0].delete(theirs.racks[0].components[1])
+        theirs.racks[0].place_at('Patch Panel', 1, 20)
+        merged, conflicts = merge_workspaces(base, ours, theirs)
+        self.assertEqual(conflicts, [])
+        self.assertEqual(_layout(merged)[0][2], [('1U Server', 5, 1, 'skyblue'), ('Patch Panel', 20, 1, 'skyblue')])
+
+
+if __name__ == "__main__":
+    unittest.main()